@@ -16,9 +16,51 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
 
-from .sketch import *
-from .core import *
-from .pmath import *
+"""p5: A Python package based on Processing
+
+The sketch, core and pmath subpackages are only imported once one of
+their names is used (or on ``from p5 import *``), so that tools that
+only need part of p5 start quickly.
+
+"""
+
+import importlib
+
+_SUBPACKAGES = ['sketch', 'core', 'pmath']
+
+_public_names = None
+
+def _load_all():
+    """Import the subpackages and copy their public names into p5."""
+    global _public_names
+    if _public_names is None:
+        names = []
+        for subpackage in _SUBPACKAGES:
+            module = importlib.import_module('.' + subpackage, __name__)
+            exported = getattr(module, '__all__', None)
+            if exported is None:
+                exported = [n for n in vars(module) if not n.startswith('_')]
+            for name in exported:
+                globals()[name] = getattr(module, name)
+                if name not in names:
+                    names.append(name)
+        _public_names = names
+    return _public_names
+
+def __getattr__(name):
+    if name == '__all__':
+        return _load_all()
+    if name in _SUBPACKAGES:
+        return importlib.import_module('.' + name, __name__)
+    if name.startswith('__'):
+        raise AttributeError(name)
+    if name not in _load_all():
+        raise AttributeError("module {!r} has no attribute {!r}".format(
+            __name__, name))
+    return globals()[name]
+
+def __dir__():
+    return sorted(set(globals()) | set(_load_all()))
 
 from .__version__ import __title__
 from .__version__ import __description__
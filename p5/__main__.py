@@ -15,38 +15,371 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
+"""Command line interface for p5.
 
+    $ python -m p5 run sketch.py [-- sketch arguments]
+    $ python -m p5 render sketch.py --frames 120 --out frames --size 1280x720
+    $ python -m p5 render sketch.py --frames 3000 --workers 8 --seek jump
+    $ python -m p5 bench [sketch.py ...]
+    $ python -m p5 profile sketch.py [--frames 300]
+
+The render, bench and profile commands draw frames as fast as possible
+without showing the window (the window system still has to provide an
+OpenGL context; use ``--backend egl`` on machines without a display).
+
+"""
+
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import subprocess
 import sys
-from . import _p5
+import tempfile
+import time
+import types
 
-# we should be parsing sys args here and expose a series of commands
-# similar to processing-java.
-#
-# relevant output from `processing-java --help`:
-#
-#     --help               Show this help text. Congratulations.
-#    
-#     --sketch=<name>      Specify the sketch folder (required)
-#     
-#     --output=<name>      Specify the output folder (optional and
-#                          cannot be the same as the sketch folder.)
-#                          
-#     --force              The sketch will not build if the output
-#                          folder already exists, because the contents
-#                          will be replaced. This option erases the
-#                          folder first. Use with extreme caution!
-#                          
-#     --build              Preprocess and compile a sketch into .class files.
-#     
-#     --run                Preprocess, compile, and run a sketch.
-#     
-#     --present            Preprocess, compile, and run a sketch in presentation mode.
-#    
-#     --export             Export an application.
-#     
-#     --no-java            Do not embed Java. Use at your own risk!
-#     
-#     --platform           Specify the platform (export to application only).
-#                          Should be one of 'windows', 'macosx', or 'linux'.
-#
-                                                                                    
+from .benchmarks import SCENES
+from .benchmarks import scene_path
+from .sketch.stats import check_stats_file
+
+def _parse_size(value):
+    try:
+        width, height = value.lower().split('x')
+        return int(width), int(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "size should be given as WIDTHxHEIGHT (eg. 640x360)")
+
+def _parse_level(value):
+    if value == 'auto':
+        return value
+    try:
+        return float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("should be a number or 'auto'")
+
+def _parse_stats_file(value):
+    try:
+        check_stats_file(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "should be a '.csv' or '.jsonl' file")
+    return value
+
+def _exec_sketch(filename, argv, options):
+    """Run the sketch in the given file as the __main__ module.
+
+    :param filename: file name of the sketch.
+    :type filename: str
+
+    :param argv: command line arguments for the sketch.
+    :type argv: str list
+
+    :param options: options that override the ones passed to run() by
+        the sketch (see p5.sketch.userspace).
+    :type options: dict
+
+    """
+    from .sketch import userspace
+    userspace._cli_options.update(options)
+
+    path = os.path.abspath(filename)
+    with open(path) as f:
+        code = compile(f.read(), path, 'exec')
+
+    sys.argv = [path] + list(argv)
+    sys.path.insert(0, os.path.dirname(path))
+
+    module = types.ModuleType('__main__')
+    module.__file__ = path
+    sys.modules['__main__'] = module
+    exec(code, module.__dict__)
+
+    # Sketches written like Processing sketches might never call run()
+    if userspace.default_sketch is None:
+        userspace.run()
+
+def _sketch_options(args):
+    options = {'backend': args.backend}
+    if args.size is not None:
+        options['size'] = args.size
+    if args.stats_file is not None:
+        options['stats_file'] = args.stats_file
+    if args.share_frames is not None:
+        options['share_frames'] = args.share_frames
+    if args.record_input is not None:
+        options['record_input'] = args.record_input
+    if args.replay_input is not None:
+        options['replay_input'] = args.replay_input
+    if args.render_scale is not None:
+        options['render_scale'] = args.render_scale
+    if args.detail_level is not None:
+        options['detail_level'] = args.detail_level
+    return options
+
+def _headless_options(args, frames, out_dir=None):
+    options = _sketch_options(args)
+    options['frame_rate'] = None
+    options['frames'] = frames
+    options['out_dir'] = out_dir
+    return options
+
+def run_command(args):
+    _exec_sketch(args.sketch, args.args, _sketch_options(args))
+
+def render_command(args):
+    workers = args.workers or os.cpu_count() or 1
+    if workers > 1:
+        _render_parallel(args, workers)
+        return
+
+    options = _headless_options(args, args.frames, args.out or None)
+    options['first_frame'] = args.first_frame
+    options['seek'] = args.seek or 'fast-forward'
+    options['threads'] = args.threads
+    _exec_sketch(args.sketch, args.args, options)
+
+def _frame_ranges(first_frame, num_frames, workers):
+    """Split the frames into (at most) `workers` contiguous ranges.
+
+    :returns: list of (first_frame, num_frames) tuples.
+    :rtype: list
+
+    """
+    chunk, extra = divmod(num_frames, workers)
+    ranges = []
+    start = first_frame
+    for idx in range(workers):
+        count = chunk + (1 if idx < extra else 0)
+        if count > 0:
+            ranges.append((start, count))
+        start = start + count
+    return ranges
+
+def _worker_stats_file(filename, idx):
+    """Get the name of the statistics file of a worker (eg. stats.csv
+    becomes stats-0.csv for the first worker)."""
+    stem, ext = os.path.splitext(filename)
+    return '{}-{}{}'.format(stem, idx, ext)
+
+def _render_parallel(args, workers):
+    """Render the frames using several worker processes.
+
+    Each worker is a separate interpreter (with its own OpenGL context)
+    that renders a contiguous range of the frames. Workers write their
+    frame statistics to separate files.
+    """
+    if args.seek is None:
+        sys.exit("--workers needs --seek: fast-forward (draw the earlier "
+                 "frames in every worker) or jump (for sketches whose "
+                 "state only depends on frame_count)")
+    if args.share_frames is not None:
+        sys.exit("--share-frames needs a single worker")
+    if args.record_input is not None:
+        sys.exit("--record-input needs a single worker")
+
+    ranges = _frame_ranges(args.first_frame, args.frames, workers)
+    threads = args.threads or \
+        max(1, (os.cpu_count() or 1) // max(1, len(ranges)))
+
+    start_time = time.perf_counter()
+    processes = []
+    for idx, (first_frame, num_frames) in enumerate(ranges):
+        command = [sys.executable, '-m', 'p5', 'render', args.sketch,
+                   '--frames', str(num_frames), '--out', args.out,
+                   '--first-frame', str(first_frame), '--seek', args.seek,
+                   '--workers', '1', '--threads', str(threads),
+                   '--backend', args.backend]
+        if args.size is not None:
+            command.extend(['--size', '{}x{}'.format(*args.size)])
+        if args.render_scale is not None:
+            command.extend(['--render-scale', str(args.render_scale)])
+        if args.detail_level is not None:
+            command.extend(['--detail-level', str(args.detail_level)])
+        if args.replay_input is not None:
+            command.extend(['--replay-input', args.replay_input])
+        if args.stats_file is not None:
+            command.extend(['--stats-file',
+                            _worker_stats_file(args.stats_file, idx)])
+        if args.args:
+            command.extend(['--'] + list(args.args))
+        processes.append(subprocess.Popen(command))
+
+    failed = [p.args for p in processes if p.wait() != 0]
+    elapsed = time.perf_counter() - start_time
+
+    if failed:
+        sys.exit("{} of {} workers failed".format(len(failed), len(ranges)))
+    print("Rendered {} frames with {} workers in {:.2f}s ({:.1f} frames/sec)"
+          .format(args.frames, len(ranges), elapsed, args.frames / elapsed),
+          file=sys.stderr)
+
+def profile_command(args):
+    if args.frames is None:
+        options = _sketch_options(args)
+    else:
+        options = _headless_options(args, args.frames)
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(_exec_sketch, args.sketch, args.args, options)
+    except SystemExit:
+        pass
+
+    if args.out is not None:
+        profiler.dump_stats(args.out)
+    stats = pstats.Stats(profiler, stream=sys.stderr)
+    stats.sort_stats(args.sort).print_stats(args.limit)
+
+def _bench_sketch(sketch, args):
+    """Render the sketch in a new interpreter and get its statistics."""
+    handle, stats_file = tempfile.mkstemp(suffix='.jsonl')
+    os.close(handle)
+    try:
+        command = [sys.executable, '-m', 'p5', 'render', sketch,
+                   '--frames', str(args.frames), '--out', '',
+                   '--backend', args.backend, '--stats-file', stats_file]
+        if args.size is not None:
+            command.extend(['--size', '{}x{}'.format(*args.size)])
+        if args.render_scale is not None:
+            command.extend(['--render-scale', str(args.render_scale)])
+        if args.detail_level is not None:
+            command.extend(['--detail-level', str(args.detail_level)])
+        subprocess.check_call(command)
+        with open(stats_file) as f:
+            return json.loads(f.readlines()[-1])
+    finally:
+        os.remove(stats_file)
+
+def _ms(value):
+    return '-' if value is None else '{:.2f}'.format(value * 1000)
+
+def bench_command(args):
+    sketches = args.sketches or [scene_path(name) for name in SCENES]
+
+    print("{:<16} {:>7} {:>8} {:>8} {:>8} {:>8} {:>8}".format(
+        'sketch', 'frames', 'fps', 'p50 ms', 'p95 ms', 'p99 ms', 'draw ms'))
+    for sketch in sketches:
+        stats = _bench_sketch(sketch, args)
+        mean = stats['frame_time_mean']
+        name = os.path.splitext(os.path.basename(sketch))[0]
+        print("{:<16} {:>7} {:>8} {:>8} {:>8} {:>8} {:>8}".format(
+            name, stats['frame_time_count'],
+            '-' if not mean else '{:.1f}'.format(1 / mean),
+            _ms(stats['frame_time_p50']), _ms(stats['frame_time_p95']),
+            _ms(stats['frame_time_p99']), _ms(stats['draw_time_mean'])))
+
+def _add_sketch_arguments(parser, sketch=True):
+    if sketch:
+        parser.add_argument('sketch', help="file name of the sketch")
+    parser.add_argument('--size', type=_parse_size, default=None,
+                        help="override the size of the sketch (WxH)")
+    parser.add_argument('--backend', default='glfw',
+                        help="vispy backend to use (default: glfw)")
+    parser.add_argument('--render-scale', type=_parse_level, default=None,
+                        help="fraction of the window resolution to draw "
+                        "at, or 'auto' to adapt it to the frame rate")
+    parser.add_argument('--detail-level', type=_parse_level, default=None,
+                        help="fraction of the usual number of segments "
+                        "for ellipses and curves, or 'auto' to adapt it "
+                        "to the frame rate")
+    if sketch:
+        parser.add_argument('--stats-file', type=_parse_stats_file,
+                            default=None,
+                            help="append frame statistics to this "
+                            "'.csv' or '.jsonl' file on exit")
+        parser.add_argument('--share-frames', default=None, metavar='NAME',
+                            help="publish every frame to the shared "
+                            "memory block NAME")
+        parser.add_argument('--record-input', default=None, metavar='FILE',
+                            help="record the input events to FILE")
+        parser.add_argument('--replay-input', default=None, metavar='FILE',
+                            help="replay the input events recorded in "
+                            "FILE")
+
+def make_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m p5',
+        description="Run, render, benchmark and profile p5 sketches.")
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    run_parser = commands.add_parser('run', help="run a sketch")
+    _add_sketch_arguments(run_parser)
+    run_parser.set_defaults(func=run_command)
+
+    render_parser = commands.add_parser(
+        'render', help="render frames of a sketch without a window")
+    render_parser.add_argument('--frames', type=int, required=True,
+                               help="number of frames to draw")
+    render_parser.add_argument('--out', default='frames',
+                               help="directory to save the frames to "
+                               "(default: frames; an empty string "
+                               "disables saving)")
+    render_parser.add_argument('--first-frame', type=int, default=0,
+                               help="index of the first frame to save "
+                               "(default: 0)")
+    render_parser.add_argument('--seek', default=None,
+                               choices=['fast-forward', 'jump'],
+                               help="how to get to the first frame: draw "
+                               "all earlier frames (fast-forward, the "
+                               "default for a single worker) or only "
+                               "advance frame_count (jump; for sketches "
+                               "whose state only depends on frame_count). "
+                               "Required with more than one worker")
+    render_parser.add_argument('--workers', type=int, default=1,
+                               help="number of worker processes, each "
+                               "rendering a range of the frames (0 uses "
+                               "all CPUs; default: 1)")
+    render_parser.add_argument('--threads', type=int, default=None,
+                               help="number of threads encoding frames "
+                               "in each process")
+    _add_sketch_arguments(render_parser)
+    render_parser.set_defaults(func=render_command)
+
+    bench_parser = commands.add_parser(
+        'bench', help="measure frame times of sketches without a window")
+    bench_parser.add_argument('sketches', nargs='*',
+                              help="sketches to benchmark (default: the "
+                              "built-in scenes: {})".format(', '.join(SCENES)))
+    bench_parser.add_argument('--frames', type=int, default=300,
+                              help="number of frames per sketch "
+                              "(default: 300)")
+    _add_sketch_arguments(bench_parser, sketch=False)
+    bench_parser.set_defaults(func=bench_command)
+
+    profile_parser = commands.add_parser(
+        'profile', help="run a sketch under cProfile")
+    profile_parser.add_argument('--frames', type=int, default=None,
+                                help="draw this many frames without a "
+                                "window (default: run the sketch normally)")
+    profile_parser.add_argument('--sort', default='cumulative',
+                                help="sort order of the report "
+                                "(default: cumulative)")
+    profile_parser.add_argument('--limit', type=int, default=30,
+                                help="number of functions in the report "
+                                "(default: 30)")
+    profile_parser.add_argument('--out', default=None,
+                                help="also save the raw profile to this file")
+    _add_sketch_arguments(profile_parser)
+    profile_parser.set_defaults(func=profile_command)
+
+    return parser
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+
+    # Arguments after '--' are passed on to the sketch.
+    sketch_args = []
+    if '--' in argv:
+        idx = argv.index('--')
+        argv, sketch_args = argv[:idx], argv[idx + 1:]
+
+    args = make_parser().parse_args(argv)
+    args.args = sketch_args
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
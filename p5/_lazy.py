@@ -0,0 +1,57 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Deferred imports of heavy dependencies.
+
+vispy (and through it, the OpenGL bindings and the window backend)
+and PIL take a large part of the time needed to import p5, but are
+only needed once a sketch runs or an image is used. Modules refer to
+them through a proxy that imports the real module on first use.
+
+"""
+
+import importlib
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access.
+
+    :param name: absolute name of the module.
+    :type name: str
+
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return "LazyModule({})".format(self._name)
+
+def lazy_import(name):
+    """Get a proxy for the module that imports it on first use.
+
+    :param name: absolute name of the module.
+    :type name: str
+
+    :rtype: LazyModule
+
+    """
+    return LazyModule(name)
@@ -0,0 +1,32 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Benchmark sketches used by `python -m p5 bench`.
+
+Each scene is a regular sketch that draws a fixed (and deterministic)
+workload every frame.
+
+"""
+
+import os
+
+SCENES = ['shapes', 'lines', 'curves', 'sprites']
+
+def scene_path(name):
+    """Get the file name of the benchmark sketch with the given name."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        name + '.py')
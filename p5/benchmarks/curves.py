@@ -0,0 +1,46 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Large ellipses and finely tessellated curves (many vertices per
+shape)."""
+
+from p5 import *
+
+NUM_ELLIPSES = 40
+NUM_CURVES = 60
+
+def setup():
+    size(640, 360)
+    bezier_detail(400)
+
+def draw():
+    background(255)
+    stroke(0)
+    fill(120, 180, 220, 60)
+    for i in range(NUM_ELLIPSES):
+        x = (i * 37 + frame_count) % width
+        y = (i * 53) % height
+        ellipse((x, y), 300, 200)
+
+    no_fill()
+    for i in range(NUM_CURVES):
+        x = (i * 11 + frame_count) % width
+        bezier((x, 0), (width - x, height / 3),
+               (x, 2 * height / 3), (width - x, height))
+
+if __name__ == '__main__':
+    run()
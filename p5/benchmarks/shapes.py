@@ -0,0 +1,40 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Filled and stroked circles and rectangles."""
+
+from p5 import *
+
+NUM_SHAPES = 500
+
+def setup():
+    size(640, 360)
+
+def draw():
+    background(255)
+    stroke(0)
+    for i in range(NUM_SHAPES):
+        x = (i * 37 + frame_count) % width
+        y = (i * 53) % height
+        fill(i % 256, 100, 200)
+        if i % 2:
+            circle((x, y), 20)
+        else:
+            rect((x, y), 16, 12)
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,44 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Many small images (drawn through the texture atlas)."""
+
+from p5 import *
+
+NUM_SPRITES = 1000
+SPRITE_SIZE = 16
+
+sprite = None
+
+def setup():
+    global sprite
+    size(640, 360)
+
+    sprite = PImage(SPRITE_SIZE, SPRITE_SIZE)
+    for x in range(SPRITE_SIZE):
+        for y in range(SPRITE_SIZE):
+            sprite[x, y] = (x * 16, y * 16, 128, 255)
+
+def draw():
+    background(255)
+    for i in range(NUM_SPRITES):
+        x = (i * 29 + frame_count) % width
+        y = (i * 41) % height
+        image(sprite, (x, y))
+
+if __name__ == '__main__':
+    run()
@@ -22,4 +22,5 @@ from .transforms import *
 from .color import *
 from .attribs import *
 from .image import *
+from .tiled import *
 from .font import *
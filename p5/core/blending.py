@@ -0,0 +1,173 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Blend modes working in place on (height, width, channels) uint8
+pixel buffers.
+
+The formulas follow the ones used by Processing's PImage.blend(): the
+source color is weighted by the source alpha and the alpha of the
+destination (if any) becomes min(destination alpha + source alpha,
+255). All arithmetic is done on integers.
+
+"""
+
+import numpy as np
+
+from .filters import _alpha_channel
+from .filters import _color_channels
+from .filters import _run_tiled
+
+def _div255(x):
+    """Divide by 255 rounding to the nearest integer."""
+    return (x + 127) // 255
+
+def _mix(d, r, a):
+    """Linearly interpolate from d to r by the alpha a (0 -- 255).
+
+    A scalar alpha means the source is opaque.
+
+    """
+    if np.ndim(a) == 0:
+        return r
+    return d + _div255((r - d) * a)
+
+def _blend(d, s, a):
+    return _mix(d, s, a)
+
+def _weigh(s, a):
+    """Weigh the source color by the alpha a (0 -- 255)."""
+    if np.ndim(a) == 0:
+        return s
+    return _div255(s * a)
+
+def _add(d, s, a):
+    return np.minimum(d + _weigh(s, a), 255)
+
+def _subtract(d, s, a):
+    return np.maximum(d - _weigh(s, a), 0)
+
+def _lightest(d, s, a):
+    return np.maximum(d, _weigh(s, a))
+
+def _darkest(d, s, a):
+    return _mix(d, np.minimum(d, s), a)
+
+def _difference(d, s, a):
+    return _mix(d, np.abs(d - s), a)
+
+def _exclusion(d, s, a):
+    return _mix(d, d + s - _div255(2 * d * s), a)
+
+def _multiply(d, s, a):
+    return _mix(d, _div255(d * s), a)
+
+def _screen(d, s, a):
+    return _mix(d, 255 - _div255((255 - d) * (255 - s)), a)
+
+def _overlay(d, s, a):
+    r = np.where(d < 128,
+                 _div255(2 * d * s),
+                 255 - _div255(2 * (255 - d) * (255 - s)))
+    return _mix(d, r, a)
+
+def _hard_light(d, s, a):
+    r = np.where(s < 128,
+                 _div255(2 * d * s),
+                 255 - _div255(2 * (255 - d) * (255 - s)))
+    return _mix(d, r, a)
+
+def _soft_light(d, s, a):
+    # (1 - 2s) * d^2 + 2 * s * d with s, d normalized.
+    r = (2 * d * s * 255 + d * d * (255 - 2 * s) + 32512) // 65025
+    return _mix(d, r, a)
+
+def _dodge(d, s, a):
+    r = np.where(s == 255, 255,
+                 np.minimum((d * 255) // np.maximum(255 - s, 1), 255))
+    return _mix(d, r, a)
+
+def _burn(d, s, a):
+    r = np.where(s == 0, 0,
+                 np.maximum(255 - ((255 - d) * 255) // np.maximum(s, 1), 0))
+    return _mix(d, r, a)
+
+MODES = {
+    'blend': _blend,
+    'add': _add,
+    'subtract': _subtract,
+    'lightest': _lightest,
+    'darkest': _darkest,
+    'difference': _difference,
+    'exclusion': _exclusion,
+    'multiply': _multiply,
+    'screen': _screen,
+    'overlay': _overlay,
+    'hard_light': _hard_light,
+    'soft_light': _soft_light,
+    'dodge': _dodge,
+    'burn': _burn,
+}
+
+def blend(dst, src, mode, region=None):
+    """Blend the source pixels into the destination pixels.
+
+    :param dst: destination pixel buffer (modified in place).
+    :type dst: np.ndarray
+
+    :param src: source pixel buffer. Should have the same number of
+        color channels as the destination.
+    :type src: np.ndarray
+
+    :param mode: name of the blend mode (a key of ``MODES``)
+    :type mode: str
+
+    :param region: optional (x, y, width, height) rectangle restricting
+        the blend to that part of both buffers (defaults to None,
+        i.e., the whole buffer)
+    :type region: tuple | None
+
+    :raises KeyError: When the blend mode is invalid.
+
+    """
+    kernel = MODES[mode]
+
+    if region is not None:
+        x, y, w, h = region
+        dst = dst[y:(y + h), x:(x + w)]
+        src = src[y:(y + h), x:(x + w)]
+
+    dst_color = _color_channels(dst)
+    dst_alpha = _alpha_channel(dst)
+    src_color = _color_channels(src)
+    src_alpha = _alpha_channel(src)
+
+    def tile(start, stop):
+        d = dst_color[start:stop].astype(np.int32)
+        s = src_color[start:stop].astype(np.int32)
+        # Most sources are opaque, in which case we can skip the
+        # alpha weighting.
+        if src_alpha is None or src_alpha[start:stop].min() == 255:
+            a = 255
+        else:
+            a = src_alpha[start:stop].astype(np.int32)
+
+        dst_color[start:stop] = kernel(d, s, a)
+        if dst_alpha is not None:
+            np.minimum(dst_alpha[start:stop].astype(np.int32) + a, 255,
+                       out=dst_alpha[start:stop], casting='unsafe')
+
+    _run_tiled(tile, dst)
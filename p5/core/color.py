@@ -20,10 +20,13 @@ import builtins
 import colorsys
 import math
 
+import numpy as np
+
 from ..pmath import lerp
 from ..pmath import constrain
 
-__all__ = ['color_mode', 'Color']
+__all__ = ['color_mode', 'Color', 'rgb_to_hsb_array', 'hsb_to_rgb_array',
+           'gray_array']
 
 color_parse_mode = 'RGB'
 color_range = (255, 255, 255, 255)
@@ -421,3 +424,95 @@ class Color:
         :rtype: str
         """
         raise NotImplementedError()
+
+
+# Vectorized color conversions.
+#
+# These work on whole NumPy arrays of colors (for instance, the pixel
+# buffer returned by PImage.pixels_array()) with the color channels
+# along the last axis. All values are normalized, i.e., in the range
+# [0, 1]. An optional fourth (alpha) channel is passed through
+# unchanged.
+
+def _split_alpha(arr):
+    arr = np.asarray(arr, dtype=np.float64)
+    if arr.shape[-1] not in (3, 4):
+        raise ValueError("Expected 3 or 4 color channels, got {}".format(arr.shape[-1]))
+    return arr[..., :3], arr[..., 3:]
+
+def rgb_to_hsb_array(rgb):
+    """Convert an array of RGB(A) colors to HSB(A).
+
+    :param rgb: array of normalized colors with the red, green and
+        blue (and optionally alpha) components along the last axis.
+    :type rgb: np.ndarray
+
+    :returns: array of the same shape with the hue, saturation and
+        brightness (and alpha) components.
+    :rtype: np.ndarray
+
+    """
+    arr, alpha = _split_alpha(rgb)
+    r, g, b = arr[..., 0], arr[..., 1], arr[..., 2]
+
+    maxc = arr.max(axis=-1)
+    minc = arr.min(axis=-1)
+    delta = maxc - minc
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sat = np.where(maxc > 0, delta / maxc, 0)
+        rc = np.where(delta > 0, (maxc - r) / delta, 0)
+        gc = np.where(delta > 0, (maxc - g) / delta, 0)
+        bc = np.where(delta > 0, (maxc - b) / delta, 0)
+
+    hue = np.where(r == maxc, bc - gc,
+                   np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    hue = np.where(delta > 0, (hue / 6.0) % 1.0, 0)
+
+    return np.concatenate([np.stack([hue, sat, maxc], axis=-1), alpha],
+                          axis=-1)
+
+def hsb_to_rgb_array(hsb):
+    """Convert an array of HSB(A) colors to RGB(A).
+
+    :param hsb: array of normalized colors with the hue, saturation
+        and brightness (and optionally alpha) components along the
+        last axis.
+    :type hsb: np.ndarray
+
+    :returns: array of the same shape with the red, green and blue
+        (and alpha) components.
+    :rtype: np.ndarray
+
+    """
+    arr, alpha = _split_alpha(hsb)
+    h, s, v = arr[..., 0], arr[..., 1], arr[..., 2]
+
+    i = np.floor(h * 6.0)
+    f = (h * 6.0) - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = i.astype(np.int64) % 6
+
+    conditions = [i == k for k in range(6)]
+    r = np.select(conditions, [v, q, p, p, t, v])
+    g = np.select(conditions, [t, v, v, q, p, p])
+    b = np.select(conditions, [p, p, t, v, v, q])
+
+    return np.concatenate([np.stack([r, g, b], axis=-1), alpha], axis=-1)
+
+def gray_array(rgb):
+    """Return the gray-scale values for an array of RGB(A) colors.
+
+    :param rgb: array of normalized colors with the red, green and
+        blue (and optionally alpha) components along the last axis.
+    :type rgb: np.ndarray
+
+    :returns: array of luminance values (one less dimension than the
+        input array).
+    :rtype: np.ndarray
+
+    """
+    arr, _ = _split_alpha(rgb)
+    return arr.dot([0.299, 0.587, 0.114])
@@ -0,0 +1,261 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Image filters working in place on (height, width, channels) uint8
+pixel buffers.
+
+All filters leave the alpha channel (if any) untouched, except for
+the blurs (which blur all channels) and 'opaque' / 'opacity' (which
+only modify the alpha channel).
+
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import math
+import os
+
+import numpy as np
+
+# Large images are processed in tiles of TILE_ROWS rows spread across
+# a thread pool. Most NumPy operations release the GIL, so this makes
+# use of multiple cores without copying the image around. Images with
+# fewer than PARALLEL_THRESHOLD pixels are processed in one go.
+TILE_ROWS = 64
+PARALLEL_THRESHOLD = 512 * 512
+
+_executor = None
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+    return _executor
+
+def _run_tiled(func, data):
+    """Call ``func(row_start, row_stop)`` over row tiles of the data.
+
+    """
+    height, width = data.shape[:2]
+    if height * width < PARALLEL_THRESHOLD:
+        func(0, height)
+        return
+
+    executor = _get_executor()
+    futures = [executor.submit(func, start, min(start + TILE_ROWS, height))
+               for start in range(0, height, TILE_ROWS)]
+    for future in futures:
+        future.result()
+
+def _color_channels(data):
+    """Return a view of the color (non-alpha) channels of the data."""
+    if data.shape[2] in (2, 4):
+        return data[:, :, :-1]
+    return data
+
+def _alpha_channel(data):
+    """Return a view of the alpha channel of the data (or None)."""
+    if data.shape[2] in (2, 4):
+        return data[:, :, -1:]
+    return None
+
+def _luminance(data):
+    """Return the luminance of the (color channels of) the data."""
+    if data.shape[2] == 1:
+        return data[:, :, 0].astype(np.float32)
+    return data.dot(np.array([0.299, 0.587, 0.114], dtype=np.float32))
+
+def _apply_lut(data, lut):
+    """Map all values in the data through the given lookup table."""
+    def tile(start, stop):
+        data[start:stop] = lut[data[start:stop]]
+    _run_tiled(tile, data)
+
+##
+## Separable passes.
+##
+## Each pass reads rows [start - radius, stop + radius) from `src`
+## (replicating edge pixels) and writes rows [start, stop) of `dst`.
+## A 2D filter is a horizontal pass from the image into a temporary
+## buffer followed by a vertical pass from the temporary buffer back
+## into the image.
+##
+
+def _padded_rows(src, axis, radius, start, stop):
+    if axis == 0:
+        idx = np.clip(np.arange(start - radius, stop + radius),
+                      0, src.shape[0] - 1)
+        return src[idx]
+    return np.pad(src[start:stop], ((0, 0), (radius, radius), (0, 0)),
+                  mode='edge')
+
+def _taps(padded, axis, size, num_taps):
+    for i in range(num_taps):
+        if axis == 0:
+            yield padded[i:(i + size)]
+        else:
+            yield padded[:, i:(i + size)]
+
+def _convolve_pass(src, dst, start, stop, axis, kernel):
+    radius = len(kernel) // 2
+    padded = _padded_rows(src, axis, radius, start, stop)
+    padded = padded.astype(np.float32, copy=False)
+    size = (stop - start) if axis == 0 else src.shape[1]
+
+    # The kernels are symmetric, so we add up the mirrored taps first
+    # and halve the number of multiplications.
+    taps = list(_taps(padded, axis, size, len(kernel)))
+    acc = kernel[radius] * taps[radius]
+    scratch = np.empty_like(acc)
+    for i in range(radius):
+        np.add(taps[i], taps[-(i + 1)], out=scratch)
+        scratch *= kernel[i]
+        acc += scratch
+
+    if dst.dtype == np.uint8:
+        np.clip(acc, 0, 255, out=acc)
+        np.rint(acc, out=acc)
+    dst[start:stop] = acc
+
+def _rank_pass(src, dst, start, stop, axis, radius, reduce):
+    padded = _padded_rows(src, axis, radius, start, stop)
+    size = (stop - start) if axis == 0 else src.shape[1]
+
+    taps = _taps(padded, axis, size, 2 * radius + 1)
+    acc = next(taps).copy()
+    for tap in taps:
+        reduce(acc, tap, out=acc)
+    dst[start:stop] = acc
+
+def _separable(data, pass_func, tmp_dtype):
+    tmp = np.empty(data.shape, dtype=tmp_dtype)
+    _run_tiled(functools.partial(pass_func, data, tmp, axis=1), data)
+    _run_tiled(functools.partial(pass_func, tmp, data, axis=0), data)
+
+def _gaussian_kernel(sigma):
+    radius = max(1, int(math.ceil(3 * sigma)))
+    x = np.arange(-radius, radius + 1, dtype=np.float32)
+    kernel = np.exp(-(x * x) / (2 * sigma * sigma))
+    return kernel / kernel.sum()
+
+def _box_kernel(radius):
+    whole = int(radius)
+    fraction = radius - whole
+    if fraction > 0:
+        kernel = np.ones(2 * whole + 3, dtype=np.float32)
+        kernel[0] = kernel[-1] = fraction
+    else:
+        kernel = np.ones(2 * whole + 1, dtype=np.float32)
+    return kernel / kernel.sum()
+
+##
+## Filters.
+##
+
+def gaussian_blur(data, radius=1.0):
+    """Blur the data with a gaussian kernel (radius is the standard
+    deviation of the gaussian)."""
+    if radius <= 0:
+        return
+    kernel = _gaussian_kernel(radius)
+    _separable(data, functools.partial(_convolve_pass, kernel=kernel),
+               np.float32)
+
+def box_blur(data, radius=1.0):
+    """Blur the data by averaging over a (2 * radius + 1) wide box."""
+    if radius <= 0:
+        return
+    kernel = _box_kernel(radius)
+    _separable(data, functools.partial(_convolve_pass, kernel=kernel),
+               np.float32)
+
+def erode(data, radius=1):
+    """Replace each color value by the minimum in its neighborhood."""
+    radius = max(1, int(radius))
+    _separable(_color_channels(data),
+               functools.partial(_rank_pass, radius=radius,
+                                 reduce=np.minimum),
+               np.uint8)
+
+def dilate(data, radius=1):
+    """Replace each color value by the maximum in its neighborhood."""
+    radius = max(1, int(radius))
+    _separable(_color_channels(data),
+               functools.partial(_rank_pass, radius=radius,
+                                 reduce=np.maximum),
+               np.uint8)
+
+def gray(data, param=None):
+    """Convert the color channels to their luminance."""
+    color = _color_channels(data)
+    if color.shape[2] == 1:
+        return
+
+    def tile(start, stop):
+        lum = _luminance(color[start:stop])
+        color[start:stop] = np.rint(lum)[:, :, np.newaxis]
+    _run_tiled(tile, data)
+
+def threshold(data, level=0.5):
+    """Set pixels brighter than the level (between 0 and 1) to white
+    and the remaining pixels to black."""
+    color = _color_channels(data)
+    cutoff = 255 * level
+
+    def tile(start, stop):
+        lum = _luminance(color[start:stop])
+        color[start:stop] = np.where(lum >= cutoff, 255, 0)[:, :, np.newaxis]
+    _run_tiled(tile, data)
+
+def invert(data, param=None):
+    """Invert the color channels."""
+    lut = 255 - np.arange(256, dtype=np.uint8)
+    _apply_lut(_color_channels(data), lut)
+
+def posterize(data, levels=2):
+    """Limit each color channel to the given number of levels (between
+    2 and 255)."""
+    levels = min(255, max(2, int(levels)))
+    values = np.arange(256, dtype=np.int32)
+    lut = (((values * levels) >> 8) * 255) // (levels - 1)
+    _apply_lut(_color_channels(data), lut.astype(np.uint8))
+
+def opacity(data, amount=0.5):
+    """Set the alpha channel to the given amount (between 0 and 1)."""
+    alpha = _alpha_channel(data)
+    if alpha is not None:
+        alpha[:] = int(round(255 * amount))
+
+def opaque(data, param=None):
+    """Make the data fully opaque."""
+    opacity(data, 1.0)
+
+FILTERS = {
+    'blur': gaussian_blur,
+    'gaussian_blur': gaussian_blur,
+    'box_blur': box_blur,
+    'erode': erode,
+    'dilate': dilate,
+    'gray': gray,
+    'grey': gray,
+    'grayscale': gray,
+    'threshold': threshold,
+    'invert': invert,
+    'posterize': posterize,
+    'opacity': opacity,
+    'opaque': opaque,
+}
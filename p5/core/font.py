@@ -20,19 +20,20 @@ import contextlib
 import functools
 import textwrap
 
-import PIL
-from PIL import Image
-from PIL import ImageDraw
-from PIL import ImageFont
-
 from .. import sketch
+from .._lazy import lazy_import
 from .image import image
 from .image import PImage
 from .structure import push_style
 
 __all__ = ['create_font', 'load_font', 'text', 'text_font',]
 
-_font_family = ImageFont.load_default()
+Image = lazy_import('PIL.Image')
+ImageDraw = lazy_import('PIL.ImageDraw')
+ImageFont = lazy_import('PIL.ImageFont')
+
+# The default font is loaded the first time text is drawn.
+_font_family = None
 
 def create_font(name, size=None):
     """Create the given font at the appropriate size.
@@ -79,6 +80,10 @@ def text(text_string, position, wrap_at=None):
     :rtype: str
 
     """
+    global _font_family
+    if _font_family is None:
+        _font_family = ImageFont.load_default()
+
     size = (builtins.width, builtins.height)
     canvas = Image.new("RGBA", size, color=(0, 0, 0, 0))
     canvas_draw = ImageDraw.Draw(canvas)
@@ -16,34 +16,61 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
 import builtins
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import contextlib
 import functools
+import os
+import threading
 
 import numpy as np
-import PIL
-from PIL import Image
-from PIL import ImageFilter
-from PIL import ImageChops
-from PIL import ImageOps
-from vispy import gloo
 
+from . import blending
 from . import color
+from . import filters
 from .. import sketch
-from ..pmath import constrain
+from .._lazy import lazy_import
 from ..pmath.utils import _is_numeric
-from .structure import push_style
 
-__all__ = ['PImage', 'image', 'load_image', 'image_mode',
-           'load_pixels']
+__all__ = ['PImage', 'image', 'load_image', 'load_image_async',
+           'preload', 'image_mode', 'load_pixels']
+
+Image = lazy_import('PIL.Image')
+gloo = lazy_import('vispy.gloo')
 
 _image_mode = 'corner'
 
+# Images are decoded on a thread pool. The decoded images are cached
+# (by their absolute path) along with the modification time of the
+# file, so loading an unchanged file again doesn't decode it again.
+# Only the MAX_CACHED_IMAGES most recently loaded files are kept.
+MAX_CACHED_IMAGES = 32
+_loader = None
+_image_cache = OrderedDict()
+_image_cache_lock = threading.Lock()
+
+def _ensure_sized(func):
+    """Loads the image if required before calling the function.
+
+    Unlike :func:`_ensure_loaded`, this doesn't read back images whose
+    most recent data is on the GPU.
+
+    """
+    @functools.wraps(func)
+    def rfunc(instance, *args, **kwargs):
+        if instance._img_data is None or instance._reload:
+            instance._load()
+        return func(instance, *args, **kwargs)
+    return rfunc
+
 def _ensure_loaded(func):
     """Reloads the image if required before calling the function.
 
     """
     @functools.wraps(func)
     def rfunc(instance, *args, **kwargs):
+        if instance._img_on_gpu:
+            instance._read_texture()
         if instance._img_data is None or instance._reload:
             instance._load()
         return func(instance, *args, **kwargs)
@@ -79,6 +106,10 @@ class PImage:
 
     :type fmt: str
 
+    Images drawn smaller than their actual size are drawn using a
+    downscaled copy of the image (a "mipmap"). Set the ``mipmap``
+    attribute of the image to False to always draw the full image.
+
     """
     def __init__(self, width, height, fmt='RGBA'):
         self._width = width
@@ -94,10 +125,20 @@ class PImage:
         self._img = None
         self._img_format = format_map[fmt.lower()]
         self._img_texture = None
+        self._img_texture_dirty = False
+        self._img_on_gpu = False
         self._img_data = None
+        self._img_future = None
+
+        # Position of the image in the renderer's texture atlas.
+        self._atlas_entry = None
+        self._atlas_dirty = False
+
+        self.mipmap = True
+        self._mipmaps = []
 
     @property
-    @_ensure_loaded
+    @_ensure_sized
     def width(self):
         """The width of the image
 
@@ -110,7 +151,7 @@ class PImage:
         self.size = (new_width, self._height)
 
     @property
-    @_ensure_loaded
+    @_ensure_sized
     def height(self):
         """The height of the image
 
@@ -123,7 +164,7 @@ class PImage:
         self.size = (self._width, new_height)
 
     @property
-    @_ensure_loaded
+    @_ensure_sized
     def size(self):
         """The size of the image
 
@@ -132,12 +173,13 @@ class PImage:
         return self._size
 
     @size.setter
+    @_ensure_loaded
     def size(self, new_size):
         self._img = self._img.resize(new_size)
         self._reload = True
 
     @property
-    @_ensure_loaded
+    @_ensure_sized
     def aspect_ratio(self):
         """Return the aspect ratio of the image.
 
@@ -146,11 +188,17 @@ class PImage:
         return self._width / self._height
 
     @property
-    @_ensure_loaded
     def _texture(self):
+        if self._img_on_gpu:
+            return self._img_texture
+
         if self._img_texture is None:
             texdata = self._data.astype(np.float32) / 255.0
             self._img_texture = gloo.Texture2D(texdata, interpolation='linear')
+        elif self._img_texture_dirty:
+            texdata = self._data.astype(np.float32) / 255.0
+            self._img_texture.set_data(texdata)
+        self._img_texture_dirty = False
         return self._img_texture
 
     @property
@@ -159,6 +207,10 @@ class PImage:
         return self._img_data
 
     def _load(self):
+        if self._img_future is not None:
+            self._img = self._img_future.result().copy()
+            self._img_future = None
+
         if self._img is None:
             self._img = Image.new(self._img_format, (self._width, self._height))
 
@@ -167,14 +219,130 @@ class PImage:
         self._height = height
         self._size = (width, height)
 
-        data = np.array(self._img.getdata(), dtype=np.uint8)
+        data = np.array(self._img, dtype=np.uint8)
 
         self._channels = len(self._img.getbands())
 
         self._img_data = data.reshape(height, width, self._channels)
         self._img_texture = None
+        self._img_on_gpu = False
+        self._atlas_dirty = True
+        self._mipmaps = []
         self._reload = False
 
+    def _update_from_data(self):
+        """Sync the PIL image and the texture with the pixel buffer.
+
+        This should be called (once) after the contents of
+        ``_img_data`` have been modified in place. The texture is only
+        marked as stale and gets re-uploaded the next time the image
+        is drawn.
+
+        """
+        if self._channels == 1:
+            self._img = Image.fromarray(self._img_data[:, :, 0], self._img.mode)
+        else:
+            self._img = Image.fromarray(self._img_data, self._img.mode)
+        self._img_texture_dirty = True
+        self._atlas_dirty = True
+        self._mipmaps = []
+
+    def _read_texture(self):
+        """Read the image data back from the GPU.
+
+        """
+        data = sketch.renderer.read_texture(self._img_texture)
+        channels = {
+            1: [0],
+            2: [0, 3],
+            3: [0, 1, 2],
+            4: [0, 1, 2, 3],
+        }
+        self._img_data = data[:, :, channels[self._channels]]
+        self._img_on_gpu = False
+        self._update_from_data()
+        self._img_texture_dirty = False
+
+    def _mipmap(self, level):
+        """Get a copy of the image downscaled by a factor of 2 ** level.
+
+        Each level is computed from the previous one by averaging
+        blocks of 2x2 pixels and cached until the image is modified.
+        Images on the GPU are never downscaled.
+
+        :param level: the level of the mipmap (0 being the image
+            itself)
+        :type level: int
+
+        :rtype: p5.PImage
+
+        """
+        if level == 0 or self._img_on_gpu:
+            return self
+
+        width, height = self.size
+        level = min(level, int(np.log2(min(width, height))))
+
+        while len(self._mipmaps) < level:
+            previous = self._mipmaps[-1] if self._mipmaps else self
+            img = previous._img
+            if img.mode not in ['L', 'LA', 'RGB', 'RGBA']:
+                img = img.convert('RGBA')
+            img = img.reduce(2)
+
+            lower = PImage(*img.size)
+            lower._img = img
+            self._mipmaps.append(lower)
+
+        if level == 0:
+            return self
+        return self._mipmaps[level - 1]
+
+    def _render(self, location, size):
+        """Draw the image with its top-left corner at the given
+        location.
+
+        """
+        sketch.render_image(self, location, size)
+
+    def _set_gpu_texture(self, texture):
+        """Replace the image data with the given texture.
+
+        The texture stays on the GPU until the image data is required
+        on the CPU.
+
+        """
+        if self._img_texture is not None and self._img_texture is not texture:
+            sketch.renderer.release_texture(self._img_texture)
+        self._img_texture = texture
+        self._img_texture_dirty = False
+        self._img_on_gpu = True
+        self._mipmaps = []
+
+    def _convert_format(self, alpha=False):
+        """Convert the image to one of the formats supported by filters
+        and blend modes ('L', 'LA', 'RGB', 'RGBA').
+
+        :param alpha: Toggles whether the image should have an alpha
+            channel (defaults to False).
+        :type alpha: bool
+
+        """
+        if self._img is None:
+            self._load()
+
+        target_mode = self._img.mode
+        if target_mode not in ['L', 'LA', 'RGB', 'RGBA']:
+            target_mode = 'RGBA'
+        elif alpha and target_mode in ['L', 'RGB']:
+            target_mode = target_mode + 'A'
+
+        if target_mode != self._img.mode:
+            if self._img_on_gpu:
+                self._read_texture()
+            self._img = self._img.convert(target_mode)
+            self._load()
+
     @_ensure_loaded
     def _get_pixel(self, key):
         """Return the pixel color at the given positions.
@@ -195,7 +363,7 @@ class PImage:
             raise KeyError("Invalid pixel coordinates {}.".format(key))
 
         with _restore_color_mode():
-            col = color.Color(*self._img.getpixel((px, py)))
+            col = color.Color(*self._img_data[py, px].tolist())
 
         return col
 
@@ -251,6 +419,7 @@ class PImage:
 
         return self._get_patch(key)
 
+    @_ensure_loaded
     def _set_pixel(self, key, point):
         # since both posx and posy are numeric, we are only pasting in
         # a "single" color. Hence, whenever patch is a PImage, we
@@ -294,8 +463,9 @@ class PImage:
             else:
                 raise ValueError("Image has unexpected number of channels")
 
-        pixel_position = int(key[0]), int(key[1])
-        self._img.putpixel(pixel_position, pixel_value)
+        px, py = int(key[0]), int(key[1])
+        self._img.putpixel((px, py), pixel_value)
+        self._img_data[py, px] = pixel_value
 
     @_ensure_loaded
     def _set_patch(self, key, patch):
@@ -318,7 +488,7 @@ class PImage:
         else:
             self._img_data[ky, kx, :] = patch._data[:, :, :]
 
-        self._img = Image.fromarray(self._img_data, self._img.mode)
+        self._update_from_data()
 
     def __setitem__(self, key, patch):
         """Paste the given `patch` into the current image.
@@ -330,7 +500,41 @@ class PImage:
             self._set_pixel(key, patch)
         else:
             self._set_patch(key, patch)
-        self._reload = True
+        self._img_texture_dirty = True
+        self._atlas_dirty = True
+        self._mipmaps = []
+
+    def done(self):
+        """Check if the image has finished loading.
+
+        Images returned by :func:`p5.load_image_async` are decoded in
+        the background. All other images are always done.
+
+        :rtype: bool
+        """
+        return self._img_future is None or self._img_future.done()
+
+    def result(self, timeout=None):
+        """Wait for the image to finish loading.
+
+        Note that using the image (say, drawing it or reading its
+        size) automatically waits for it to load.
+
+        :param timeout: maximum number of seconds to wait (defaults to
+            None, i.e., wait as long as required)
+        :type timeout: float | None
+
+        :returns: The image itself.
+        :rtype: p5.PImage
+
+        :raises concurrent.futures.TimeoutError: When the image didn't
+            load within the timeout.
+
+        """
+        if self._img_future is not None:
+            self._img_future.result(timeout)
+            self._load()
+        return self
 
     def load_pixels(self):
         """Load internal pixel data for the image.
@@ -340,12 +544,44 @@ class PImage:
         manually load the internal image data.
 
         """
-        self._load()
+        if self._img_on_gpu:
+            self._read_texture()
+        else:
+            self._load()
+
+    @contextlib.contextmanager
+    @_ensure_loaded
+    def pixels_array(self):
+        """Expose the pixel buffer of the image as a NumPy array.
+
+        This context manager yields a writable (height, width,
+        channels) array of ``uint8`` values that shares memory with
+        the image. Modifying the array modifies the image directly and
+        is much faster than setting pixels one at a time through
+        :meth:`p5.PImage.__setitem__`. The internal image and the
+        texture used to display it are synced exactly once, when the
+        program leaves the context manager ::
+
+            with img.pixels_array() as px:
+                px[:, :, 0] = 255 - px[:, :, 0]
+
+        The helpers :meth:`p5.rgb_to_hsb_array`,
+        :meth:`p5.hsb_to_rgb_array` and :meth:`p5.gray_array` can be
+        used to do color conversions on the whole array at once.
+
+        :returns: the pixel buffer of the image.
+        :rtype: np.ndarray
+
+        """
+        try:
+            yield self._img_data
+        finally:
+            self._update_from_data()
 
     def mask(self, image):
         raise NotImplementedError
 
-    def filter(self, kind, param=None):
+    def filter(self, kind, param=None, gpu=False):
         """Filter the image.
 
         :param kind: The kind of filter to use on the image. Should be
@@ -358,67 +594,83 @@ class PImage:
             (defaults to None). Only required for 'threshold' (the
             threshold to use, param should be a value between 0 and 1;
             defaults to 0.5), 'posterize' (limiting value for each
-            channel should be between 2 and 255), and 'blur' (gaussian
-            blur radius, defaults to 1.0).
+            channel should be between 2 and 255; defaults to 2),
+            'blur' (gaussian blur radius, defaults to 1.0), and
+            'erode' / 'dilate' (radius of the neighborhood, defaults
+            to 1).
 
         :type param: int | float | None
 
+        :param gpu: Toggles whether the filter should run as a shader
+            on the image's texture (defaults to False). The result
+            stays on the GPU until the pixels of the image are
+            accessed, so several filters / blends can be chained
+            without copying the image back and forth. Only available
+            while the sketch is running. The blur shaders sample at
+            most 64 pixels on each side (a gaussian radius of about
+            21, or a box / erode / dilate radius of 64); larger
+            filters fall back to the CPU.
+
+        :type gpu: bool
+
         """
         filter_name = kind.lower()
+        if filter_name not in filters.FILTERS:
+            raise ValueError("Unknown filter")
+
         if param is None:
             default_values = {
                 'threshold': 0.5,
                 'blur': 1.0,
                 'gaussian_blur': 1.0,
                 'box_blur': 1.0,
-                'posterize': 1,
+                'erode': 1,
+                'dilate': 1,
+                'posterize': 2,
                 'opacity': 0.5,
             }
             param = default_values.get(filter_name, None)
 
-        if filter_name in ['blur', 'gaussian_blur']:
-            fim = self._img.filter(ImageFilter.GaussianBlur(radius=param))
-            self._img = fim
-        elif filter_name == 'box_blur':
-            self._img = self._img.filter(ImageFilter.BoxBlur(param))
-        elif filter_name in ['gray', 'grey', 'grayscale']:
-            self._img = ImageOps.grayscale(self._img)
-        elif filter_name == 'opaque':
-            self._img.putalpha(255)
-        elif filter_name == 'opacity':
-            self._img.putalpha(int(param * 255))
-        elif filter_name == 'invert':
-            self._img = ImageOps.invert(self._img)
-        elif filter_name == 'posterize':
-            nbits = 0
-            while int(param) != 0:
-                param = param >> 1
-                nbits = nbits + 1
-            nbits = constrain(nbits, 1, 8)
-            self._img = ImageOps.posterize(self._img, nbits)
-        elif filter_name == 'threshold':
-            dat = np.asarray(ImageOps.grayscale(self._img)).copy()
-            dat[dat < int(128 * param)] = 0
-            dat[dat >= int(128 * param)] = 255
-            self._img = Image.fromarray(dat)
-        elif filter_name in ['erode', 'dilate']:
-            raise NotImplementedError
+        # The filters work in place on the pixel buffer and hence,
+        # can't add an alpha channel to the image. For most formats
+        # this doesn't matter (they are already opaque) but setting
+        # the opacity requires an alpha channel.
+        self._convert_format(alpha=(filter_name == 'opacity'))
+
+        if gpu and sketch.renderer.filter_fits_shader(filter_name, param):
+            texture = sketch.renderer.filter_texture(self._texture,
+                                                     filter_name, param)
+            self._set_gpu_texture(texture)
         else:
-            raise ValueError("Unknown filter")
+            self._filter_pixels(filter_name, param)
 
-        self._reload = True
+    @_ensure_loaded
+    def _filter_pixels(self, filter_name, param):
+        with self.pixels_array() as pixel_data:
+            filters.FILTERS[filter_name](pixel_data, param)
 
-    def blend(self, other, mode):
+    def blend(self, other, mode, region=None, gpu=False):
         """Blend the specified image using the given blend mode.
 
         :param other: The image to be blended to the current image.
         :type other: p5.PImage
 
         :param mode: Blending mode to use. Should be one of { 'BLEND',
-            'ADD', 'SUBTRACT', 'LIGHTEST', 'DARKEST', 'MULTIPLY',
-            'SCREEN',}
+            'ADD', 'SUBTRACT', 'LIGHTEST', 'DARKEST', 'DIFFERENCE',
+            'EXCLUSION', 'MULTIPLY', 'SCREEN', 'OVERLAY', 'HARD_LIGHT',
+            'SOFT_LIGHT', 'DODGE', 'BURN' }
         :type mode: str
 
+        :param region: Optional (x, y, width, height) rectangle. When
+            given, only this region of both images is blended
+            (defaults to None, i.e., the whole image).
+        :type region: tuple | None
+
+        :param gpu: Toggles whether the images should be blended by a
+            shader on the GPU (defaults to False). See
+            :meth:`p5.PImage.filter` for details.
+        :type gpu: bool
+
         :raises AssertionError: When the dimensions of img do not
             match the dimensions of the current image.
 
@@ -426,52 +678,38 @@ class PImage:
 
         """
         mode = mode.lower()
+        if mode not in blending.MODES:
+            raise KeyError("'{}' blend mode not found".format(mode.upper()))
         assert self.size == other.size, "Images are of different sizes!"
 
-        if self._img.mode != 'RGBA':
-            self._img = self._img.convert('RGBA')
-            self._reload = True
+        self._convert_format()
 
-        if other._img.mode != 'RGBA':
-            other_img = other._img.convert('RGBA')
+        if gpu:
+            texture = sketch.renderer.blend_textures(self._texture,
+                                                     other._texture,
+                                                     mode, region)
+            self._set_gpu_texture(texture)
         else:
-            other_img = other._img
-
-        # todo: implement missing filters -- abhikpal (2018-08-14)
-        if mode == 'blend':
-            self._img = ImageChops.composite(self._img, other_img, self._img)
-        elif mode == 'add':
-            self._img = ImageChops.add(self._img, other_img)
-        elif mode == 'subtract':
-            self._img = ImageChops.subtract(self._img, other_img)
-        elif mode == 'lightest':
-            self._img = ImageChops.lighter(self._img, other_img)
-        elif mode == 'darkest':
-            self._img = ImageChops.darker(self._img, other_img)
-        elif mode == 'difference':
-            raise NotImplementedError
-        elif mode == 'exclusion':
-            raise NotImplementedError
-        elif mode == 'multiply':
-            self._img = ImageChops.multiply(self._img, other_img)
-        elif mode == 'screen':
-            self._img = ImageChops.screen(self._img, other_img)
-        elif mode == 'overlay':
-            raise NotImplementedError
-        elif mode == 'hard_light':
-            raise NotImplementedError
-        elif mode == 'soft_light':
-            raise NotImplementedError
-        elif mode == 'dodge':
-            raise NotImplementedError
-        elif mode == 'burn':
-            raise NotImplementedError
-        else:
-            raise KeyError("'{}' blend mode not found".format(mdoe.upper()))
+            self._blend_pixels(other, mode, region)
 
-        self._reload = True
         return self
 
+    @_ensure_loaded
+    def _blend_pixels(self, other, mode, region):
+        # The source only needs to be converted when its color
+        # channels don't match the ones of the current image.
+        other_data = other._data
+        target_mode = self._img.mode.rstrip('A')
+        if other._img.mode in ['LA', 'RGBA']:
+            target_mode = target_mode + 'A'
+
+        if other._img.mode != target_mode:
+            converted = np.asarray(other._img.convert(target_mode))
+            other_data = converted.reshape(other.height, other.width, -1)
+
+        with self.pixels_array() as pixel_data:
+            blending.blend(pixel_data, other_data, mode, region)
+
     @_ensure_loaded
     def save(self, file_name):
         """Save the image into a file
@@ -519,7 +757,7 @@ def image(img, location, size=None):
         sx = sx - lx
         sy = sy - ly
 
-    sketch.render_image(img, (lx, ly), (sx, sy))
+    img._render((lx, ly), (sx, sy))
 
 def image_mode(mode):
     """Modify the locaton from which the images are drawn.
@@ -554,6 +792,45 @@ def image_mode(mode):
         raise ValueError("Unknown image mode!")
     _image_mode = mode.lower()
 
+def _get_loader():
+    global _loader
+    if _loader is None:
+        _loader = ThreadPoolExecutor()
+    return _loader
+
+def _decode(filename):
+    img = Image.open(filename)
+    img.load()
+    return img
+
+def _uncache_failed(path, future):
+    if future.exception() is not None:
+        with _image_cache_lock:
+            if _image_cache.get(path, (None, None))[1] is future:
+                del _image_cache[path]
+
+def _load_cached(filename):
+    """Get a future for the decoded PIL image in the given file.
+
+    The image is only decoded when it isn't in the cache or the file
+    was modified since it was last loaded.
+
+    """
+    path = os.path.abspath(filename)
+    mtime = os.path.getmtime(path)
+
+    with _image_cache_lock:
+        cached_mtime, future = _image_cache.get(path, (None, None))
+        if future is None or cached_mtime != mtime:
+            future = _get_loader().submit(_decode, path)
+            _image_cache[path] = (mtime, future)
+        _image_cache.move_to_end(path)
+        while len(_image_cache) > MAX_CACHED_IMAGES:
+            _image_cache.popitem(last=False)
+
+    future.add_done_callback(functools.partial(_uncache_failed, path))
+    return future
+
 def load_image(filename):
     """Load an image from the given filename.
 
@@ -562,7 +839,8 @@ def load_image(filename):
 
     In most cases, load all images in setup() or outside the draw()
     call to preload them at the start of the program. Loading images
-    inside draw() will reduce the speed of a program. 
+    inside draw() will reduce the speed of a program. Decoded images
+    are cached, so loading the same (unmodified) file again is fast.
 
     :param filename: Filename (or path)of the given image. The
         file-extennsion is automatically inferred.
@@ -574,35 +852,108 @@ def load_image(filename):
     """
     # todo: add support for loading images from URLs -- abhikpal
     # (2018-08-14)
-    img = Image.open(filename)
+    img = _load_cached(filename).result().copy()
     w, h = img.size
     pimg = PImage(w, h)
     pimg._img = img
     return pimg
 
+def load_image_async(filename):
+    """Start loading an image from the given filename in the background.
+
+    The image is returned right away and decoded on a thread pool.
+    Using the image waits for it to finish loading. Use
+    :meth:`p5.PImage.done` to check if the image is ready without
+    waiting.
+
+    :param filename: Filename (or path) of the given image.
+    :type filename: str
+
+    :returns: An :class:`p5.PImage` instance that gets the image data
+        once it has been decoded.
+    :rtype: :class:`p5.PImage`
+
+    :raises FileNotFoundError: When the file doesn't exist. Errors
+        while decoding the image are raised when the image is used.
+
+    """
+    pimg = PImage(1, 1)
+    pimg._img_future = _load_cached(filename)
+    return pimg
+
+def preload(filenames):
+    """Start loading several images in the background.
+
+    :param filenames: list of filenames (or paths) of the images.
+    :type filenames: list
+
+    :returns: A list of :class:`p5.PImage` instances (see
+        :func:`p5.load_image_async`) in the same order as the
+        filenames.
+    :rtype: list
+
+    """
+    return [load_image_async(filename) for filename in filenames]
+
+def _modified_regions(old_data, new_data):
+    """Find the regions that differ between two pixel buffers.
+
+    Consecutive modified rows are grouped into a single region and
+    each region is trimmed to the modified columns.
+
+    :returns: a list of (row slice, column slice) tuples.
+    :rtype: list
+
+    """
+    changed = np.any(old_data != new_data, axis=-1)
+    changed_rows = np.flatnonzero(np.any(changed, axis=1))
+    if len(changed_rows) == 0:
+        return []
+
+    breaks = np.flatnonzero(np.diff(changed_rows) > 1)
+    starts = np.concatenate([[changed_rows[0]], changed_rows[breaks + 1]])
+    stops = np.concatenate([changed_rows[breaks], [changed_rows[-1]]]) + 1
+
+    regions = []
+    for start, stop in zip(starts, stops):
+        changed_cols = np.flatnonzero(np.any(changed[start:stop], axis=0))
+        regions.append((slice(int(start), int(stop)),
+                        slice(int(changed_cols[0]), int(changed_cols[-1]) + 1)))
+    return regions
+
 @contextlib.contextmanager
 def load_pixels():
     """Load a snapshot of the display window into the ``pixels`` Image.
-    
-    This context manager loads data into the global ``pixels`` Image.
-    Once the program execution leaves the context manager, all changes
-    to the image are written to the main display.
+
+    This context manager loads data into the global ``pixels`` Image
+    and yields its pixel buffer, a (height, width, 3) NumPy array
+    that can be modified directly ::
+
+        with load_pixels() as px:
+            px[:10, :, :] = 0
+
+    Once the program execution leaves the context manager, the
+    regions of the image that were changed are written to the main
+    display. Nothing is written when the pixels were not modified (or
+    when the body of the context manager raises an exception).
 
     """
     pixels = PImage(builtins.width, builtins.height, 'RGB')
     sketch.renderer.flush_geometry()
-    pixel_data = sketch.renderer.fbuffer.read(mode='color', alpha=False)
+    pixel_data = sketch.renderer.read_pixels()
 
     pixels._img = Image.fromarray(pixel_data)
     builtins.pixels = pixels
 
-    pixels._load()
-
-    yield
+    try:
+        pixels._load()
+        snapshot = pixels._img_data.copy()
 
-    with push_style():
-        image_mode('corner')
-        sketch.renderer.tint_enabled = False
-        image(builtins.pixels, (0, 0))
+        yield pixels._img_data
 
-    builtins.pixels = None
+        new_data = builtins.pixels._data
+        for rows, cols in _modified_regions(snapshot, new_data):
+            sketch.renderer.write_pixels(new_data[rows, cols],
+                                         (cols.start, rows.start))
+    finally:
+        builtins.pixels = None
@@ -66,6 +66,52 @@ MIN_POINT_ACCURACY = 20
 MAX_POINT_ACCURACY = 200
 POINT_ACCURACY_FACTOR = 10
 
+# Fewest subdivisions of a full ellipse at any detail level.
+MIN_DETAIL_ACCURACY = 4
+
+def _detail_steps(resolution):
+    """Number of segments to use for a curve at the current detail
+    level."""
+    return max(1, int(round(resolution * sketch.renderer.detail_level)))
+
+def _flatten(basis, to_bezier, points, resolution):
+    """Get the vertices of a cubic curve.
+
+    :param basis: (4, 4) basis matrix of the curve.
+    :type basis: np.ndarray
+
+    :param to_bezier: (4, 4) matrix converting the control points to
+        Bezier control points (None for Bezier curves).
+    :type to_bezier: np.ndarray | None
+
+    :param points: the four control points of the curve.
+    :type points: list
+
+    :param resolution: number of segments to use unless the curve is
+        flattened adaptively (see :meth:`p5.curve_flatness`).
+    :type resolution: int
+
+    :returns: (N, 2) array of vertices along the curve.
+    :rtype: np.ndarray
+
+    """
+    control = np.array([[p[0], p[1]] for p in points], dtype=np.float64)
+
+    tolerance = curves.flatness_tolerance
+    if tolerance is None:
+        steps = resolution
+    else:
+        # Measure the curve in pixels of the framebuffer.
+        homogeneous = np.hstack([control, np.zeros((4, 1)), np.ones((4, 1))])
+        screen = homogeneous.dot(sketch.renderer.transform_matrix.T)[:, :2]
+        screen = screen * sketch.renderer.fbuffer_scale()
+        if to_bezier is not None:
+            screen = to_bezier.dot(screen)
+        steps = curves._flattening_segments(screen, tolerance)
+
+    steps = _detail_steps(steps)
+    return curves._evaluate(basis, control, np.linspace(0, 1, steps + 1))
+
 def _draw_on_return(func):
     """Set shape parameters to default renderer parameters
 
@@ -150,25 +196,26 @@ class Arc(PShape):
         sdiff = (s2 - s1)
         size_acc = (np.sqrt(np.sum(sdiff * sdiff)) * math.pi * 2) / POINT_ACCURACY_FACTOR
 
-        acc = min(MAX_POINT_ACCURACY, max(MIN_POINT_ACCURACY, int(size_acc)))
+        # Fewer points are used when the detail level is lowered.
+        level = sketch.renderer.detail_level
+        acc = min(int(MAX_POINT_ACCURACY * level),
+                  max(int(MIN_POINT_ACCURACY * level), int(size_acc * level)))
+        acc = max(acc, MIN_DETAIL_ACCURACY)
         inc = int(len(SINCOS) / acc)
 
         sclen = len(SINCOS)
         start_index = int((self._start_angle / (math.pi * 2)) * sclen)
         end_index = int((self._stop_angle / (math.pi * 2)) * sclen)
 
-        vertices = [(c1x, c1y)]
-        for idx in range(start_index, end_index, inc):
-            i = idx % sclen
-            vertices.append((
-                c1x + rx * SINCOS[i][1],
-                c1y + ry * SINCOS[i][0],
-            ))
-        vertices.append((
-            c1x + rx * SINCOS[end_index % sclen][1],
-            c1y + ry * SINCOS[end_index % sclen][0],
-        ))
-        self._vertices = np.array(vertices)
+        indices = np.append(np.arange(start_index, end_index, inc),
+                            end_index) % sclen
+        sincos = SINCOS[indices]
+
+        vertices = np.empty((len(indices) + 1, 2))
+        vertices[0] = (c1x, c1y)
+        vertices[1:, 0] = c1x + rx * sincos[:, 1]
+        vertices[1:, 1] = c1y + ry * sincos[:, 0]
+        self._vertices = vertices
 
 @_draw_on_return
 def point(x, y, z=0):
@@ -231,14 +278,9 @@ def bezier(start, control_point_1, control_point_2, stop):
     :rtype: PShape.
 
     """
-    vertices = []
-    steps = curves.bezier_resolution
-    for i in range(steps + 1):
-        t = i / steps
-        p = curves.bezier_point(start, control_point_1,
-                                control_point_2, stop, t)
-        vertices.append(p[:3])
-
+    points = [start, control_point_1, control_point_2, stop]
+    vertices = _flatten(curves.BEZIER_BASIS, None, points,
+                        curves.bezier_resolution)
     return PShape(vertices, attribs='path')
 
 @_draw_on_return
@@ -261,13 +303,10 @@ def curve(point_1, point_2, point_3, point_4):
     :rtype: PShape
 
     """
-    vertices = []
-    steps = curves.curve_resolution
-    for i in range(steps + 1):
-        t = i / steps
-        p = curves.curve_point(point_1, point_2, point_3, point_4, t)
-        vertices.append(p[:3])
-
+    points = [point_1, point_2, point_3, point_4]
+    vertices = _flatten(curves.curve_basis_matrix,
+                        curves.curve_to_bezier_matrix, points,
+                        curves.curve_resolution)
     return PShape(vertices, attribs='path')
 
 @_draw_on_return
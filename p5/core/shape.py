@@ -24,12 +24,13 @@ import functools
 import math
 
 import numpy as np
-from vispy import geometry
 
 from .color import Color
 from .. import sketch
+from .._lazy import lazy_import
 from ..pmath import matrix
 
+geometry = lazy_import('vispy.geometry')
 
 __all__ = ['PShape']
 
@@ -106,6 +107,10 @@ class PShape:
                  children=[]):
         # basic properties of the shape
         self._vertices = np.array([])
+        # Set by the renderer while the draw queue might still hold
+        # the vertex array (it is only transformed when the queue is
+        # flushed).
+        self._vertices_queued = False
         self._edges = None
         self._outline = None
         self._outline_vertices = None
@@ -385,6 +390,11 @@ class PShape:
         """
         if len(vertex) != 2:
             raise ValueError("Wrong vertex dimension")
+        # Copy the vertices on the first edit after the shape was
+        # drawn, so that the draw queue keeps the old ones.
+        if self._vertices_queued:
+            self._vertices = self._vertices.copy()
+            self._vertices_queued = False
         self._vertices[idx] =  np.array(vertex)
         self._tri_vertices = None
         self._tri_edges = None
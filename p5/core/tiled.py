@@ -0,0 +1,244 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Tiled images backed by memory-mapped files.
+
+"""
+
+import builtins
+from collections import OrderedDict
+
+import numpy as np
+
+from .. import sketch
+from .._lazy import lazy_import
+from .image import PImage
+
+Image = lazy_import('PIL.Image')
+
+__all__ = ['TiledImage', 'load_tiled_image']
+
+TILE_SIZE = 512
+MAX_TILES = 64
+
+class TiledImage:
+    """An image that is too large to be loaded as a whole.
+
+    The pixels of the image stay in a memory-mapped file. When the
+    image is drawn using :meth:`p5.image`, only the tiles of the image
+    that are visible on the screen are read from the file and
+    uploaded to the GPU. The most recently drawn tiles are kept around
+    for the next frames.
+
+    Images drawn smaller than their actual size only read every
+    second (fourth, eighth, etc.) pixel of the file.
+
+    Tiled images can't be modified. Use :func:`p5.load_tiled_image`
+    to create one.
+
+    :param data: (height, width, channels) uint8 array with the pixels
+        of the image (usually a np.memmap)
+    :type data: np.ndarray
+
+    :param tile_size: width (and height) of each tile in pixels
+        (defaults to 512).
+    :type tile_size: int
+
+    :param max_tiles: maximum number of tiles kept on the GPU
+        (defaults to 64).
+    :type max_tiles: int
+
+    """
+    def __init__(self, data, tile_size=TILE_SIZE, max_tiles=MAX_TILES):
+        if data.ndim == 2:
+            data = data[:, :, np.newaxis]
+        if data.shape[2] not in (1, 3, 4):
+            raise ValueError("Unsupported number of channels")
+
+        self._data = data
+        self._tile_size = tile_size
+        self._max_tiles = max_tiles
+        self._tiles = OrderedDict()
+
+    @property
+    def width(self):
+        """The width of the image
+
+        :rtype: int
+        """
+        return self._data.shape[1]
+
+    @property
+    def height(self):
+        """The height of the image
+
+        :rtype: int
+        """
+        return self._data.shape[0]
+
+    @property
+    def size(self):
+        """The size of the image
+
+        :rtype: (int, int) tuple
+        """
+        return self.width, self.height
+
+    @property
+    def aspect_ratio(self):
+        """Return the aspect ratio of the image.
+
+        :rtype: float | int
+        """
+        return self.width / self.height
+
+    def _tile(self, level, row, col):
+        """Get the given tile (as a PImage) of the given mipmap level.
+
+        """
+        key = (level, row, col)
+        if key in self._tiles:
+            self._tiles.move_to_end(key)
+            return self._tiles[key]
+
+        step = 2 ** level
+        size = self._tile_size * step
+        y = row * size
+        x = col * size
+        data = self._data[y:(y + size):step, x:(x + size):step]
+        data = np.ascontiguousarray(data)
+
+        height, width, channels = data.shape
+        mode = {1: 'L', 3: 'RGB', 4: 'RGBA'}[channels]
+        tile = PImage(width, height)
+        tile._img = Image.fromarray(data[:, :, 0] if channels == 1 else data,
+                                    mode)
+        tile.mipmap = False
+
+        # Dropping the tile also frees its texture once it's no
+        # longer queued for drawing.
+        self._tiles[key] = tile
+        if len(self._tiles) > self._max_tiles:
+            self._tiles.popitem(last=False)
+        return tile
+
+    def _visible_tiles(self, location, size, level):
+        """Find the tiles of the mipmap level that are on the screen.
+
+        :returns: a list of (row, col) tuples.
+        :rtype: list
+
+        """
+        x, y = location
+        sx, sy = size
+        tile_span = self._tile_size * 2 ** level
+        num_rows = -(-self.height // tile_span)
+        num_cols = -(-self.width // tile_span)
+
+        # Screen positions of all corners of the tile grid.
+        xs = x + sx * np.minimum(np.arange(num_cols + 1) * tile_span,
+                                 self.width) / self.width
+        ys = y + sy * np.minimum(np.arange(num_rows + 1) * tile_span,
+                                 self.height) / self.height
+        gx, gy = np.meshgrid(xs, ys)
+
+        matrix = sketch.renderer.transform_matrix
+        px = matrix[0, 0] * gx + matrix[0, 1] * gy + matrix[0, 3]
+        py = matrix[1, 0] * gx + matrix[1, 1] * gy + matrix[1, 3]
+
+        def corners(grid):
+            return np.stack([grid[:-1, :-1], grid[:-1, 1:],
+                             grid[1:, :-1], grid[1:, 1:]])
+
+        cx = corners(px)
+        cy = corners(py)
+        visible = (cx.max(axis=0) >= 0) & (cx.min(axis=0) <= builtins.width) & \
+            (cy.max(axis=0) >= 0) & (cy.min(axis=0) <= builtins.height)
+        return list(zip(*np.nonzero(visible)))
+
+    def _render(self, location, size):
+        """Draw the visible tiles of the image.
+
+        """
+        x, y = location
+        sx, sy = size
+        level = sketch.renderer.mipmap_level(self.size, size)
+        tile_span = self._tile_size * 2 ** level
+
+        for row, col in self._visible_tiles(location, size, level):
+            tile = self._tile(level, row, col)
+            tx = col * tile_span
+            ty = row * tile_span
+            tw = min(tile_span, self.width - tx)
+            th = min(tile_span, self.height - ty)
+            sketch.render_image(tile,
+                                (x + sx * tx / self.width,
+                                 y + sy * ty / self.height),
+                                (sx * tw / self.width, sy * th / self.height))
+
+def load_tiled_image(filename, size=None, fmt='RGB', offset=0,
+                     tile_size=TILE_SIZE, max_tiles=MAX_TILES):
+    """Open a large image from a raw or NumPy (.npy) file.
+
+    The file is memory-mapped and only the parts of the image that are
+    drawn are read. See :class:`p5.TiledImage` for details.
+
+    Raw files should contain the rows of the image (from the top) with
+    one byte per channel, without any padding.
+
+    :param filename: Filename (or path) of the image file.
+    :type filename: str
+
+    :param size: (width, height) of the image. Required for raw files.
+    :type size: tuple | None
+
+    :param fmt: color format of raw files. Should be one of {'RGB',
+        'RGBA', 'ALPHA'}. Defaults to 'RGB'
+    :type fmt: str
+
+    :param offset: number of bytes to skip at the start of raw files
+        (defaults to 0)
+    :type offset: int
+
+    :param tile_size: width (and height) of each tile in pixels
+        (defaults to 512).
+    :type tile_size: int
+
+    :param max_tiles: maximum number of tiles kept on the GPU
+        (defaults to 64).
+    :type max_tiles: int
+
+    :returns: The tiled image.
+    :rtype: :class:`p5.TiledImage`
+
+    :raises ValueError: When the size of a raw image is missing or the
+        data isn't an image.
+
+    """
+    if filename.endswith('.npy'):
+        data = np.load(filename, mmap_mode='r')
+        if data.dtype != np.uint8 or data.ndim not in (2, 3):
+            raise ValueError("Expected a 2D or 3D array of uint8 values")
+    else:
+        if size is None:
+            raise ValueError("Size is required for raw images")
+        channels = {'rgb': 3, 'rgba': 4, 'alpha': 1}[fmt.lower()]
+        width, height = size
+        data = np.memmap(filename, dtype=np.uint8, mode='r', offset=offset,
+                         shape=(height, width, channels))
+
+    return TiledImage(data, tile_size, max_tiles)
@@ -33,17 +33,52 @@ __all__ = ['push_matrix', 'reset_transforms', 'translate', 'rotate',
 
 @contextmanager
 def push_matrix():
-    previous_matrix = renderer.transform_matrix.copy()
+    """Save the current transform matrix and restore it on exit.
+
+    The matrices are kept in a preallocated stack, so pushing a matrix
+    only copies it into the next slot of the stack.
+
+    :returns: A copy of the transform matrix at the time of the push.
+    :rtype: np.ndarray
+
+    """
+    depth = renderer.matrix_depth
+    stack = renderer.matrix_stack
+    previous_matrix = stack[depth]
+    is_2d = renderer.transform_is_2d
+
+    # The transform matrix might have been replaced instead of being
+    # modified in place.
+    if renderer.transform_matrix is not previous_matrix:
+        previous_matrix[:] = renderer.transform_matrix
+
+    if depth + 1 == len(stack):
+        stack.append(np.identity(4))
+    current_matrix = stack[depth + 1]
+    np.copyto(current_matrix, previous_matrix)
+
+    renderer.matrix_depth = depth + 1
+    renderer.transform_matrix = current_matrix
     try:
-        yield previous_matrix
+        yield previous_matrix.copy()
     finally:
+        renderer.matrix_depth = depth
         renderer.transform_matrix = previous_matrix
+        renderer.transform_is_2d = is_2d
+
+def _is_affine_2d(mat):
+    """Check if the matrix only transforms points in the xy-plane."""
+    return mat[0, 2] == 0 and mat[1, 2] == 0 and \
+        mat[2, 0] == 0 and mat[2, 1] == 0 and mat[2, 3] == 0 and \
+        mat[3, 0] == 0 and mat[3, 1] == 0 and mat[3, 2] == 0 and \
+        mat[3, 3] == 1
 
 def reset_transforms():
     """Reset all transformations to their default state.
 
     """
-    renderer.transform_matrix = np.identity(4)
+    renderer.transform_matrix[:] = np.identity(4)
+    renderer.transform_is_2d = True
     # renderer.reset_view()
 
 def translate(x, y, z=0):
@@ -68,9 +103,14 @@ def translate(x, y, z=0):
     :rtype: np.ndarray
 
     """
-    tmat = matrix.translation_matrix(x, y, z)
-    renderer.transform_matrix = renderer.transform_matrix.dot(tmat)
-    return tmat
+    mat = renderer.transform_matrix
+    if z == 0 and renderer.transform_is_2d:
+        mat[0, 3] += mat[0, 0] * x + mat[0, 1] * y
+        mat[1, 3] += mat[1, 0] * x + mat[1, 1] * y
+    else:
+        mat[:, 3] += mat[:, 0] * x + mat[:, 1] * y + mat[:, 2] * z
+        renderer.transform_is_2d = renderer.transform_is_2d and z == 0
+    return matrix.translation_matrix(x, y, z)
 
 def rotate(theta, axis=np.array([0, 0, 1])):
     """Rotate the display by the given angle along the given axis.
@@ -85,9 +125,31 @@ def rotate(theta, axis=np.array([0, 0, 1])):
     :rtype: np.ndarray
 
    """
-    axis = np.array(axis[:])
-    tmat = matrix.rotation_matrix(axis, theta)
-    renderer.transform_matrix = renderer.transform_matrix.dot(tmat)
+    x, y, z = axis[:3]
+    tmat = matrix.rotation_matrix(np.array([x, y, z]), theta)
+    if x != 0 or y != 0:
+        mat = renderer.transform_matrix
+        mat[:] = mat.dot(tmat)
+        renderer.transform_is_2d = False
+        return tmat
+
+    # Rotations about the z-axis only mix the first two columns.
+    if z < 0:
+        theta = -theta
+    c = math.cos(theta)
+    s = math.sin(theta)
+    mat = renderer.transform_matrix
+    if renderer.transform_is_2d:
+        a, b = mat[0, 0], mat[0, 1]
+        mat[0, 0] = a * c + b * s
+        mat[0, 1] = b * c - a * s
+        a, b = mat[1, 0], mat[1, 1]
+        mat[1, 0] = a * c + b * s
+        mat[1, 1] = b * c - a * s
+    else:
+        col_x = mat[:, 0].copy()
+        mat[:, 0] = col_x * c + mat[:, 1] * s
+        mat[:, 1] = mat[:, 1] * c - col_x * s
     return tmat
 
 def rotate_x(theta):
@@ -100,7 +162,7 @@ def rotate_x(theta):
     :rtype: np.ndarray
 
     """
-    rotate(theta, axis=np.array([1, 0, 0]))
+    return rotate(theta, axis=np.array([1, 0, 0]))
 
 def rotate_y(theta):
     """Rotate the view along the y axis.
@@ -112,7 +174,7 @@ def rotate_y(theta):
     :rtype: np.ndarray
 
    """
-    rotate(theta, axis=np.array([0, 1, 0]))
+    return rotate(theta, axis=np.array([0, 1, 0]))
 
 def rotate_z(theta):
     """Rotate the view along the z axis.
@@ -124,7 +186,7 @@ def rotate_z(theta):
     :rtype: np.ndarray
 
    """
-    rotate(theta, axis=np.array([0, 0, 1]))
+    return rotate(theta, axis=np.array([0, 0, 1]))
 
 def scale(sx, sy=None, sz=None):
     """Scale the display by the given factor.
@@ -138,17 +200,28 @@ def scale(sx, sy=None, sz=None):
     :param sz: scale factor along the z-axis (defaults to None)
     :type sz: float
 
-    :returns: The transformation matrix used to appy the transformation.
+    :returns: The transformation matrix used to apply the transformation.
     :rtype: np.ndarray
+
     """
     if (not sy) and (not sz):
         sy = sx
         sz = sx
     elif not sz:
         sz = 1
-    tmat = matrix.scale_transform(sx, sy, sz)
-    renderer.transform_matrix = renderer.transform_matrix.dot(tmat)
-    return tmat
+
+    mat = renderer.transform_matrix
+    if renderer.transform_is_2d:
+        mat[0, 0] *= sx
+        mat[1, 0] *= sx
+        mat[0, 1] *= sy
+        mat[1, 1] *= sy
+        mat[2, 2] *= sz
+    else:
+        mat[:, 0] *= sx
+        mat[:, 1] *= sy
+        mat[:, 2] *= sz
+    return matrix.scale_transform(sx, sy, sz)
 
 def apply_matrix(transform_matrix):
     """Apply the given matrix to the sketch's transform matrix..
@@ -157,12 +230,15 @@ def apply_matrix(transform_matrix):
     :type transform_matrix: np.ndarray (or a 4×4 list)
     """
     tmatrix = np.array(transform_matrix)
-    renderer.transform_matrix = renderer.transform_matrix.dot(tmatrix)
+    mat = renderer.transform_matrix
+    mat[:] = mat.dot(tmatrix)
+    renderer.transform_is_2d = renderer.transform_is_2d and \
+        _is_affine_2d(tmatrix)
 
 def reset_matrix():
     """Reset the current transform matrix.
     """
-    renderer.transform_matrix = np.identity(4)
+    reset_transforms()
 
 def print_matrix():
     """Print the transform matrix being used by the sketch.
@@ -175,13 +251,19 @@ def shear_x(theta):
     :param theta: angle to shear by (in radians)
     :type theta: float
 
-    :returns: The shear matrix used to apply the tranformation.
+    :returns: The shear matrix used to apply the transformation.
     :rtype: np.ndarray
 
     """
+    shear = math.tan(theta)
+    mat = renderer.transform_matrix
+    if renderer.transform_is_2d:
+        mat[0, 1] += mat[0, 0] * shear
+        mat[1, 1] += mat[1, 0] * shear
+    else:
+        mat[:, 1] += mat[:, 0] * shear
     shear_mat = np.identity(4)
-    shear_mat[0, 1] = np.tan(theta)
-    renderer.transform_matrix = renderer.transform_matrix.dot(shear_mat)
+    shear_mat[0, 1] = shear
     return shear_mat
 
 def shear_y(theta):
@@ -194,9 +276,15 @@ def shear_y(theta):
     :rtype: np.ndarray
 
     """
+    shear = math.tan(theta)
+    mat = renderer.transform_matrix
+    if renderer.transform_is_2d:
+        mat[0, 0] += mat[0, 1] * shear
+        mat[1, 0] += mat[1, 1] * shear
+    else:
+        mat[:, 0] += mat[:, 1] * shear
     shear_mat = np.identity(4)
-    shear_mat[1, 0] = np.tan(theta)
-    renderer.transform_matrix = renderer.transform_matrix.dot(shear_mat)
+    shear_mat[1, 0] = shear
     return shear_mat
 
 def camera():
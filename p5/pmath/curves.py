@@ -22,6 +22,8 @@
 from functools import wraps
 import math
 
+import numpy as np
+
 from ..pmath import Point
 
 __all__ = [
@@ -29,7 +31,8 @@ __all__ = [
     'bezier_point', 'bezier_tangent', 'bezier_detail',
 
     # CURVE METHODS
-    'curve_point', 'curve_tangent', 'curve_detail', 'curve_tightness'
+    'curve_point', 'curve_tangent', 'curve_detail', 'curve_tightness',
+    'curve_flatness',
 ]
 
 curve_resolution = 20
@@ -37,6 +40,26 @@ curve_tightness_amount = 0
 
 bezier_resolution = 20
 
+# When set, curves are flattened adaptively (see curve_flatness())
+flatness_tolerance = None
+
+# Upper limit on the number of segments of an adaptively flattened
+# curve.
+MAX_FLATTENING_SEGMENTS = 512
+
+# Cubic curves are evaluated as [t^3, t^2, t, 1] . basis . points.
+BEZIER_BASIS = np.array([[-1, 3, -3, 1],
+                         [3, -6, 3, 0],
+                         [-3, 3, 0, 0],
+                         [1, 0, 0, 0]], dtype=np.float64)
+
+# The Catmull-Rom basis depends on the curve tightness and is set by
+# _reinit_curve_matrices(). curve_to_bezier_matrix converts the control
+# points of a curve to the control points of the same curve in Bezier
+# form.
+curve_basis_matrix = None
+curve_to_bezier_matrix = None
+
 def typecast_arguments_as_points(func):
     """Typecast all but the last argument of the function as Points."""
     @wraps(func)
@@ -47,6 +70,51 @@ def typecast_arguments_as_points(func):
         return ret_value
     return decorated
 
+def _is_array_call(points, parameter):
+    """Check if any of the arguments holds more than one value."""
+    return np.ndim(parameter) > 0 or any(np.ndim(p) > 1 for p in points)
+
+def _cubic(basis, points, parameter, derivative=False):
+    """Evaluate cubic curves (or their derivatives) for arrays of
+    control points and parameters.
+
+    :param basis: (4, 4) basis matrix of the curves.
+    :type basis: np.ndarray
+
+    :param points: the four control points. Each is either a single
+        point or an (..., D) array of points (one per curve). Points
+        with fewer than D coordinates are padded with zeros.
+    :type points: list
+
+    :param parameter: curve parameter(s). Broadcast against the
+        leading dimensions of the control points.
+    :type parameter: float | np.ndarray
+
+    :param derivative: When True, evaluate the derivative instead.
+    :type derivative: bool
+
+    :rtype: np.ndarray
+
+    """
+    arrays = [np.asarray(p, dtype=np.float64) for p in points]
+    dim = max(a.shape[-1] for a in arrays)
+    arrays = [np.pad(a, [(0, 0)] * (a.ndim - 1) + [(0, dim - a.shape[-1])])
+              for a in arrays]
+    # (..., D, 4) control points
+    control = np.stack(np.broadcast_arrays(*arrays), axis=-1)
+
+    t = np.asarray(parameter, dtype=np.float64)
+    if derivative:
+        powers = [3 * t * t, 2 * t, np.ones_like(t), np.zeros_like(t)]
+    else:
+        powers = [t * t * t, t * t, t, np.ones_like(t)]
+    coeffs = np.stack(powers, axis=-1).dot(basis)
+
+    return (coeffs[..., np.newaxis, :] * control).sum(axis=-1)
+
+def _point(values):
+    return Point(float(values[0]), float(values[1]))
+
 def bezier_detail(detail_value):
     """Change the resolution used to draw bezier curves.
 
@@ -56,10 +124,17 @@ def bezier_detail(detail_value):
     global bezier_resolution
     bezier_resolution = max(1, detail_value)
 
-@typecast_arguments_as_points
 def bezier_point(start, control_1, control_2, stop, parameter):
     """Return the coordinate of a point along a bezier curve.
 
+    All arguments also accept NumPy arrays: control points can be
+    (M, D) arrays holding the points of M curves and `parameter` an
+    array of parameters. Parameters are broadcast against the curves
+    (so `parameter[:, np.newaxis]` evaluates every curve at every
+    parameter). The result is then an array with the broadcast shape
+    followed by the D (2 or 3) coordinates, eg. (N, D) for one curve
+    and N parameters.
+
     :param start: The start point of the bezier curve
     :type start: 3-tuple.
 
@@ -75,27 +150,29 @@ def bezier_point(start, control_1, control_2, stop, parameter):
     :param parameter: The parameter for the required location along
         the curve. Should be in the range [0.0, 1.0] where 0 indicates
         the start of the curve and 1 indicates the end of the curve.
-    :type parameter: float
+    :type parameter: float | np.ndarray
 
     :returns: The coordinate of the point along the bezier curve.
-    :rtype: Point (namedtuple with x, y, z attributes)
+    :rtype: Point (namedtuple with x, y, z attributes) | np.ndarray
 
     """
-    t = parameter
-    t_ = 1 - parameter
+    points = [start, control_1, control_2, stop]
+    values = _cubic(BEZIER_BASIS, points, parameter)
+    if _is_array_call(points, parameter):
+        return values
+    return _point(values)
 
-    P = [start, control_1, control_2, stop]
-    coeffs = [t_*t_*t_, 3*t*t_*t_,  3*t*t*t_, t*t*t]
-
-    x = sum(pt.x * c for pt, c in zip(P, coeffs))
-    y = sum(pt.y * c for pt, c in zip(P, coeffs))
-
-    return Point(x, y)
-
-@typecast_arguments_as_points
 def bezier_tangent(start, control_1, control_2, stop, parameter):
     """Return the tangent at a point along a bezier curve.
 
+    All arguments also accept NumPy arrays: control points can be
+    (M, D) arrays holding the points of M curves and `parameter` an
+    array of parameters. Parameters are broadcast against the curves
+    (so `parameter[:, np.newaxis]` evaluates every curve at every
+    parameter). The result is then an array with the broadcast shape
+    followed by the D (2 or 3) coordinates, eg. (N, D) for one curve
+    and N parameters.
+
     :param start: The start point of the bezier curve
     :type start: 3-tuple.
 
@@ -112,24 +189,96 @@ def bezier_tangent(start, control_1, control_2, stop, parameter):
         along the curve. Should be in the range [0.0, 1.0] where 0
         indicates the start of the curve and 1 indicates the end of
         the curve.
-    :type parameter: float
+    :type parameter: float | np.ndarray
 
     :returns: The tangent at the required point along the bezier
         curve.
-    :rtype: Point (namedtuple with x, y, z attributes)
+    :rtype: Point (namedtuple with x, y, z attributes) | np.ndarray
 
     """
-    t = parameter
-    tangent = lambda a, b, c, d: 3*t*t*(3*b - 3*c + d - a) + \
-                                 6*t*(a - 2*b + c) + \
-                                 3*(b - a)
-    x = tangent(start.x, control_1.x, control_2.x, stop.x)
-    y = tangent(start.y, control_1.y, control_2.y, stop.y)
-    return Point(x, y)
+    points = [start, control_1, control_2, stop]
+    values = _cubic(BEZIER_BASIS, points, parameter, derivative=True)
+    if _is_array_call(points, parameter):
+        return values
+    return _point(values)
 
 def _reinit_curve_matrices():
-    # TODO: Add basis matrices for faster tessellation.
-    pass
+    global curve_basis_matrix
+    global curve_to_bezier_matrix
+
+    s = curve_tightness_amount
+    curve_basis_matrix = np.array([
+        [(s - 1) / 2, (s + 3) / 2, (-3 - s) / 2, (1 - s) / 2],
+        [(1 - s), (-5 - s) / 2, (s + 2), (s - 1) / 2],
+        [(s - 1) / 2, 0, (1 - s) / 2, 0],
+        [0, 1, 0, 0],
+    ], dtype=np.float64)
+    curve_to_bezier_matrix = np.linalg.solve(BEZIER_BASIS, curve_basis_matrix)
+
+def _evaluate(basis, control_points, parameters):
+    """Evaluate a cubic curve at all the given parameters.
+
+    :param basis: (4, 4) basis matrix of the curve.
+    :type basis: np.ndarray
+
+    :param control_points: (4, D) array of control points.
+    :type control_points: np.ndarray
+
+    :param parameters: (N,) array of curve parameters.
+    :type parameters: np.ndarray
+
+    :returns: (N, D) array of points along the curve.
+    :rtype: np.ndarray
+
+    """
+    t = np.asarray(parameters, dtype=np.float64)
+    powers = np.stack([t * t * t, t * t, t, np.ones_like(t)], axis=-1)
+    return powers.dot(basis).dot(control_points)
+
+def _flattening_segments(bezier_points, tolerance):
+    """Number of uniform segments needed to approximate a cubic
+    Bezier curve within the given tolerance.
+
+    This uses Wang's formula: the distance between the curve and its
+    approximation by n segments is at most (3 / 4) * M / n^2, where M
+    is the largest second difference of the control points.
+
+    :param bezier_points: (4, D) array of Bezier control points.
+    :type bezier_points: np.ndarray
+
+    :param tolerance: largest allowed distance from the curve.
+    :type tolerance: float
+
+    :rtype: int
+
+    """
+    second = bezier_points[:-2] - 2 * bezier_points[1:-1] + bezier_points[2:]
+    largest = np.sqrt((second * second).sum(axis=-1)).max()
+    segments = math.ceil(math.sqrt(0.75 * largest / tolerance))
+    return min(MAX_FLATTENING_SEGMENTS, max(1, segments))
+
+def curve_flatness(tolerance=None):
+    """Draw bezier curves and curves with as many vertices as their
+    size on the screen needs.
+
+    Instead of using a fixed number of vertices (see
+    :meth:`bezier_detail` and :meth:`curve_detail`), every curve is
+    split into just enough segments to stay within `tolerance` pixels
+    of the exact curve, taking the current transformations, the pixel
+    density and the render scale into account. Small curves hence use
+    few vertices and large curves stay smooth.
+
+    :param tolerance: largest distance (in pixels) between a curve
+        and its drawn approximation. When None (the default), the
+        fixed resolutions are used again.
+    :type tolerance: float | None
+
+    :raises ValueError: When the tolerance isn't positive.
+    """
+    global flatness_tolerance
+    if tolerance is not None and tolerance <= 0:
+        raise ValueError("Flatness tolerance should be positive")
+    flatness_tolerance = tolerance
 
 def curve_detail(detail_value):
     """Change the resolution used to draw bezier curves.
@@ -150,10 +299,17 @@ def curve_tightness(amount):
     curve_tightness_amount = amount
     _reinit_curve_matrices()
 
-@typecast_arguments_as_points
 def curve_point(point_1, point_2, point_3, point_4, parameter):
     """Return the coordinates of a point along a curve.
 
+    All arguments also accept NumPy arrays: control points can be
+    (M, D) arrays holding the points of M curves and `parameter` an
+    array of parameters. Parameters are broadcast against the curves
+    (so `parameter[:, np.newaxis]` evaluates every curve at every
+    parameter). The result is then an array with the broadcast shape
+    followed by the D (2 or 3) coordinates, eg. (N, D) for one curve
+    and N parameters.
+
     :param point_1: The first control point of the curve.
     :type point_1: 3-tuple.
 
@@ -170,28 +326,30 @@ def curve_point(point_1, point_2, point_3, point_4, parameter):
         along the curve. Should be in the range [0.0, 1.0] where 0
         indicates the start of the curve and 1 indicates the end of
         the curve.
-    :type parameter: float
+    :type parameter: float | np.ndarray
 
     :returns: The coordinate of the point at the required location
         along the curve.
-    :rtype: Point (namedtuple with x, y, z attributes)
+    :rtype: Point (namedtuple with x, y, z attributes) | np.ndarray
 
     """
-    t = parameter
-    basis = curve_basis_matrix
-    P = [point_1, point_2, point_3, point_4]
-
-    coeffs = [sum(t**(3 - i) * basis[4*i + j] for i in range(4)) for j in range(4)]
-
-    x = sum(pt.x * c for pt, c in zip(P, coeffs))
-    y = sum(pt.y * c for pt, c in zip(P, coeffs))
+    points = [point_1, point_2, point_3, point_4]
+    values = _cubic(curve_basis_matrix, points, parameter)
+    if _is_array_call(points, parameter):
+        return values
+    return _point(values)
 
-    return Point(x, y)
-
-@typecast_arguments_as_points
 def curve_tangent(point_1, point_2, point_3, point_4, parameter):
     """Return the tangent at a point along a curve.
 
+    All arguments also accept NumPy arrays: control points can be
+    (M, D) arrays holding the points of M curves and `parameter` an
+    array of parameters. Parameters are broadcast against the curves
+    (so `parameter[:, np.newaxis]` evaluates every curve at every
+    parameter). The result is then an array with the broadcast shape
+    followed by the D (2 or 3) coordinates, eg. (N, D) for one curve
+    and N parameters.
+
     :param point_1: The first control point of the curve.
     :type point_1: 3-tuple.
 
@@ -208,25 +366,17 @@ def curve_tangent(point_1, point_2, point_3, point_4, parameter):
         along the curve. Should be in the range [0.0, 1.0] where 0
         indicates the start of the curve and 1 indicates the end of
         the curve.
-    :type parameter: float
+    :type parameter: float | np.ndarray
 
     :returns: The tangent at the required point along the curve.
-    :rtype: Point (namedtuple with x, y, z attributes)
+    :rtype: Point (namedtuple with x, y, z attributes) | np.ndarray
 
     """
-    t = parameter
-    basis = curve_basis_matrix
-    P = [point_1, point_2, point_3, point_4]
-
-    coeffs = [
-        sum((3 - i)*(t**(2 - i)) * basis[4*i + j] for i in range(3))
-        for j in range(4)
-    ]
-
-    x = sum(pt.x * c for pt, c in zip(P, coeffs))
-    y = sum(pt.y * c for pt, c in zip(P, coeffs))
-
-    return Point(x, y)
+    points = [point_1, point_2, point_3, point_4]
+    values = _cubic(curve_basis_matrix, points, parameter, derivative=True)
+    if _is_array_call(points, parameter):
+        return values
+    return _point(values)
 
 # Set the default values.
 bezier_detail(20)
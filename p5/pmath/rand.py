@@ -67,7 +67,10 @@ PERLIN_SIZE = 4095
 
 #P: [toxi 031112]
 #P: new vars needed due to recent change of cos table in PGraphics
-PERLIN_COS_TABLE = PRE_COS
+#
+# noise() indexes the table one value at a time, which is faster on a
+# list than on a numpy array.
+PERLIN_COS_TABLE = PRE_COS.tolist()
 PERLIN_TWO_PI = SINCOS_LENGTH
 PERLIN_PI = PERLIN_TWO_PI
 PERLIN_PI >>= 1
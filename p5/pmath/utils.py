@@ -62,10 +62,13 @@ HALF_TAU = math.pi
 SINCOS_PRECISION = 0.5
 SINCOS_LENGTH = int(360 / SINCOS_PRECISION)
 
-PRE_SIN = [ sin(radians(d) * SINCOS_PRECISION) for d in range(SINCOS_LENGTH) ]
-PRE_COS = [ cos(radians(d) * SINCOS_PRECISION) for d in range(SINCOS_LENGTH) ]
+_SINCOS_ANGLES = np.radians(np.arange(SINCOS_LENGTH) * SINCOS_PRECISION)
 
-SINCOS = list(zip(PRE_SIN, PRE_COS))
+PRE_SIN = np.sin(_SINCOS_ANGLES)
+PRE_COS = np.cos(_SINCOS_ANGLES)
+
+# (SINCOS_LENGTH, 2) array of (sin, cos) pairs.
+SINCOS = np.column_stack((PRE_SIN, PRE_COS))
 
 
 def _sanitize(point, target_dimension=3):
@@ -15,9 +15,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
-import vispy
-vispy.use('glfw')
-
+# vispy (and the window backend) is only imported once a sketch is
+# run. See p5.sketch.userspace.run()
 from .userspace import *
-from .base import render
+from .renderer import render
 from .renderer import render_image
@@ -0,0 +1,208 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Texture atlas for small images.
+
+Small images are packed into a few large RGBA textures ("pages") so
+that many images can be drawn using a single draw call per page.
+Images are packed into rows ("shelves") from the top of each page.
+Once all pages are full, the atlas is cleared and images are packed
+again as they get drawn.
+
+"""
+
+import itertools
+
+import numpy as np
+
+from .._lazy import lazy_import
+
+gloo = lazy_import('vispy.gloo')
+
+# Images with a side longer than MAX_SPRITE_SIZE keep using their own
+# textures. Each image is padded by PADDING pixels (replicating its
+# edges) to avoid bleeding between neighbours when the images are
+# scaled.
+ATLAS_SIZE = 2048
+MAX_SPRITE_SIZE = 256
+MAX_PAGES = 4
+PADDING = 1
+
+# Generations are unique across all atlases so that entries created by
+# one atlas (or before it was cleared) are never mistaken for valid
+# entries of another.
+_generations = itertools.count()
+
+def _rgba(data):
+    """Convert a (h, w, channels) uint8 buffer to RGBA."""
+    height, width, channels = data.shape
+    if channels == 4:
+        return data
+
+    rgba = np.empty((height, width, 4), dtype=np.uint8)
+    if channels in (1, 2):
+        rgba[:, :, :3] = data[:, :, :1]
+    else:
+        rgba[:, :, :3] = data
+    rgba[:, :, 3] = data[:, :, 1] if channels == 2 else 255
+    return rgba
+
+class AtlasPage:
+    """A single texture of the atlas.
+
+    :param size: width (and height) of the page in pixels.
+    :type size: int
+
+    """
+    def __init__(self, size):
+        self.size = size
+        self.texture = gloo.Texture2D((size, size, 4),
+                                      interpolation='linear')
+        self.shelves = []
+        self.top = 0
+
+    def allocate(self, width, height):
+        """Find space for a block of the given size.
+
+        :returns: The (x, y) position of the block in the page or None
+            when the page is full.
+        :rtype: tuple | None
+
+        """
+        for shelf in self.shelves:
+            shelf_y, shelf_height, shelf_x = shelf
+            if height <= shelf_height and shelf_x + width <= self.size:
+                shelf[2] = shelf_x + width
+                return shelf_x, shelf_y
+
+        if self.top + height > self.size:
+            return None
+
+        self.shelves.append([self.top, height, width])
+        self.top = self.top + height
+        return 0, self.shelves[-1][0]
+
+    def delete(self):
+        self.texture.delete()
+
+class TextureAtlas:
+    """Pack small images into a set of shared textures.
+
+    The position of an image in the atlas is stored on the image
+    itself (in ``image._atlas_entry``). The image marks the entry as
+    stale by setting ``image._atlas_dirty`` whenever its pixels
+    change.
+
+    :param before_update: function called right before parts of the
+        atlas that might be in use are overwritten (or the atlas is
+        cleared). Renderers should use this to draw all pending
+        images.
+    :type before_update: function
+
+    """
+    def __init__(self, size=ATLAS_SIZE, max_pages=MAX_PAGES,
+                 before_update=None):
+        self.size = size
+        self.max_pages = max_pages
+        self.before_update = before_update
+        self.pages = []
+        self.generation = next(_generations)
+
+    def accepts(self, image):
+        """Check if the image can be placed in the atlas."""
+        width, height = image.size
+        return (not image._img_on_gpu) and \
+            max(width, height) <= MAX_SPRITE_SIZE
+
+    def is_stale(self, image):
+        """Check if the image has to be (re)uploaded before drawing."""
+        entry = image._atlas_entry
+        return entry is None or entry[0] != self.generation or \
+            image._atlas_dirty
+
+    def lookup(self, image):
+        """Get the page texture and texture coordinates of the image.
+
+        The image is added to the atlas (or updated) when required.
+
+        :returns: the page texture and a (4, 2) array of texture
+            coordinates for the corners (bottom-left, bottom-right,
+            top-left, top-right) of the image.
+        :rtype: (Texture2D, np.ndarray)
+
+        """
+        if self.is_stale(image):
+            self._upload(image)
+        _, page, texcoords, _ = image._atlas_entry
+        return self.pages[page].texture, texcoords
+
+    def _upload(self, image):
+        data = np.pad(_rgba(image._data), ((PADDING, PADDING),
+                                           (PADDING, PADDING), (0, 0)),
+                      mode='edge')
+        block_height, block_width, _ = data.shape
+
+        # Modified images keep their place in the atlas as long as
+        # their size doesn't change.
+        entry = image._atlas_entry
+        if entry is not None and entry[0] == self.generation and \
+           entry[3][2:] == (block_width, block_height):
+            self._before_update()
+            page = entry[1]
+            x, y = entry[3][:2]
+        else:
+            page, x, y = self._allocate(block_width, block_height)
+
+        self.pages[page].texture.set_data(data, offset=(y, x))
+
+        u0 = (x + PADDING) / self.size
+        v0 = (y + PADDING) / self.size
+        u1 = (x + block_width - PADDING) / self.size
+        v1 = (y + block_height - PADDING) / self.size
+        texcoords = np.array([[u0, v1], [u1, v1], [u0, v0], [u1, v0]],
+                             dtype=np.float32)
+
+        image._atlas_entry = (self.generation, page, texcoords,
+                              (x, y, block_width, block_height))
+        image._atlas_dirty = False
+
+    def _allocate(self, width, height):
+        for idx, page in enumerate(self.pages):
+            position = page.allocate(width, height)
+            if position is not None:
+                return (idx,) + position
+
+        if len(self.pages) == self.max_pages:
+            self._before_update()
+            self.clear()
+
+        self.pages.append(AtlasPage(self.size))
+        return (len(self.pages) - 1,) + self.pages[-1].allocate(width, height)
+
+    def _before_update(self):
+        if self.before_update is not None:
+            self.before_update()
+
+    def clear(self):
+        """Remove all images from the atlas."""
+        self.delete()
+        self.pages = []
+        self.generation = next(_generations)
+
+    def delete(self):
+        for page in self.pages:
+            page.delete()
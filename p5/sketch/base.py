@@ -19,7 +19,10 @@
 """Base module for a sketch."""
 
 import builtins
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
+import os
 import time
 
 from PIL import Image
@@ -35,52 +38,27 @@ from .events import KeyEvent
 from .events import MouseEvent
 from .events import handler_names
 
+from .scheduler import FrameScheduler
+from .sharing import FramePublisher
+from .stats import FrameStats
+
 from .renderer import draw_loop
 from .renderer import initialize_renderer
 from .renderer import clear
+from .renderer import redisplay
 from .renderer import reset_view
-from .renderer import add_to_draw_queue
+
+# High-rate events that get merged with the previous (still queued)
+# event of the same kind.
+COALESCED_EVENTS = ('mouse_moved', 'mouse_dragged', 'mouse_wheel')
 
 def _dummy(*args, **kwargs):
     """Eat all arguments, do nothing.
     """
     pass
 
-def _transform_vertices(vertices, local_matrix, global_matrix):
-    return np.dot(np.dot(vertices, local_matrix.T), global_matrix.T)[:, :3]
-
-def render(shape):
-    vertices = shape._draw_vertices
-    n, _ = vertices.shape
-    tverts = _transform_vertices(
-        np.hstack([vertices, np.zeros((n, 1)), np.ones((n, 1))]),
-        shape._matrix,
-        renderer.transform_matrix)
-    fill = shape.fill.normalized if shape.fill else None
-    stroke = shape.stroke.normalized if shape.stroke else None
-
-    edges = shape._draw_edges
-    faces = shape._draw_faces
-
-    if edges is None:
-        print(vertices)
-        print("whale")
-        exit()
-
-    if 'open' in shape.attribs:
-        overtices = shape._draw_outline_vertices
-        no, _  = overtices.shape
-        toverts = _transform_vertices(
-            np.hstack([overtices, np.zeros((no, 1)), np.ones((no, 1))]),
-            shape._matrix,
-            renderer.transform_matrix)
-
-        add_to_draw_queue('path', toverts, shape._draw_outline_edges,
-                          None, None, stroke)
-        add_to_draw_queue('poly', tverts, edges, faces, fill, None)
-    else:
-        add_to_draw_queue(shape.kind, tverts, edges, faces, fill, stroke)
-
+def _write_image(img_data, filename):
+    Image.fromarray(img_data).save(filename)
 
 class Sketch(app.Canvas):
     """The main sketch instance.
@@ -98,12 +76,30 @@ class Sketch(app.Canvas):
         nothing.
     :type handlers: { str: function }
 
-    :param frame_rate:
-    :type frame_rate: int
+    :param frame_rate: The target frame rate for the sketch. When set
+        to None, frames are drawn as fast as possible.
+    :type frame_rate: int | None
+
+    :param update_method: Function to be called at a fixed rate,
+        independent of the frame rate (defaults to None).
+    :type update_method: function
+
+    :param update_rate: number of times per second the update method
+        should be called.
+    :type update_rate: int
+
+    :param coalesce_events: Names of the events that should be merged
+        with the last queued event when it is of the same kind and
+        hasn't been handled yet. Scroll amounts and movements of merged
+        events are added up. Defaults to mouse moves, drags and wheel
+        events.
+    :type coalesce_events: str list
 
     """
     def __init__(self, setup_method, draw_method,
-                 handlers=dict(), frame_rate=60):
+                 handlers=dict(), frame_rate=60,
+                 update_method=None, update_rate=None,
+                 coalesce_events=COALESCED_EVENTS):
         app.Canvas.__init__(
             self,
             title=builtins.title,
@@ -114,55 +110,243 @@ class Sketch(app.Canvas):
 
         self.setup_method = setup_method
         self.draw_method = draw_method
+        self.update_method = update_method
 
         self.looping = True
         self.redraw = False
         self.setup_done = False
-        self.timer = app.Timer(1.0 / frame_rate, connect=self.on_timer)
+        self.headless = False
+
+        if update_method is None:
+            update_rate = None
+        self.scheduler = FrameScheduler(frame_rate, update_rate)
+
+        # Rolling frame / draw() time statistics, optionally written
+        # to stats_file when the sketch exits.
+        self.frame_stats = FrameStats()
+        self.stats_file = None
+        self._finished = False
+        self.timer = app.Timer(self.scheduler.timer_interval,
+                               connect=self.on_timer)
 
         self.handlers = dict()
         for handler_name in handler_names:
             self.handlers[handler_name] = handlers.get(handler_name, _dummy)
 
-        self.handler_queue = []
+        self.handler_queue = deque()
+        self.coalesce_events = set(coalesce_events)
+
+        # Event statistics for the last frame: the number of times
+        # each handler ran, the number of events that were merged
+        # into others and the longest time (in seconds) an event
+        # waited before being handled.
+        self.handler_counts = dict()
+        self.coalesced_count = 0
+        self.event_latency = 0.0
+        self._num_coalesced = 0
+
+        # Total number of events merged into others.
+        self.coalesced_events = 0
+
+        # Optional EventRecorder / EventReplayer for the input events.
+        self.recorder = None
+        self.replayer = None
+
+        # When set, every frame is published to the shared memory
+        # block with this name (see p5.sketch.sharing).
+        self.share_frames = None
+        self.publisher = None
+
+        # Optional FrameTimeGovernors that adapt the tessellation
+        # detail level and the render scale to a frame time target.
+        self.detail = None
+        self.resolution = None
 
         self._save_fname = 'screen'
         self._save_fname_num = 0
         self._save_flag = False
 
+        self._update_pixel_density()
         initialize_renderer()
         clear()
 
     def on_timer(self, event):
-        self.measure_fps(callback=lambda _: None)
-        builtins.frame_rate = round(self.fps, 2)
+        now = time.perf_counter()
+        if not self.scheduler.begin_frame(now):
+            return
+        builtins.frame_rate = self.scheduler.frame_rate
+        if self.scheduler.last_frame_time is not None:
+            self.frame_stats.frame_times.add(self.scheduler.last_frame_time)
+            self._govern(self.scheduler.last_frame_time)
+
+        if self.replayer is not None:
+            self.replayer.replay(self, builtins.frame_count)
+
+        if self.setup_done:
+            for _ in range(self.scheduler.num_updates(now)):
+                self.update_method()
+            builtins.update_alpha = self.scheduler.update_alpha
+
+        drawn = self.looping or self.redraw
         with draw_loop():
-            if self.looping or self.redraw:
+            if drawn:
                 builtins.frame_count += 1
                 if not self.setup_done:
                     self.setup_method()
                     self.setup_done = True
-                    self.show(visible=True)
+                    if not self.headless:
+                        self.show(visible=True)
                     self.redraw = True
-                    self.looping = False
+                    if self.share_frames is not None:
+                        # setup() has set the size of the frames.
+                        self.publisher = FramePublisher(
+                            self.share_frames, renderer.frame_size())
                 else:
-                    self.looping = True
+                    draw_start = time.perf_counter()
                     self.draw_method()
+                    self.frame_stats.draw_times.add(time.perf_counter() - draw_start)
                     self.redraw = False
 
-            while len(self.handler_queue) != 0:
-                function, event = self.handler_queue.pop(0)
-                event._update_builtins()
-                function(event)
+            self._dispatch_events()
 
         if self._save_flag:
             self._save_buffer()
+        if drawn and self.publisher is not None:
+            self._publish_frame()
+        if self.recorder is not None:
+            self.recorder.flush()
         self.update()
 
+        if self._is_idle():
+            self.timer.stop()
+
+    def _govern(self, frame_time):
+        """Adapt the detail level and render scale to the frame time.
+
+        Only one of them changes at a time: the detail level goes
+        first and the other governor restarts its measurements after
+        every change.
+        """
+        governors = [g for g in (self.detail, self.resolution)
+                     if g is not None]
+        for governor in governors:
+            level = governor.level
+            if governor.update(frame_time) != level:
+                for other in governors:
+                    if other is not governor:
+                        other.hold()
+                break
+
+        if self.detail is not None:
+            renderer.set_detail_level(self.detail.level)
+        if self.resolution is not None and \
+           self.resolution.level != renderer.render_scale:
+            renderer.set_render_scale(self.resolution.level)
+
+    def _is_idle(self):
+        """Check if there is nothing to do until the sketch is woken
+        up again (see :meth:`wake`).
+        """
+        replaying = self.replayer is not None and not self.replayer.done
+        return self.setup_done and not (self.looping or self.redraw) and \
+            len(self.handler_queue) == 0 and not replaying
+
+    def wake(self):
+        """Restart the sketch timer if it was stopped while idle.
+        """
+        if self.setup_done and not self.timer.running:
+            self.scheduler.reset()
+            self.timer.start()
+
+    def render_frames(self, num_frames, out_dir=None, first_frame=0,
+                      seek='fast-forward', threads=None):
+        """Draw frames as fast as possible without showing the window.
+
+        The frames are drawn right away (instead of from the sketch
+        timer). Drawing stops early when the sketch stops looping.
+
+        :param num_frames: number of frames to draw after setup().
+        :type num_frames: int
+
+        :param out_dir: directory to save the frames to (as
+            frame_00000.png, frame_00001.png, ...). When None, the
+            frames aren't saved.
+        :type out_dir: str
+
+        :param first_frame: index of the first frame to save (defaults
+            to 0). Frames are still numbered from the first frame
+            after setup().
+        :type first_frame: int
+
+        :param seek: How to get to the first frame. 'fast-forward'
+            draws (without saving) all earlier frames and works for
+            any sketch. 'jump' only advances `frame_count` and hence
+            requires the sketch to derive its state from
+            `frame_count` alone.
+        :type seek: str
+
+        :param threads: number of threads used to encode the frames
+            (defaults to the number of CPUs).
+        :type threads: int
+
+        :raises ValueError: When the seek mode is unknown.
+
+        """
+        if seek not in ('fast-forward', 'jump'):
+            raise ValueError("Unknown seek mode '{}'".format(seek))
+
+        self.headless = True
+        self.timer.stop()
+
+        if out_dir is not None:
+            os.makedirs(out_dir, exist_ok=True)
+
+        # PNG encoding happens on a thread pool while the next frames
+        # are drawn. Only a few frames are kept in flight so that
+        # memory use stays bounded.
+        workers = threads or os.cpu_count() or 1
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=workers) as writer:
+            self.on_timer(None)
+
+            if seek == 'jump':
+                builtins.frame_count += first_frame
+            else:
+                for _ in range(first_frame):
+                    if self._is_idle():
+                        return
+                    self.on_timer(None)
+
+            for idx in range(first_frame, first_frame + num_frames):
+                if self._is_idle():
+                    break
+                self.on_timer(None)
+                if out_dir is None:
+                    continue
+
+                img_data = renderer.read_frame()
+                fname = os.path.join(out_dir, 'frame_{:05d}.png'.format(idx))
+                pending.append(writer.submit(_write_image, img_data, fname))
+                if len(pending) > 2 * workers:
+                    pending.popleft().result()
+
+            for future in pending:
+                future.result()
+
+    def _publish_frame(self):
+        """Publish the current frame to the shared memory block.
+
+        The block is created right after setup() (which sets the size
+        of the sketch).
+        """
+        img_data = renderer.read_frame()
+        self.publisher.publish(builtins.frame_count, img_data)
+
     def _save_buffer(self):
         """Save the renderer buffer to the given file.
         """
-        img_data = renderer.fbuffer.read(mode='color', alpha=False)
+        img_data = renderer.read_frame()
         img = Image.fromarray(img_data)
         img.save(self._save_fname)
         self._save_flag = False
@@ -181,21 +365,132 @@ class Sketch(app.Canvas):
         self._save_fname = stem + str(self._save_fname_num).zfill(4) + ext
         self._save_fname_num = self._save_fname_num + 1
         self._save_flag = True
+        self.wake()
+
+    def _counters(self):
+        """Totals reported along with the frame statistics."""
+        return {
+            'dropped_frames': self.scheduler.dropped_frames,
+            'skipped_updates': self.scheduler.skipped_updates,
+            'coalesced_events': self.coalesced_events,
+        }
+
+    def statistics(self):
+        """Summarize the recent frame times and draw() times.
+
+        See :meth:`p5.frame_stats` for details.
+
+        :rtype: dict
+        """
+        summary = self.frame_stats.summary(**self._counters())
+        summary['detail_level'] = renderer.detail_level
+        summary['render_scale'] = renderer.render_scale
+        for name, governor in [('detail_governor', self.detail),
+                               ('resolution_governor', self.resolution)]:
+            summary[name] = None if governor is None else governor.stats()
+        return summary
+
+    def finish(self):
+        """Write out pending recordings and statistics.
+
+        This only does something the first time it is called.
+        """
+        if self._finished:
+            return
+        self._finished = True
+
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.publisher is not None:
+            self.publisher.close()
+        if self.stats_file is not None:
+            self.frame_stats.write(self.stats_file, **self._counters())
 
     def on_close(self, event):
+        self.finish()
         exit()
 
     def on_draw(self, event):
-        pass
+        # While idle, the window might still need to be repainted
+        # (say, after being uncovered).
+        if not self.timer.running:
+            redisplay()
+
+    def _update_pixel_density(self):
+        """Set the pixel densities from the size of the window."""
+        physical_width, physical_height = self.physical_size
+        width, height = self.size
+        builtins.pixel_x_density = physical_width / width
+        builtins.pixel_y_density = physical_height / height
 
     def on_resize(self, event):
+        self._update_pixel_density()
         reset_view()
         with draw_loop():
             clear()
+        self.wake()
 
     def _enqueue_event(self, handler_name, event):
+        self._enqueue_events([handler_name], event)
+
+    def _enqueue_events(self, handler_names, event):
+        """Queue an event for one or more handlers.
+
+        When the event is coalescible for all of the handlers and the
+        end of the queue holds an unhandled event for the same
+        handlers (in the same order), that event is merged with the
+        new one instead. Only the events at the very end of the queue
+        are merged, so the order of the events is kept.
+
+        :param handler_names: names of the handlers for the event.
+        :type handler_names: str list
+
+        :param event: the event.
+        :type event: p5.sketch.events.Event
+
+        """
         event._update_builtins()
-        self.handler_queue.append((self.handlers[handler_name], event))
+        if self.recorder is not None:
+            for handler_name in handler_names:
+                self.recorder.record(builtins.frame_count, handler_name,
+                                     event)
+
+        count = len(handler_names)
+        queue = self.handler_queue
+        if all(name in self.coalesce_events for name in handler_names) and \
+           len(queue) >= count and \
+           [queue[idx][0] for idx in range(-count, 0)] == list(handler_names):
+            for idx in range(-count, 0):
+                handler_name, queued_event, timestamp = queue[idx]
+                queue[idx] = (handler_name, event._merged_with(queued_event),
+                              timestamp)
+            self._num_coalesced += count
+            self.coalesced_events += count
+            return
+
+        now = time.perf_counter()
+        for handler_name in handler_names:
+            queue.append((handler_name, event, now))
+        self.wake()
+
+    def _dispatch_events(self):
+        """Run the handlers for all queued events.
+        """
+        handler_counts = dict()
+        latency = 0.0
+
+        while self.handler_queue:
+            handler_name, event, timestamp = self.handler_queue.popleft()
+            latency = max(latency, time.perf_counter() - timestamp)
+
+            event._update_builtins()
+            self.handlers[handler_name](event)
+            handler_counts[handler_name] = handler_counts.get(handler_name, 0) + 1
+
+        self.handler_counts = handler_counts
+        self.event_latency = latency
+        self.coalesced_count = self._num_coalesced
+        self._num_coalesced = 0
 
     def on_key_press(self, event):
         kev = KeyEvent(event, active=True)
@@ -217,14 +512,14 @@ class Sketch(app.Canvas):
 
     def on_mouse_release(self, event):
         mev = MouseEvent(event)
-        self._enqueue_event('mouse_released', mev)
-        self._enqueue_event('mouse_clicked', mev)
+        self._enqueue_events(['mouse_released', 'mouse_clicked'], mev)
 
     def on_mouse_move(self, event):
         mev = MouseEvent(event, active=builtins.mouse_is_pressed)
-        self._enqueue_event('mouse_moved', mev)
         if builtins.mouse_is_pressed:
-            self._enqueue_event('mouse_dragged', mev)
+            self._enqueue_events(['mouse_moved', 'mouse_dragged'], mev)
+        else:
+            self._enqueue_event('mouse_moved', mev)
 
     def on_mouse_wheel(self, event):
         mev = MouseEvent(event, active=builtins.mouse_is_pressed)
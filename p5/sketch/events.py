@@ -18,6 +18,7 @@
 
 import builtins
 from collections import namedtuple
+import copy
 from enum import IntEnum
 
 Position = namedtuple('Position', ['x', 'y'])
@@ -224,6 +225,11 @@ class MouseEvent(Event):
     :param count: amount by which the mouse whell was dragged.
     :type count: int
 
+    :param movement: the change in the position of the mouse since
+        the previous mouse event (for events merged with earlier
+        events, the total change over all of them).
+    :type movement: (int, int)
+
     :param button: Button information at the time of the event.
     :type button: MouseButton
 
@@ -248,10 +254,34 @@ class MouseEvent(Event):
 
         self.position = Position(x, y)
         self.scroll = Position(int(dx), int(dy))
+        self.movement = Position(self.x - builtins.mouse_x,
+                                 self.y - builtins.mouse_y)
 
         self.count = self.scroll.y
         self.button = MouseButton(self._raw.buttons)
 
+    def _merged_with(self, previous):
+        """Merge a previous (unhandled) event with this one.
+
+        The merged event has the position of this event and the total
+        scroll amount and movement of both events. Neither of the
+        events is modified.
+
+        :param previous: the earlier event.
+        :type previous: MouseEvent
+
+        :returns: the merged event.
+        :rtype: MouseEvent
+
+        """
+        merged = copy.copy(self)
+        merged.scroll = Position(previous.scroll.x + self.scroll.x,
+                                 previous.scroll.y + self.scroll.y)
+        merged.movement = Position(previous.movement.x + self.movement.x,
+                                   previous.movement.y + self.movement.y)
+        merged.count = merged.scroll.y
+        return merged
+
     def _update_builtins(self):
         builtins.pmouse_x = builtins.mouse_x
         builtins.pmouse_y = builtins.mouse_y
@@ -0,0 +1,169 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Record and replay the input events of a sketch.
+
+Events are recorded as they are queued, along with the frame number
+at that time. A recording holds one JSON list per line:
+
+    [frame, handler_name, pressed, modifiers, ...]
+
+followed by (pos, delta, buttons, press_pos, last_pos) for mouse
+events and (key_name, text) for key events. Recordings whose file
+name ends in '.gz' are compressed.
+
+Replaying a recording queues the same events at the same frames, so
+an interactive sketch can be run (and timed) reproducibly.
+
+"""
+
+from collections import namedtuple
+import gzip
+import json
+
+from .events import KeyEvent
+from .events import MouseEvent
+
+# Stand-ins for the parts of the vispy events used by p5's events.
+_Modifier = namedtuple('_Modifier', ['name'])
+_Key = namedtuple('_Key', ['name'])
+_Position = namedtuple('_Position', ['pos'])
+_RawKeyEvent = namedtuple('_RawKeyEvent', ['modifiers', 'key', 'text'])
+_RawMouseEvent = namedtuple('_RawMouseEvent',
+                            ['modifiers', 'pos', 'delta', 'buttons',
+                             'press_event', 'last_event'])
+
+def _open(filename, mode):
+    if filename.endswith('.gz'):
+        return gzip.open(filename, mode + 't')
+    return open(filename, mode)
+
+def _position(event):
+    if event is None:
+        return None
+    return [float(v) for v in event.pos]
+
+def _event_record(frame, handler_name, event):
+    raw = event._raw
+    record = [frame, handler_name, event.pressed, event.modifiers]
+    if isinstance(event, MouseEvent):
+        record.extend([
+            _position(raw),
+            [float(v) for v in raw.delta],
+            [int(b) for b in raw.buttons],
+            _position(raw.press_event),
+            _position(raw.last_event),
+        ])
+    else:
+        record.extend([raw.key.name if raw.key is not None else None,
+                       raw.text])
+    return record
+
+def _record_event(record):
+    _, _, pressed, modifiers = record[:4]
+    modifiers = [_Modifier(name) for name in modifiers]
+
+    if len(record) == 9:
+        pos, delta, buttons, press_pos, last_pos = record[4:]
+        raw = _RawMouseEvent(
+            modifiers, pos, delta, buttons,
+            _Position(press_pos) if press_pos is not None else None,
+            _Position(last_pos) if last_pos is not None else None)
+        return MouseEvent(raw, active=pressed)
+
+    key_name, text = record[4:]
+    raw = _RawKeyEvent(modifiers,
+                       _Key(key_name) if key_name is not None else None,
+                       text)
+    return KeyEvent(raw, active=pressed)
+
+class EventRecorder:
+    """Record the events of a sketch to a file.
+
+    :param filename: file to write the recording to.
+    :type filename: str
+
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = _open(filename, 'w')
+
+    def record(self, frame, handler_name, event):
+        """Add an event to the recording.
+
+        :param frame: the frame number at the time of the event.
+        :type frame: int
+
+        :param handler_name: name of the handler for the event.
+        :type handler_name: str
+
+        :param event: the event.
+        :type event: p5.sketch.events.Event
+
+        """
+        record = _event_record(frame, handler_name, event)
+        self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class EventReplayer:
+    """Replay the events recorded by an :class:`EventRecorder`.
+
+    :param filename: file containing the recording.
+    :type filename: str
+
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        with _open(filename, 'r') as f:
+            self._records = [json.loads(line) for line in f if line.strip()]
+        self._next = 0
+
+    @property
+    def done(self):
+        """True once all the events have been replayed."""
+        return self._next == len(self._records)
+
+    def replay(self, sketch, frame):
+        """Queue all events recorded up to the given frame.
+
+        :param sketch: sketch to queue the events in.
+        :type sketch: p5.sketch.base.Sketch
+
+        :param frame: the current frame number.
+        :type frame: int
+
+        """
+        while self._next < len(self._records) and \
+              self._records[self._next][0] <= frame:
+            record = self._records[self._next]
+            self._next = self._next + 1
+
+            # An event queued for several handlers (say, a mouse move
+            # while dragging) was recorded once per handler.
+            handler_names = [record[1]]
+            while self._next < len(self._records) and \
+                  self._records[self._next][0] == record[0] and \
+                  self._records[self._next][2:] == record[2:]:
+                handler_names.append(self._records[self._next][1])
+                self._next = self._next + 1
+
+            sketch._enqueue_events(handler_names, _record_event(record))
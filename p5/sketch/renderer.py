@@ -20,22 +20,24 @@
 import builtins
 from contextlib import contextmanager
 import math
+import weakref
 
 import numpy as np
 
-from vispy import gloo
-from vispy.gloo import FrameBuffer
-from vispy.gloo import IndexBuffer
-from vispy.gloo import Program
-from vispy.gloo import RenderBuffer
-from vispy.gloo import Texture2D
-from vispy.gloo import VertexBuffer
-
+from .._lazy import lazy_import
 from ..pmath import matrix
+from .atlas import TextureAtlas
+from .shaders import src_blend
+from .shaders import src_blur
+from .shaders import src_color_filter
 from .shaders import src_default
 from .shaders import src_fbuffer
+from .shaders import src_rank
 from .shaders import src_texture
 
+Image = lazy_import('PIL.Image')
+gloo = lazy_import('vispy.gloo')
+
 ##
 ## Renderer globals.
 ##
@@ -48,18 +50,50 @@ default_prog = None
 fbuffer_prog = None
 texture_prog = None
 
+blur_prog = None
+rank_prog = None
+color_filter_prog = None
+blend_prog = None
+
 fbuffer = None
 fbuffer_tex_front = None
 fbuffer_tex_back = None
 
+image_fbuffer = None
+
+# Render targets of the image passes (filters and blend modes) are
+# recycled: free targets are kept by size and reused by later passes.
+MAX_FREE_PASS_TEXTURES = 4
+
+# Largest number of texels the blur and erode / dilate shaders sample
+# on each side of a pixel (MAX_RADIUS in the shader sources).
+MAX_FILTER_STEPS = 64
+_pass_textures = weakref.WeakSet()
+_free_pass_textures = {}
+
 vertex_buffer = None
 index_buffer = None
 
+sprite_vertex_buffer = None
+sprite_index_buffer = None
+atlas = None
+
 ## Renderer Globals: USEFUL CONSTANTS
 COLOR_WHITE = (1, 1, 1, 1)
 COLOR_BLACK = (0, 0, 0, 1)
 COLOR_DEFAULT_BG = (0.8, 0.8, 0.8, 1.0)
 
+# Texture coordinates of the corners of images drawn using their own
+# textures.
+IMAGE_TEXCOORDS = np.array([[0.0, 1.0],
+                            [1.0, 1.0],
+                            [0.0, 0.0],
+                            [1.0, 0.0]],
+                           dtype=np.float32)
+
+# Each image quad is drawn as two triangles.
+SPRITE_INDICES = np.array([0, 1, 2, 2, 1, 3], dtype=np.uint32)
+
 ## Renderer Globals: STYLE/MATERIAL PROPERTIES
 ##
 background_color = COLOR_DEFAULT_BG
@@ -78,14 +112,53 @@ tint_enabled = False
 ##
 viewport = None
 texture_viewport = None
-transform_matrix = np.identity(4)
+
+# Frames are drawn into the offscreen framebuffer at this fraction of
+# the window's physical resolution (and scaled up when displayed).
+render_scale = 1.0
+
+# True while draw_loop() has the offscreen framebuffer bound (with the
+# frame being drawn attached).
+drawing = False
+
+# Fraction of the usual number of segments used to tessellate
+# ellipses and curves (see p5.core.primitives).
+detail_level = 1.0
+
+# The transform matrix is the top of a preallocated stack of matrices
+# (one per push_matrix() level) that p5.core.transforms updates in
+# place.
+MATRIX_STACK_SIZE = 32
+matrix_stack = [np.identity(4) for _ in range(MATRIX_STACK_SIZE)]
+matrix_depth = 0
+transform_matrix = matrix_stack[0]
+
+# True while transform_matrix only holds a 2D affine transform (ie.,
+# it maps the xy-plane to itself), which lets transforms update just
+# the 2D entries of the matrix.
+transform_is_2d = True
+
 modelview_matrix = np.identity(4)
 projection_matrix = np.identity(4)
 
 ## Renderer Globals: RENDERING
+#
+# Shapes are queued as (vertices, indices, color, matrix_index)
+# tuples. The vertices are only transformed (all at once) when the
+# queues are flushed, using the matrices in `queued_matrices`.
 poly_draw_queue = []
 line_draw_queue = []
 point_draw_queue = []
+queued_matrices = []
+
+# Shapes sharing a matrix with at least this many vertices in total
+# are transformed by a matrix product of their own when the queue is
+# flushed (see _transform_vertices()).
+MIN_BLOCK_VERTICES = 64
+
+# Images are queued as (texture, vertices, texcoords, tint) tuples and
+# drawn in batches of consecutive images that share a texture.
+sprite_draw_queue = []
 
 ## RENDERER SETUP FUNCTIONS.
 ##
@@ -115,8 +188,18 @@ def initialize_renderer():
     global texture_prog
     global vertex_buffer
     global index_buffer
+    global sprite_vertex_buffer
+    global sprite_index_buffer
+    global atlas
 
-    fbuffer = FrameBuffer()
+    global image_fbuffer
+    global blur_prog
+    global rank_prog
+    global color_filter_prog
+    global blend_prog
+
+    fbuffer = gloo.FrameBuffer()
+    image_fbuffer = gloo.FrameBuffer()
 
     vertices = np.array([[-1.0, -1.0],
                          [+1.0, -1.0],
@@ -129,19 +212,31 @@ def initialize_renderer():
                           [1.0, 1.0]],
                          dtype=np.float32)
 
-    fbuf_vertices = VertexBuffer(data=vertices)
-    fbuf_texcoords = VertexBuffer(data=texcoords)
+    fbuf_vertices = gloo.VertexBuffer(data=vertices)
+    fbuf_texcoords = gloo.VertexBuffer(data=texcoords)
 
-    fbuffer_prog = Program(src_fbuffer.vert, src_fbuffer.frag)
+    fbuffer_prog = gloo.Program(src_fbuffer.vert, src_fbuffer.frag)
     fbuffer_prog['texcoord'] = fbuf_texcoords
     fbuffer_prog['position'] = fbuf_vertices
 
-    vertex_buffer = VertexBuffer()
-    index_buffer = IndexBuffer()
+    vertex_buffer = gloo.VertexBuffer()
+    index_buffer = gloo.IndexBuffer()
+
+    default_prog = gloo.Program(src_default.vert, src_default.frag)
+    texture_prog = gloo.Program(src_texture.vert, src_texture.frag)
 
-    default_prog = Program(src_default.vert, src_default.frag)
-    texture_prog = Program(src_texture.vert, src_texture.frag)
-    texture_prog['texcoord'] = fbuf_texcoords
+    sprite_vertex_buffer = gloo.VertexBuffer()
+    sprite_index_buffer = gloo.IndexBuffer()
+    atlas = TextureAtlas(before_update=flush_sprites)
+
+    blur_prog = gloo.Program(src_blur.vert, src_blur.frag)
+    rank_prog = gloo.Program(src_rank.vert, src_rank.frag)
+    color_filter_prog = gloo.Program(src_color_filter.vert,
+                                     src_color_filter.frag)
+    blend_prog = gloo.Program(src_blend.vert, src_blend.frag)
+    for prog in [blur_prog, rank_prog, color_filter_prog, blend_prog]:
+        prog['texcoord'] = fbuf_texcoords
+        prog['position'] = fbuf_vertices
 
     reset_view()
 
@@ -155,7 +250,6 @@ def reset_view():
     global viewport
     global texture_viewport
 
-    global transform_matrix
     global modelview_matrix
     global projection_matrix
 
@@ -168,12 +262,7 @@ def reset_view():
         int(builtins.width * builtins.pixel_x_density),
         int(builtins.height * builtins.pixel_y_density),
     )
-    texture_viewport = (
-        0,
-        0,
-        builtins.width,
-        builtins.height,
-    )
+    texture_viewport = (0, 0) + _fbuffer_size()
     gloo.set_viewport(*viewport)
 
     cz = (builtins.height / 2) / math.tan(math.radians(30))
@@ -188,7 +277,7 @@ def reset_view():
                                                  -cz)
     modelview_matrix = modelview_matrix.dot(matrix.scale_transform(1, -1, 1))
 
-    transform_matrix = np.identity(4)
+    reset_matrix_stack()
 
     default_prog['modelview'] = modelview_matrix.T.flatten()
     default_prog['projection'] = projection_matrix.T.flatten()
@@ -196,14 +285,101 @@ def reset_view():
     texture_prog['modelview'] = modelview_matrix.T.flatten()
     texture_prog['projection'] = projection_matrix.T.flatten()
 
-    fbuffer_tex_front = Texture2D((builtins.height, builtins.width, 3))
-    fbuffer_tex_back = Texture2D((builtins.height, builtins.width, 3))
+    fbuffer_tex_front = _fbuffer_texture()
+    fbuffer_tex_back = _fbuffer_texture()
 
     for buf in [fbuffer_tex_front, fbuffer_tex_back]:
         fbuffer.color_buffer = buf
         with fbuffer:
             clear()
 
+def reset_matrix_stack():
+    """Empty the matrix stack and reset the transform matrix."""
+    global matrix_depth
+    global transform_matrix
+    global transform_is_2d
+
+    matrix_depth = 0
+    transform_matrix = matrix_stack[0]
+    transform_matrix[:] = np.identity(4)
+    transform_is_2d = True
+
+def _fbuffer_size():
+    """Size (width, height) of the offscreen framebuffer in pixels."""
+    return (
+        max(1, int(round(builtins.width * builtins.pixel_x_density *
+                         render_scale))),
+        max(1, int(round(builtins.height * builtins.pixel_y_density *
+                         render_scale))),
+    )
+
+def fbuffer_scale():
+    """Number of framebuffer pixels per unit of the sketch along x and
+    y (including the pixel density and the render scale)."""
+    fbuffer_width, fbuffer_height = _fbuffer_size()
+    return (fbuffer_width / builtins.width, fbuffer_height / builtins.height)
+
+def _fbuffer_texture():
+    _, _, width, height = texture_viewport
+    # Linear interpolation smooths the frames when they are scaled up
+    # to the window.
+    return gloo.Texture2D((height, width, 3), interpolation='linear')
+
+def set_detail_level(level):
+    """Change the tessellation detail level.
+
+    :param level: fraction (0 -- 1] of the usual number of segments to
+        use for ellipses and curves.
+    :type level: float
+
+    :raises ValueError: When the level is out of range.
+
+    """
+    global detail_level
+    if not 0 < level <= 1:
+        raise ValueError("Detail level should be in (0, 1]")
+    detail_level = level
+
+def set_render_scale(scale):
+    """Change the resolution of the offscreen framebuffer.
+
+    The current frame is scaled into the resized framebuffer so that
+    sketches which don't clear the background keep their contents.
+
+    :param scale: fraction (0 -- 1] of the physical resolution of the
+        window to draw frames at.
+    :type scale: float
+
+    :raises ValueError: When the scale is out of range.
+
+    """
+    global render_scale
+    global texture_viewport
+    global fbuffer_tex_front
+    global fbuffer_tex_back
+
+    if not 0 < scale <= 1:
+        raise ValueError("Render scale should be in (0, 1]")
+
+    render_scale = scale
+    size = _fbuffer_size()
+    if texture_viewport is None or texture_viewport[2:] == size:
+        return
+
+    flush_geometry()
+    texture_viewport = (0, 0) + size
+    old_front = fbuffer_tex_front
+    fbuffer_tex_front = _fbuffer_texture()
+    fbuffer_tex_back = _fbuffer_texture()
+
+    fbuffer.color_buffer = fbuffer_tex_front
+    with fbuffer:
+        gloo.set_viewport(*texture_viewport)
+        _comm_toggles(False)
+        fbuffer_prog['texture'] = old_front
+        fbuffer_prog.draw('triangle_strip')
+    old_front.delete()
+
 def cleanup():
     """Run the clean-up routine for the renderer.
 
@@ -215,6 +391,19 @@ def cleanup():
     fbuffer_prog.delete()
     fbuffer.delete()
 
+    texture_prog.delete()
+    sprite_vertex_buffer.delete()
+    sprite_index_buffer.delete()
+    atlas.delete()
+
+    for prog in [blur_prog, rank_prog, color_filter_prog, blend_prog]:
+        prog.delete()
+    image_fbuffer.delete()
+    for textures in _free_pass_textures.values():
+        for texture in textures:
+            texture.delete()
+    _free_pass_textures.clear()
+
 ## RENDERING FUNTIONS + HELPERS
 ##
 ## These are responsible for actually rendring things to the screen.
@@ -224,9 +413,124 @@ def cleanup():
 ##        # multiple calls to render()
 ##
 
+def _transform_vertices(vertices, matrices, matrix_indices, out):
+    """Transform the vertices of many shapes at once.
+
+    The vertices lie in the z = 0 plane, so only the x, y and
+    translation columns of the matrices are used and no homogeneous
+    coordinates need to be built.
+
+    Consecutive shapes that use the same matrix form a block. Blocks
+    of at least MIN_BLOCK_VERTICES vertices are transformed with one
+    matrix product each; the vertices of all smaller blocks are
+    transformed together, each with the matrix of its block.
+
+    :param vertices: list of (N, 2) (or (N, 3)) arrays with the
+        vertices of each shape.
+    :type vertices: list
+
+    :param matrices: (M, 4, 4) float32 array of transform matrices.
+    :type matrices: np.ndarray
+
+    :param matrix_indices: index of the matrix of each shape.
+    :type matrix_indices: list
+
+    :param out: (N, 3) float32 array to write the positions of all
+        vertices to.
+    :type out: np.ndarray
+
+    """
+    dim = max(v.shape[1] for v in vertices)
+    if any(v.shape[1] != dim for v in vertices):
+        vertices = [np.pad(v, ((0, 0), (0, dim - v.shape[1])))
+                    for v in vertices]
+    points = np.concatenate(vertices).astype(np.float32, copy=False)
+
+    counts = np.array([len(v) for v in vertices])
+    matrix_indices = np.asarray(matrix_indices)
+    ends = np.cumsum(counts)
+    first_shapes = np.flatnonzero(np.diff(matrix_indices, prepend=-1))
+    block_starts = (ends - counts)[first_shapes]
+    block_stops = np.append(block_starts[1:], ends[-1])
+    block_sizes = block_stops - block_starts
+    block_matrices = matrix_indices[first_shapes]
+
+    large = block_sizes >= MIN_BLOCK_VERTICES
+    for idx, start, stop in zip(block_matrices[large].tolist(),
+                                block_starts[large].tolist(),
+                                block_stops[large].tolist()):
+        mat = matrices[idx]
+        out[start:stop] = points[start:stop].dot(mat[:3, :dim].T) + \
+            mat[:3, 3]
+    if large.all():
+        return
+
+    # Every vertex of the small blocks picks the matrix of its block.
+    small = ~large
+    per_vertex = np.repeat(block_matrices[small], block_sizes[small])
+    linear = matrices[:, :3, :dim][per_vertex]
+    offset = matrices[:, :3, 3][per_vertex]
+    if large.any():
+        selected = np.repeat(small, block_sizes)
+        out[selected] = np.einsum('nij,nj->ni', linear, points[selected]) + \
+            offset
+    else:
+        np.add(np.einsum('nij,nj->ni', linear, points), offset, out=out)
+
+def render(shape):
+    # Fold the shape's matrix into the transform matrix once per shape
+    # (in float32, like the vertex buffer).
+    mat = transform_matrix.dot(shape._matrix).astype(np.float32)
+    shape._vertices_queued = True
+
+    vertices = shape._draw_vertices
+    fill = shape.fill.normalized if shape.fill else None
+    stroke = shape.stroke.normalized if shape.stroke else None
+
+    edges = shape._draw_edges
+    faces = shape._draw_faces
+
+    if 'open' in shape.attribs:
+        add_to_draw_queue('path', shape._draw_outline_vertices,
+                          shape._draw_outline_edges, None, None, stroke,
+                          matrix=mat)
+        add_to_draw_queue('poly', vertices, edges, faces, fill, None,
+                          matrix=mat)
+    else:
+        add_to_draw_queue(shape.kind, vertices, edges, faces, fill, stroke,
+                          matrix=mat)
+
+def mipmap_level(image_size, size):
+    """Find the mipmap level to use for an image drawn at the given
+    size using the current transform.
+
+    This is the largest level that is still at least as large as the
+    image in the framebuffer (which might have more, or with a render
+    scale, fewer pixels than the logical size of the sketch).
+
+    """
+    pixels_x, pixels_y = fbuffer_scale()
+    scale_x = np.linalg.norm(transform_matrix[:2, 0]) * pixels_x
+    scale_y = np.linalg.norm(transform_matrix[:2, 1]) * pixels_y
+    screen_width = abs(size[0]) * scale_x
+    screen_height = abs(size[1]) * scale_y
+    if screen_width == 0 or screen_height == 0:
+        return 0
+
+    ratio = min(image_size[0] / screen_width, image_size[1] / screen_height)
+    if ratio < 2:
+        return 0
+    return int(math.log2(ratio))
+
 def render_image(image, location, size):
     """Render the image.
 
+    Images aren't drawn immediately but are added to a queue and
+    drawn in batches. Small images are packed into a texture atlas so
+    that consecutive images can be drawn with a single draw call.
+    Images drawn at a fraction of their size are drawn using a
+    downscaled copy (see :meth:`p5.PImage._mipmap`).
+
     :param image: image to be rendered
     :type image: p5.Image
 
@@ -236,31 +540,368 @@ def render_image(image, location, size):
     :param size: target size of the image to draw.
     :type size: tuple | list | p5.Vector
     """
-    flush_geometry()
+    global sprite_draw_queue
+
+    # Shapes drawn before the image should stay behind it.
+    if poly_draw_queue or line_draw_queue or point_draw_queue:
+        flush_geometry()
 
-    texture_prog['fill_color'] = tint_color if tint_enabled else COLOR_WHITE
-    texture_prog['transform'] = transform_matrix.T.flatten()
+    if image.mipmap:
+        image = image._mipmap(mipmap_level(image.size, size))
+
+    if atlas.accepts(image):
+        texture, texcoords = atlas.lookup(image)
+    else:
+        # Updating the texture would also change the images that are
+        # already queued.
+        if image._img_texture_dirty:
+            flush_sprites()
+        texture = image._texture
+        texcoords = IMAGE_TEXCOORDS
 
     x, y = location
     sx, sy = size
-    imx, imy = image.size
-    data = np.zeros(4,
-                    dtype=[('position', np.float32, 2),
-                           ('texcoord', np.float32, 2)])
-    data['texcoord'] = np.array([[0.0, 1.0],
-                                 [1.0, 1.0],
-                                 [0.0, 0.0],
-                                 [1.0, 0.0]],
-                                dtype=np.float32)
-    data['position'] = np.array([[x, y + sy],
-                                 [x + sx, y + sy],
-                                 [x, y],
-                                 [x + sx, y]],
-                                dtype=np.float32)
-
-    texture_prog['texture'] = image._texture
-    texture_prog.bind(VertexBuffer(data))
-    texture_prog.draw('triangle_strip')
+    vertices = np.array([[x, y + sy, 0, 1],
+                         [x + sx, y + sy, 0, 1],
+                         [x, y, 0, 1],
+                         [x + sx, y, 0, 1]])
+    vertices = np.dot(vertices, transform_matrix.T)[:, :3]
+
+    tint = tint_color if tint_enabled else COLOR_WHITE
+    sprite_draw_queue.append((texture, vertices, texcoords, tint))
+
+def flush_sprites():
+    """Draw all the images in the sprite queue.
+
+    """
+    global sprite_draw_queue
+
+    start = 0
+    while start < len(sprite_draw_queue):
+        # Find the run of images using the same texture.
+        texture = sprite_draw_queue[start][0]
+        stop = start + 1
+        while stop < len(sprite_draw_queue) and \
+              sprite_draw_queue[stop][0] is texture:
+            stop = stop + 1
+
+        run = sprite_draw_queue[start:stop]
+        num_sprites = stop - start
+        data = np.zeros((num_sprites, 4),
+                        dtype=[('position', np.float32, 3),
+                               ('texcoord', np.float32, 2),
+                               ('color', np.float32, 4)])
+        data['position'] = [vertices for _, vertices, _, _ in run]
+        data['texcoord'] = [texcoords for _, _, texcoords, _ in run]
+        data['color'] = [[tint] for _, _, _, tint in run]
+
+        offsets = 4 * np.arange(num_sprites, dtype=np.uint32)
+        indices = offsets[:, np.newaxis] + SPRITE_INDICES
+
+        sprite_vertex_buffer.set_data(data.ravel())
+        sprite_index_buffer.set_data(indices.ravel())
+
+        texture_prog['texture'] = texture
+        texture_prog.bind(sprite_vertex_buffer)
+        texture_prog.draw('triangles', indices=sprite_index_buffer)
+
+        start = stop
+
+    sprite_draw_queue = []
+
+def write_pixels(data, location):
+    """Write pixel data directly to the current frame.
+
+    :param data: (h, w, 3) array of pixel values (with the first row
+        being the topmost row) to be written.
+    :type data: np.ndarray
+
+    :param location: top-left corner of the region to write to.
+    :type location: tuple
+    """
+    x, y = location
+    h, w, _ = data.shape
+
+    # Scale the region to the resolution of the framebuffer.
+    _, _, fbuffer_width, fbuffer_height = texture_viewport
+    if (fbuffer_width, fbuffer_height) != (builtins.width, builtins.height):
+        sx = fbuffer_width / builtins.width
+        sy = fbuffer_height / builtins.height
+        x0, y0 = int(round(x * sx)), int(round(y * sy))
+        w = max(1, int(round((x + w) * sx)) - x0)
+        h = max(1, int(round((y + h) * sy)) - y0)
+        data = np.asarray(Image.fromarray(data).resize((w, h),
+                                                       Image.BILINEAR))
+        x, y = x0, y0
+
+    flipped = np.ascontiguousarray(data[::-1])
+    fbuffer_tex_back.set_data(flipped, offset=(fbuffer_height - y - h, x))
+
+def _read_fbuffer(size):
+    """Read the offscreen framebuffer and scale it to the given size.
+
+    Inside the draw loop, this reads the frame being drawn. Otherwise,
+    it reads the most recently completed frame.
+    """
+    if drawing:
+        data = fbuffer.read(mode='color', alpha=False)
+    else:
+        fbuffer.color_buffer = fbuffer_tex_front
+        with fbuffer:
+            data = fbuffer.read(mode='color', alpha=False)
+
+    width, height = size
+    if data.shape[:2] != (height, width):
+        img = Image.fromarray(data).resize((width, height), Image.BILINEAR)
+        data = np.asarray(img)
+    return data
+
+def frame_size():
+    """Size (width, height) of saved and shared frames: the physical
+    resolution of the window, independent of the render scale."""
+    return (int(round(builtins.width * builtins.pixel_x_density)),
+            int(round(builtins.height * builtins.pixel_y_density)))
+
+def read_pixels():
+    """Read the current frame at the size of the sketch.
+
+    :returns: (height, width, 3) array of pixel values (with the first
+        row being the topmost row).
+    :rtype: np.ndarray
+    """
+    return _read_fbuffer((builtins.width, builtins.height))
+
+def read_frame():
+    """Read the current frame at the physical resolution of the
+    window (see frame_size()).
+
+    Frames drawn at a lower render scale are scaled up, so the size of
+    the frames doesn't change when the render scale does.
+
+    :returns: (height, width, 3) array of pixel values (with the first
+        row being the topmost row).
+    :rtype: np.ndarray
+    """
+    return _read_fbuffer(frame_size())
+
+## IMAGE PROCESSING FUNCTIONS.
+##
+## These run filters and blend modes on image textures as
+## full-screen passes into an offscreen framebuffer. The results are
+## new RGBA textures that stay on the GPU until they are read back
+## using read_texture().
+##
+
+COLOR_FILTERS = {
+    'gray': 0,
+    'grey': 0,
+    'grayscale': 0,
+    'threshold': 1,
+    'invert': 2,
+    'posterize': 3,
+    'opacity': 4,
+    'opaque': 4,
+}
+
+BLEND_MODES = {
+    'blend': 0,
+    'add': 1,
+    'subtract': 2,
+    'lightest': 3,
+    'darkest': 4,
+    'difference': 5,
+    'exclusion': 6,
+    'multiply': 7,
+    'screen': 8,
+    'overlay': 9,
+    'hard_light': 10,
+    'soft_light': 11,
+    'dodge': 12,
+    'burn': 13,
+}
+
+def _pass_texture(height, width):
+    """Get a (free) render target for an image pass."""
+    free = _free_pass_textures.get((height, width))
+    if free:
+        return free.pop()
+    texture = gloo.Texture2D((height, width, 4), interpolation='linear')
+    _pass_textures.add(texture)
+    return texture
+
+def release_texture(texture):
+    """Release a texture that is no longer used by an image.
+
+    Render targets of image passes are kept to be reused by later
+    passes of the same size; all other textures are deleted.
+
+    :param texture: the texture to be released.
+    :type texture: gloo.Texture2D
+
+    """
+    # Images queued earlier in the frame may still draw the texture,
+    # so they have to be drawn before it is deleted or reused.
+    flush_sprites()
+
+    if texture not in _pass_textures:
+        texture.delete()
+        return
+
+    height, width = texture.shape[:2]
+    free = _free_pass_textures.setdefault((height, width), [])
+    if len(free) < MAX_FREE_PASS_TEXTURES and texture.shape[2] == 4:
+        free.append(texture)
+    else:
+        _pass_textures.discard(texture)
+        texture.delete()
+
+def _image_pass(program, texture):
+    """Draw the program over a texture of the given size and return
+    the result in a render target of the same size.
+
+    """
+    # Draw the queued images first: the pass may reuse a texture
+    # that they still refer to.
+    flush_sprites()
+
+    height, width = texture.shape[:2]
+    target = _pass_texture(height, width)
+    program['texture'] = texture
+
+    image_fbuffer.color_buffer = target
+    with image_fbuffer:
+        gloo.set_viewport(0, 0, width, height)
+        gloo.set_state(blend=False, depth_test=False)
+        program.draw('triangle_strip')
+
+    gloo.set_viewport(*texture_viewport)
+    _comm_toggles()
+    return target
+
+def _separable_pass(program, texture):
+    height, width = texture.shape[:2]
+    program['texel'] = (1 / width, 0)
+    horizontal = _image_pass(program, texture)
+    program['texel'] = (0, 1 / height)
+    result = _image_pass(program, horizontal)
+    release_texture(horizontal)
+    return result
+
+def filter_fits_shader(kind, param):
+    """Check whether the filter shaders can apply the given filter.
+
+    The blur and erode / dilate shaders only sample up to
+    :data:`MAX_FILTER_STEPS` texels on each side of a pixel (three
+    times the radius for a gaussian blur); larger radii have to be
+    filtered on the CPU.
+
+    :param kind: The kind of filter.
+    :type kind: str
+
+    :param param: parameter for the filter.
+    :type param: int | float | None
+
+    :rtype: bool
+
+    """
+    if kind in ['blur', 'gaussian_blur']:
+        return math.ceil(3 * param) <= MAX_FILTER_STEPS
+    if kind in ['box_blur', 'erode', 'dilate']:
+        return math.ceil(param) <= MAX_FILTER_STEPS
+    return True
+
+def filter_texture(texture, kind, param=None):
+    """Apply an image filter to the given texture.
+
+    :param texture: the texture to be filtered.
+    :type texture: gloo.Texture2D
+
+    :param kind: The kind of filter. See :meth:`p5.PImage.filter`
+        for valid values.
+    :type kind: str
+
+    :param param: parameter for the filter.
+    :type param: int | float | None
+
+    :returns: a new texture with the filtered image.
+    :rtype: gloo.Texture2D
+
+    :raises ValueError: When the filter is unknown.
+
+    """
+    if kind in ['blur', 'gaussian_blur', 'box_blur']:
+        if param <= 0:
+            return texture
+        blur_prog['radius'] = param
+        blur_prog['box'] = 1 if kind == 'box_blur' else 0
+        return _separable_pass(blur_prog, texture)
+
+    if kind in ['erode', 'dilate']:
+        rank_prog['radius'] = max(1, int(param))
+        rank_prog['dilate'] = 1 if kind == 'dilate' else 0
+        return _separable_pass(rank_prog, texture)
+
+    if kind not in COLOR_FILTERS:
+        raise ValueError("Unknown filter")
+
+    if kind == 'opaque':
+        param = 1.0
+    elif kind == 'posterize':
+        param = min(255, max(2, int(param)))
+
+    color_filter_prog['kind'] = COLOR_FILTERS[kind]
+    color_filter_prog['param'] = param if param is not None else 0.0
+    return _image_pass(color_filter_prog, texture)
+
+def blend_textures(texture, source, mode, region=None):
+    """Blend the source texture into the given texture.
+
+    :param texture: the destination texture.
+    :type texture: gloo.Texture2D
+
+    :param source: the source texture (with the same size as the
+        destination texture)
+    :type source: gloo.Texture2D
+
+    :param mode: name of the blend mode.
+    :type mode: str
+
+    :param region: optional (x, y, width, height) region of the
+        textures (in pixels) to be blended.
+    :type region: tuple | None
+
+    :returns: a new texture with the blended image.
+    :rtype: gloo.Texture2D
+
+    """
+    height, width = texture.shape[:2]
+    if region is None:
+        region = (0, 0, width, height)
+    x, y, w, h = region
+
+    blend_prog['source'] = source
+    blend_prog['mode'] = BLEND_MODES[mode]
+    blend_prog['region'] = (x / width, y / height,
+                            (x + w) / width, (y + h) / height)
+    return _image_pass(blend_prog, texture)
+
+def read_texture(texture):
+    """Read the contents of the texture back from the GPU.
+
+    :param texture: the texture to be read.
+    :type texture: gloo.Texture2D
+
+    :returns: a (h, w, 4) array with the texture data, the first row
+        of the array being the first row of the texture.
+    :rtype: np.ndarray
+
+    """
+    height, width = texture.shape[:2]
+    image_fbuffer.color_buffer = texture
+    with image_fbuffer:
+        data = image_fbuffer.read(mode='color', alpha=True,
+                                  crop=(0, 0, width, height))
+    return np.ascontiguousarray(data[::-1])
 
 def flush_geometry():
     """Flush all the shape geometry from the draw queue to the GPU.
@@ -268,49 +909,47 @@ def flush_geometry():
     global poly_draw_queue
     global line_draw_queue
     global point_draw_queue
+    global queued_matrices
 
     ## RETAINED MODE RENDERING.
     #
-    names = ['poly', 'line', 'point']
     types = ['triangles', 'lines', 'points']
     queues = [poly_draw_queue, line_draw_queue, point_draw_queue]
 
-    for draw_type, draw_queue, name in zip(types, queues, names):
-        # 1. Get the maximum number of vertices persent in the shapes
-        # in the draw queue.
-        #
+    if queued_matrices:
+        matrices = np.array(queued_matrices, dtype=np.float32)
+
+    for draw_type, draw_queue in zip(types, queues):
         if len(draw_queue) == 0:
             continue
 
-        num_vertices = 0
-        for vertices, _, _ in draw_queue:
-            num_vertices = num_vertices + len(vertices)
+        vertices, indices, colors, matrix_indices = zip(*draw_queue)
+        counts = np.array([len(v) for v in vertices])
 
-        # 2. Create empty buffers based on the number of vertices.
+        # 1. Create empty buffers based on the number of vertices.
         #
-        data = np.zeros(num_vertices,
+        data = np.zeros(counts.sum(),
                         dtype=[('position', np.float32, 3),
                                ('color', np.float32, 4)])
 
-        # 3. Loop through all the shapes in the geometry queue adding
-        # it's information to the buffer.
+        # 2. Transform the vertices of all shapes in the draw queue
+        # straight into the buffer and add their colors.
         #
-        sidx = 0
-        draw_indices = []
-        for vertices, idx, color in draw_queue:
-            num_shape_verts = len(vertices)
-
-            data['position'][sidx:(sidx + num_shape_verts),] = vertices
+        _transform_vertices(vertices, matrices, matrix_indices,
+                            data['position'])
+        data['color'] = np.repeat(np.array(colors, dtype=np.float32),
+                                  counts, axis=0)
 
-            color_array = np.array([color] * num_shape_verts)
-            data['color'][sidx:sidx + num_shape_verts, :] = color_array
-
-            draw_indices.append(sidx + idx)
-
-            sidx += num_shape_verts
+        # 3. Offset the indices of each shape by the position of its
+        # first vertex in the buffer.
+        #
+        starts = np.cumsum(counts) - counts
+        index_counts = [len(idx) for idx in indices]
+        draw_indices = np.concatenate(indices) + \
+            np.repeat(starts, index_counts).astype(np.uint32)
 
         vertex_buffer.set_data(data)
-        index_buffer.set_data(np.hstack(draw_indices))
+        index_buffer.set_data(draw_indices)
 
         # 4. Bind the buffer to the shader.
         #
@@ -325,49 +964,62 @@ def flush_geometry():
     poly_draw_queue = []
     line_draw_queue = []
     point_draw_queue = []
+    queued_matrices = []
+
+    flush_sprites()
 
 @contextmanager
 def draw_loop():
     """The main draw loop context manager.
     """
-    global transform_matrix
-
     global fbuffer_tex_front
     global fbuffer_tex_back
 
-    transform_matrix = np.identity(4)
+    reset_matrix_stack()
 
     default_prog['modelview'] = modelview_matrix.T.flatten()
     default_prog['projection'] = projection_matrix.T.flatten()
 
     fbuffer.color_buffer = fbuffer_tex_back
 
+    global drawing
+
     with fbuffer:
         gloo.set_viewport(*texture_viewport)
         _comm_toggles()
         fbuffer_prog['texture'] = fbuffer_tex_front
         fbuffer_prog.draw('triangle_strip')
 
-        yield
+        drawing = True
+        try:
+            yield
+        finally:
+            drawing = False
 
         flush_geometry()
 
+    fbuffer_tex_front, fbuffer_tex_back = fbuffer_tex_back, fbuffer_tex_front
+    redisplay()
+
+def redisplay():
+    """Draw the most recent frame to the screen.
+    """
     gloo.set_viewport(*viewport)
     _comm_toggles(False)
     clear()
-    fbuffer_prog['texture'] = fbuffer_tex_back
+    fbuffer_prog['texture'] = fbuffer_tex_front
     fbuffer_prog.draw('triangle_strip')
 
-    fbuffer_tex_front, fbuffer_tex_back = fbuffer_tex_back, fbuffer_tex_front
-
-def add_to_draw_queue(stype, vertices, edges, faces, fill=None, stroke=None):
+def add_to_draw_queue(stype, vertices, edges, faces, fill=None, stroke=None,
+                      matrix=None):
     """Add the given vertex data to the draw queue.
 
     :param stype: type of shape to be added. Should be one of {'poly',
         'path', 'point'}
     :type stype: str
 
-    :param vertices: (N, 3) array containing the vertices to be drawn.
+    :param vertices: (N, 2) or (N, 3) array containing the vertices
+        to be drawn.
     :type vertices: np.ndarray
 
     :param edges: (N, 2) array containing edges as tuples of indices
@@ -389,22 +1041,43 @@ def add_to_draw_queue(stype, vertices, edges, faces, fill=None, stroke=None):
         (default: None)
     :type stroke: None | tuple
 
+    :param matrix: 4x4 matrix to transform the vertices with when the
+        draw queue is flushed. When set to `None` the vertices are
+        drawn as they are (default: None)
+    :type matrix: None | np.ndarray
+
     """
     global poly_draw_queue
     global line_draw_queue
     global point_draw_queue
 
+    # Images drawn before the shape should stay behind it.
+    if sprite_draw_queue:
+        flush_sprites()
+
     fill_shape = fill_enabled and not (fill is None)
     stroke_shape = stroke_enabled and not (stroke is None)
+    if not (fill_shape or stroke_shape):
+        return
+
+    if matrix is None:
+        matrix = np.identity(4, dtype=np.float32)
+    # Shapes drawn with the same matrix share it, so that they are
+    # transformed as one block.
+    if queued_matrices and np.array_equal(queued_matrices[-1], matrix):
+        matrix_index = len(queued_matrices) - 1
+    else:
+        matrix_index = len(queued_matrices)
+        queued_matrices.append(matrix)
 
     if fill_shape and stype not in ['point', 'path']:
         idx = np.array(faces, dtype=np.uint32).ravel()
-        poly_draw_queue.append((vertices, idx, fill))
+        poly_draw_queue.append((vertices, idx, fill, matrix_index))
 
     if stroke_shape:
         if stype == 'point':
             idx = np.arange(0, len(vertices), dtype=np.uint32)
-            point_draw_queue.append((vertices, idx, stroke))
+            point_draw_queue.append((vertices, idx, stroke, matrix_index))
         else:
             idx = np.array(edges, dtype=np.uint32).ravel()
-            line_draw_queue.append((vertices, idx, stroke))
+            line_draw_queue.append((vertices, idx, stroke, matrix_index))
@@ -0,0 +1,304 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Frame scheduling for sketches.
+
+The sketch timer ticks twice per frame and the scheduler decides on
+each tick whether a new frame is due. Frame deadlines advance by a
+fixed interval (instead of "now + interval") so that the frame rate
+doesn't drift. When the sketch falls behind by more than a frame, the
+missed frames are dropped instead of being drawn back to back.
+
+Optionally, the scheduler runs fixed-timestep updates: the sketch's
+update() function is called a fixed number of times per second,
+independent of the frame rate, and draw() can use the fraction of an
+update step that has passed (``update_alpha``) to interpolate between
+the last two states.
+
+"""
+
+from collections import deque
+import math
+
+# Updates are only run for at most MAX_ELAPSED seconds of (wall clock)
+# time per frame. Any time beyond that (say, while the window is
+# being dragged) is dropped.
+MAX_ELAPSED = 0.25
+
+class FrameScheduler:
+    """Decide when to draw frames and run fixed-timestep updates.
+
+    :param frame_rate: The target number of frames per second. When
+        set to None (or 0), frames are drawn as fast as possible.
+    :type frame_rate: int | float | None
+
+    :param update_rate: Number of fixed-timestep updates per second
+        (defaults to None, i.e., no updates).
+    :type update_rate: int | float | None
+
+    :param max_updates: maximum number of updates to run before each
+        frame (defaults to 5). Further updates are skipped so that a
+        slow update() can't stall the sketch.
+    :type max_updates: int
+
+    :param history: number of frames to measure the frame rate over
+        (defaults to 120).
+    :type history: int
+
+    """
+    def __init__(self, frame_rate=60, update_rate=None, max_updates=5,
+                 history=120):
+        self.interval = 1.0 / frame_rate if frame_rate else 0
+        self.update_interval = 1.0 / update_rate if update_rate else None
+        self.max_updates = max_updates
+
+        self.frame_times = deque(maxlen=history)
+        self.last_frame_time = None
+        self.dropped_frames = 0
+        self.skipped_updates = 0
+        self.update_alpha = 0.0
+
+        self._next_frame = None
+        self._last_frame = None
+        self._last_update = None
+        self._accumulator = 0.0
+
+    @property
+    def timer_interval(self):
+        """Interval (in seconds) to use for the sketch timer."""
+        return self.interval / 2
+
+    def begin_frame(self, now):
+        """Check if a frame should be drawn at the given time.
+
+        :param now: current time in seconds.
+        :type now: float
+
+        :returns: True if a frame is due.
+        :rtype: bool
+
+        """
+        if self.interval > 0:
+            if self._next_frame is None:
+                self._next_frame = now
+
+            # Timer ticks are never exact, so we accept ticks that
+            # are close to the deadline.
+            if now < self._next_frame - self.interval / 4:
+                return False
+
+            behind = now - self._next_frame
+            if behind > self.interval:
+                missed = math.floor(behind / self.interval)
+                self.dropped_frames += missed
+                self._next_frame += missed * self.interval
+            self._next_frame += self.interval
+
+        if self._last_frame is not None:
+            self.last_frame_time = now - self._last_frame
+            self.frame_times.append(self.last_frame_time)
+        else:
+            self.last_frame_time = None
+        self._last_frame = now
+        return True
+
+    def num_updates(self, now):
+        """Get the number of fixed-timestep updates to run now.
+
+        This also sets ``update_alpha`` to the fraction of an update
+        step that remains after running the updates.
+
+        :param now: current time in seconds.
+        :type now: float
+
+        :rtype: int
+
+        """
+        if self.update_interval is None:
+            return 0
+
+        if self._last_update is None:
+            self._last_update = now
+        elapsed = min(now - self._last_update, MAX_ELAPSED)
+        self._last_update = now
+
+        self._accumulator += elapsed
+        count = math.floor(self._accumulator / self.update_interval)
+        if count > self.max_updates:
+            self.skipped_updates += count - self.max_updates
+            count = self.max_updates
+            self._accumulator = self._accumulator % self.update_interval
+        else:
+            self._accumulator -= count * self.update_interval
+
+        self.update_alpha = self._accumulator / self.update_interval
+        return count
+
+    def reset(self):
+        """Restart the frame timing (say, after the sketch was paused).
+
+        """
+        self._next_frame = None
+        self._last_frame = None
+        self._last_update = None
+        self._accumulator = 0.0
+
+    @property
+    def frame_rate(self):
+        """The average frame rate over the recent frames.
+
+        :rtype: float | None
+        """
+        if not self.frame_times:
+            return None
+        return len(self.frame_times) / sum(self.frame_times)
+
+class FrameTimeGovernor:
+    """Adapt a quality level (say, the render scale) to a frame time
+    target.
+
+    The level is lowered one step whenever the (smoothed) frame time
+    goes over the target. While the target is met, the level is raised
+    again one step at a time. A raise that has to be undone right away
+    doubles the wait before the next raise, so the level doesn't keep
+    oscillating around the limit of the hardware.
+
+    :param target: target frame time in seconds.
+    :type target: float
+
+    :param min_level: lowest level to use (defaults to 0.5).
+    :type min_level: float
+
+    :param max_level: highest level to use (defaults to 1).
+    :type max_level: float
+
+    :param step: amount to change the level by (defaults to 0.1).
+    :type step: float
+
+    :param cooldown: number of frames to wait after a change before
+        measuring again (defaults to 30).
+    :type cooldown: int
+
+    """
+    # Frame times within this fraction of the target count as meeting
+    # it, and the weight of each new frame in the smoothed frame time.
+    TOLERANCE = 0.1
+    SMOOTHING = 0.1
+
+    def __init__(self, target, min_level=0.5, max_level=1.0, step=0.1,
+                 cooldown=30):
+        self.target = target
+        self.min_level = min_level
+        self.max_level = max_level
+        self.step = step
+        self.cooldown = cooldown
+
+        self.level = max_level
+        self.frame_time = None
+
+        # Time (in seconds of frame time) from the first frame over
+        # the target to the lowering of the level, for the most recent
+        # drop.
+        self.reaction_time = None
+        self.drops = 0
+        self.raises = 0
+
+        self._clock = 0.0
+        self._over_since = None
+
+        self._wait = cooldown
+        self._frames_met = 0
+        self._raise_wait = cooldown
+        self._raised = False
+
+    def update(self, frame_time):
+        """Add the time of the last frame and get the level to use for
+        the next frame.
+
+        :param frame_time: duration of the last frame in seconds.
+        :type frame_time: float
+
+        :rtype: float
+
+        """
+        self._clock += frame_time
+        over_budget = self.target * (1 + self.TOLERANCE)
+        if frame_time <= over_budget:
+            self._over_since = None
+        elif self._over_since is None:
+            self._over_since = self._clock - frame_time
+
+        if self.frame_time is None:
+            self.frame_time = frame_time
+        else:
+            self.frame_time += self.SMOOTHING * (frame_time - self.frame_time)
+
+        if self._wait > 0:
+            self._wait -= 1
+            return self.level
+
+        if self.frame_time > over_budget:
+            if self.level > self.min_level:
+                if self._raised:
+                    self._raise_wait = min(2 * self._raise_wait,
+                                           64 * self.cooldown)
+                self._raised = False
+                if self._over_since is not None:
+                    self.reaction_time = self._clock - self._over_since
+                    self._over_since = None
+                self.drops += 1
+                self._change(max(self.min_level, self.level - self.step))
+            return self.level
+
+        self._frames_met += 1
+        if self._raised and self._frames_met == self.cooldown:
+            # The last raise held up.
+            self._raised = False
+            self._raise_wait = max(self.cooldown, self._raise_wait // 2)
+        if self.level < self.max_level and \
+           self._frames_met >= self._raise_wait:
+            self._raised = True
+            self.raises += 1
+            self._change(min(self.max_level, self.level + self.step))
+        return self.level
+
+    def hold(self):
+        """Restart the measurements (say, after some other setting
+        that affects the frame time was changed)."""
+        self.frame_time = None
+        self._frames_met = 0
+        self._wait = self.cooldown
+
+    def _change(self, level):
+        self.level = round(level, 3)
+        self.hold()
+
+    def stats(self):
+        """Summarize the state of the governor.
+
+        :returns: A dictionary with the current 'level', the
+            'reaction_time' of the last drop in seconds (or None) and
+            the number of 'drops' and 'raises' of the level so far.
+        :rtype: dict
+
+        """
+        return {
+            'level': self.level,
+            'reaction_time': self.reaction_time,
+            'drops': self.drops,
+            'raises': self.raises,
+        }
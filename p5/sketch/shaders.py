@@ -47,34 +47,37 @@ void main()
 }
 """
 
-# texture vertex shader
+# texture vertex shader. Images are drawn in batches: the vertex
+# positions are already transformed and the tint is passed per vertex.
 texture_vertex_source = """
-attribute vec2 position;
+attribute vec3 position;
 attribute vec2 texcoord;
+attribute vec4 color;
 
-uniform mat4 transform;
 uniform mat4 modelview;
 uniform mat4 projection;
 
-varying vec4 vertex_texcoord;
+varying vec2 vertex_texcoord;
+varying vec4 vertex_color;
 
 void main()
 {
-    gl_Position = projection * modelview * transform * vec4(position, 0.0, 1.0);
-    vertex_texcoord = vec4(texcoord, 1.0, 1.0);
+    gl_Position = projection * modelview * vec4(position, 1.0);
+    vertex_texcoord = texcoord;
+    vertex_color = color;
 }
 """
 
 # texture fragment shader
 texture_fragment_source = """
-uniform vec4 fill_color;
 uniform sampler2D texture;
 
-varying vec4 vertex_texcoord;
+varying vec2 vertex_texcoord;
+varying vec4 vertex_color;
 
 void main()
 {
-    gl_FragColor = texture2D(texture, vertex_texcoord.st) * fill_color;
+    gl_FragColor = texture2D(texture, vertex_texcoord) * vertex_color;
 }
 """
 
@@ -100,6 +103,187 @@ void main() {
 }
 """
 
+# Shader sources for image filters and blend modes. These are drawn
+# with the framebuffer vertex shader as a full-screen pass over an
+# image texture. Loops use constant bounds and the shaders only rely
+# on GLSL 1.20 / GLSL ES 1.0 features so that they also work on
+# software OpenGL implementations.
+
+# Separable (one dimensional) gaussian or box blur.
+blur_fragment_source = """
+uniform sampler2D texture;
+uniform vec2 texel;
+uniform float radius;
+uniform int box;
+
+varying vec2 vert_tex_coord;
+
+const int MAX_RADIUS = 64;
+
+void main() {
+    int steps = int(ceil(box == 1 ? radius : 3.0 * radius));
+    vec4 color = texture2D(texture, vert_tex_coord);
+    float total = 1.0;
+
+    for (int i = 1; i <= MAX_RADIUS; i++) {
+        if (i > steps) {
+            break;
+        }
+
+        float x = float(i);
+        float weight;
+        if (box == 1) {
+            weight = x <= radius ? 1.0 : radius - floor(radius);
+        } else {
+            weight = exp(-(x * x) / (2.0 * radius * radius));
+        }
+
+        color += weight * (texture2D(texture, vert_tex_coord + x * texel) +
+                           texture2D(texture, vert_tex_coord - x * texel));
+        total += 2.0 * weight;
+    }
+
+    gl_FragColor = color / total;
+}
+"""
+
+# Separable (one dimensional) erode / dilate.
+rank_fragment_source = """
+uniform sampler2D texture;
+uniform vec2 texel;
+uniform int radius;
+uniform int dilate;
+
+varying vec2 vert_tex_coord;
+
+const int MAX_RADIUS = 64;
+
+void main() {
+    vec4 center = texture2D(texture, vert_tex_coord);
+    vec3 result = center.rgb;
+
+    for (int i = 1; i <= MAX_RADIUS; i++) {
+        if (i > radius) {
+            break;
+        }
+
+        vec3 a = texture2D(texture, vert_tex_coord + float(i) * texel).rgb;
+        vec3 b = texture2D(texture, vert_tex_coord - float(i) * texel).rgb;
+        if (dilate == 1) {
+            result = max(result, max(a, b));
+        } else {
+            result = min(result, min(a, b));
+        }
+    }
+
+    gl_FragColor = vec4(result, center.a);
+}
+"""
+
+# Per-pixel filters: gray (0), threshold (1), invert (2), posterize
+# (3) and opacity (4).
+color_filter_fragment_source = """
+uniform sampler2D texture;
+uniform int kind;
+uniform float param;
+
+varying vec2 vert_tex_coord;
+
+void main() {
+    vec4 color = texture2D(texture, vert_tex_coord);
+    float lum = dot(color.rgb, vec3(0.299, 0.587, 0.114));
+
+    if (kind == 0) {
+        color.rgb = vec3(lum);
+    } else if (kind == 1) {
+        color.rgb = vec3(step(param, lum));
+    } else if (kind == 2) {
+        color.rgb = 1.0 - color.rgb;
+    } else if (kind == 3) {
+        vec3 level = floor(floor(color.rgb * 255.0 + 0.5) * param / 256.0);
+        color.rgb = level / (param - 1.0);
+    } else if (kind == 4) {
+        color.a = param;
+    }
+
+    gl_FragColor = color;
+}
+"""
+
+# Blend modes. The destination is `texture`, the source is `source`,
+# and pixels outside of `region` (given as the texture coordinates
+# x0, y0, x1, y1) are left untouched.
+blend_fragment_source = """
+uniform sampler2D texture;
+uniform sampler2D source;
+uniform int mode;
+uniform vec4 region;
+
+varying vec2 vert_tex_coord;
+
+vec3 screen(vec3 d, vec3 s) {
+    return 1.0 - (1.0 - d) * (1.0 - s);
+}
+
+void main() {
+    vec4 dst = texture2D(texture, vert_tex_coord);
+    vec4 src = texture2D(source, vert_tex_coord);
+
+    vec2 inside = step(region.xy, vert_tex_coord) *
+                  (1.0 - step(region.zw, vert_tex_coord));
+    if (inside.x * inside.y == 0.0) {
+        gl_FragColor = dst;
+        return;
+    }
+
+    vec3 d = dst.rgb;
+    vec3 s = src.rgb;
+    float a = src.a;
+    vec3 result;
+
+    if (mode == 0) {
+        result = mix(d, s, a);
+    } else if (mode == 1) {
+        result = min(d + s * a, 1.0);
+    } else if (mode == 2) {
+        result = max(d - s * a, 0.0);
+    } else if (mode == 3) {
+        result = max(d, s * a);
+    } else if (mode == 4) {
+        result = mix(d, min(d, s), a);
+    } else if (mode == 5) {
+        result = mix(d, abs(d - s), a);
+    } else if (mode == 6) {
+        result = mix(d, d + s - 2.0 * d * s, a);
+    } else if (mode == 7) {
+        result = mix(d, d * s, a);
+    } else if (mode == 8) {
+        result = mix(d, screen(d, s), a);
+    } else if (mode == 9) {
+        result = mix(d, mix(2.0 * d * s, 1.0 - 2.0 * (1.0 - d) * (1.0 - s),
+                            step(0.5, d)), a);
+    } else if (mode == 10) {
+        result = mix(d, mix(2.0 * d * s, 1.0 - 2.0 * (1.0 - d) * (1.0 - s),
+                            step(0.5, s)), a);
+    } else if (mode == 11) {
+        result = mix(d, (1.0 - 2.0 * s) * d * d + 2.0 * s * d, a);
+    } else if (mode == 12) {
+        vec3 dodge = min(d / max(1.0 - s, 0.001), 1.0);
+        result = mix(d, mix(dodge, vec3(1.0), step(1.0, s)), a);
+    } else {
+        vec3 burn = max(1.0 - (1.0 - d) / max(s, 0.001), 0.0);
+        result = mix(d, burn * step(0.001, s), a);
+    }
+
+    gl_FragColor = vec4(result, min(dst.a + a, 1.0));
+}
+"""
+
 src_default = ShaderSource(default_vertex_source, default_fragment_source)
 src_texture = ShaderSource(texture_vertex_source, texture_fragment_source)
 src_fbuffer = ShaderSource(fbuffer_vertex_source, fbuffer_fragment_source)
+src_blur = ShaderSource(fbuffer_vertex_source, blur_fragment_source)
+src_rank = ShaderSource(fbuffer_vertex_source, rank_fragment_source)
+src_color_filter = ShaderSource(fbuffer_vertex_source,
+                                color_filter_fragment_source)
+src_blend = ShaderSource(fbuffer_vertex_source, blend_fragment_source)
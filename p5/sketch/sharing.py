@@ -0,0 +1,290 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Share rendered frames with other processes.
+
+Frames are published into a ring of slots in a shared memory block so
+that another process (say, a compositor) can read them without going
+through image files. The block starts with a header of HEADER_SIZE
+int64 values:
+
+    [magic, number of slots, slot capacity (bytes), channels,
+     sequence number of the latest frame, 0, 0, 0]
+
+followed by the slots. Each slot starts with SLOT_HEADER_SIZE int64
+values:
+
+    [begin sequence, frame number, width, height, timestamp (ns),
+     end sequence, 0, 0]
+
+followed by the (height, width, channels) uint8 pixels of the frame.
+
+Publishing is lock-free. The writer sets the begin sequence of a slot,
+copies the pixels and only then sets the end sequence and the global
+sequence. A reader copies a slot and checks that its begin and end
+sequences still match afterwards; otherwise the slot was overwritten
+while it was being read.
+
+"""
+
+import time
+
+import numpy as np
+
+MAGIC = 0x70357368617265  # "p5share"
+
+HEADER_SIZE = 8
+SLOT_HEADER_SIZE = 8
+
+_H_MAGIC, _H_SLOTS, _H_CAPACITY, _H_CHANNELS, _H_SEQUENCE = range(5)
+_S_BEGIN, _S_FRAME, _S_WIDTH, _S_HEIGHT, _S_TIMESTAMP, _S_END = range(6)
+
+# Names of the blocks created by this process.
+_created = set()
+
+def _shared_memory(name, create=False, size=0):
+    from multiprocessing import shared_memory
+
+    if create:
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _created.add(name)
+        return shm
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13, attaching registers the block with the
+        # resource tracker, which would remove it when the reader
+        # exits.
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        if name not in _created:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+def _remove_stale_block(name):
+    """Remove a block of frames left behind by a publisher that wasn't
+    closed (say, because the sketch crashed).
+
+    :raises FileExistsError: When the block doesn't hold p5 frames.
+
+    """
+    shm = _shared_memory(name)
+    stale = shm.size >= HEADER_SIZE * 8 and \
+        np.ndarray((1,), dtype=np.int64, buffer=shm.buf)[0] == MAGIC
+    shm.close()
+    if not stale:
+        raise FileExistsError("Shared memory block '{}' already exists and "
+                              "doesn't hold p5 frames".format(name))
+
+    # Attach as the owner of the block so that unlinking it also
+    # unregisters it from the resource tracker.
+    _created.add(name)
+    shm = _shared_memory(name)
+    shm.close()
+    shm.unlink()
+
+class _FrameRing:
+    """Views into the header and slots of a shared memory block."""
+    def _map(self, shm, slots, capacity):
+        self.shm = shm
+        self.slots = slots
+        self.capacity = capacity
+        self.header = np.ndarray((HEADER_SIZE,), dtype=np.int64,
+                                 buffer=shm.buf)
+
+        slot_size = SLOT_HEADER_SIZE * 8 + capacity
+        self.slot_headers = []
+        self.slot_data = []
+        for idx in range(slots):
+            offset = HEADER_SIZE * 8 + idx * slot_size
+            self.slot_headers.append(
+                np.ndarray((SLOT_HEADER_SIZE,), dtype=np.int64,
+                           buffer=shm.buf, offset=offset))
+            self.slot_data.append(
+                np.ndarray((capacity,), dtype=np.uint8, buffer=shm.buf,
+                           offset=offset + SLOT_HEADER_SIZE * 8))
+
+    @property
+    def sequence(self):
+        """Sequence number of the latest frame (0 before the first)."""
+        return int(self.header[_H_SEQUENCE])
+
+    def _release(self):
+        # The views have to go before the block can be closed.
+        self.header = None
+        self.slot_headers = []
+        self.slot_data = []
+        self.shm.close()
+
+class FramePublisher(_FrameRing):
+    """Publish frames into a new shared memory block.
+
+    A block of frames with the same name that was left behind by an
+    earlier publisher is replaced.
+
+    :param name: name of the shared memory block.
+    :type name: str
+
+    :param size: largest (width, height) of the frames.
+    :type size: (int, int)
+
+    :param channels: number of color channels of the frames
+        (defaults to 3).
+    :type channels: int
+
+    :param slots: number of frames kept in the ring (defaults to 4).
+        Readers have to copy a frame before `slots - 1` newer frames
+        are published.
+    :type slots: int
+
+    :raises FileExistsError: When a block with the same name that
+        doesn't hold p5 frames exists.
+
+    """
+    def __init__(self, name, size, channels=3, slots=4):
+        width, height = size
+        # Keep slots aligned to 64 bytes.
+        capacity = -(-width * height * channels // 64) * 64
+        total = HEADER_SIZE * 8 + slots * (SLOT_HEADER_SIZE * 8 + capacity)
+
+        self.name = name
+        self.channels = channels
+        try:
+            shm = _shared_memory(name, create=True, size=total)
+        except FileExistsError:
+            _remove_stale_block(name)
+            shm = _shared_memory(name, create=True, size=total)
+        self._map(shm, slots, capacity)
+        self.header[:] = 0
+        self.header[_H_MAGIC] = MAGIC
+        self.header[_H_SLOTS] = slots
+        self.header[_H_CAPACITY] = capacity
+        self.header[_H_CHANNELS] = channels
+
+    def publish(self, frame_number, pixels):
+        """Publish a frame.
+
+        :param frame_number: the frame number (eg. `frame_count`).
+        :type frame_number: int
+
+        :param pixels: (height, width, channels) uint8 array.
+        :type pixels: np.ndarray
+
+        :returns: the sequence number of the frame.
+        :rtype: int
+
+        :raises ValueError: When the frame doesn't fit in a slot.
+
+        """
+        height, width, channels = pixels.shape
+        nbytes = height * width * channels
+        if channels != self.channels or nbytes > self.capacity:
+            raise ValueError("Frame doesn't fit in the shared memory slots")
+
+        sequence = self.sequence + 1
+        slot_header = self.slot_headers[sequence % self.slots]
+
+        slot_header[_S_BEGIN] = sequence
+        self.slot_data[sequence % self.slots][:nbytes] = pixels.reshape(-1)
+        slot_header[_S_FRAME] = frame_number
+        slot_header[_S_WIDTH] = width
+        slot_header[_S_HEIGHT] = height
+        slot_header[_S_TIMESTAMP] = time.time_ns()
+        slot_header[_S_END] = sequence
+
+        self.header[_H_SEQUENCE] = sequence
+        return sequence
+
+    def close(self, unlink=True):
+        """Close (and by default, remove) the shared memory block."""
+        shm = self.shm
+        self._release()
+        if unlink:
+            shm.unlink()
+
+class FrameReader(_FrameRing):
+    """Read frames published by a :class:`FramePublisher`.
+
+    :param name: name of the shared memory block.
+    :type name: str
+
+    :raises ValueError: When the block doesn't hold published frames.
+
+    """
+    def __init__(self, name):
+        shm = _shared_memory(name)
+        header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=shm.buf)
+        if header[_H_MAGIC] != MAGIC:
+            del header
+            shm.close()
+            raise ValueError("'{}' doesn't hold p5 frames".format(name))
+
+        self.name = name
+        self.channels = int(header[_H_CHANNELS])
+        self._map(shm, int(header[_H_SLOTS]), int(header[_H_CAPACITY]))
+        del header
+
+    def is_valid(self, sequence):
+        """Check if the frame with the given sequence number is still in
+        the ring (and completely written)."""
+        slot_header = self.slot_headers[sequence % self.slots]
+        return sequence > 0 and slot_header[_S_END] == sequence and \
+            slot_header[_S_BEGIN] == sequence
+
+    def read(self, sequence=None, copy=True):
+        """Read a frame.
+
+        :param sequence: sequence number of the frame to read (defaults
+            to the latest frame).
+        :type sequence: int
+
+        :param copy: When False, the pixels are a view into the shared
+            memory (no copy is made). The view is only valid until the
+            slot is reused; use :meth:`is_valid` after processing it
+            to make sure it wasn't overwritten in the meantime.
+        :type copy: bool
+
+        :returns: The sequence number, frame number, timestamp (in
+            nanoseconds since the epoch) and (height, width, channels)
+            pixels of the frame, or None when the frame isn't
+            available (anymore).
+        :rtype: tuple | None
+
+        """
+        if sequence is None:
+            sequence = self.sequence
+
+        slot = sequence % self.slots
+        slot_header = self.slot_headers[slot]
+        if sequence <= 0 or slot_header[_S_END] != sequence:
+            return None
+
+        frame_number, width, height, timestamp = \
+            [int(v) for v in slot_header[_S_FRAME:_S_END]]
+        nbytes = height * width * self.channels
+        pixels = self.slot_data[slot][:nbytes]
+        if copy:
+            pixels = pixels.copy()
+
+        if slot_header[_S_BEGIN] != sequence:
+            return None
+        return (sequence, frame_number, timestamp,
+                pixels.reshape(height, width, self.channels))
+
+    def close(self):
+        self._release()
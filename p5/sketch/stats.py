@@ -0,0 +1,185 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Frame time statistics.
+
+"""
+
+from collections import deque
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+# Samples are sorted into bins of BIN_WIDTH seconds up to MAX_TIME
+# seconds (with one more bin for all longer samples). Percentiles are
+# hence accurate to BIN_WIDTH.
+BIN_WIDTH = 0.0001
+MAX_TIME = 1.0
+
+# Number of recent samples kept by default (about a minute at 60 fps).
+WINDOW = 3600
+
+# Supported extensions of the files the statistics are written to.
+STATS_FILE_FORMATS = ('.csv', '.jsonl')
+
+def check_stats_file(filename):
+    """Check that the statistics can be written to the given file.
+
+    :param filename: name of the file to write to.
+    :type filename: str
+
+    :raises ValueError: When the file format is not supported.
+
+    """
+    if not filename.endswith(STATS_FILE_FORMATS):
+        raise ValueError("Unknown stats file format (should be a '.csv' "
+                         "or '.jsonl' file)")
+
+class RollingHistogram:
+    """Histogram of the most recent samples of a time measurement.
+
+    :param window: number of recent samples to keep.
+    :type window: int
+
+    """
+    def __init__(self, window=WINDOW):
+        self.counts = np.zeros(int(MAX_TIME / BIN_WIDTH) + 1, dtype=np.int64)
+        self.samples = deque(maxlen=window)
+        self.total = 0.0
+
+    def _bin(self, value):
+        return min(int(value / BIN_WIDTH), len(self.counts) - 1)
+
+    def add(self, value):
+        """Add a sample (in seconds) dropping the oldest sample when
+        the window is full."""
+        if len(self.samples) == self.samples.maxlen:
+            oldest = self.samples[0]
+            self.counts[self._bin(oldest)] -= 1
+            self.total -= oldest
+
+        self.samples.append(value)
+        self.counts[self._bin(value)] += 1
+        self.total += value
+
+    def percentile(self, q):
+        """Get the q-th percentile (0 -- 100) of the samples.
+
+        :returns: The upper edge of the bin containing the percentile
+            (or None when there are no samples).
+        :rtype: float | None
+
+        """
+        if not self.samples:
+            return None
+        rank = max(1, int(np.ceil(len(self.samples) * q / 100)))
+        idx = int(np.searchsorted(np.cumsum(self.counts), rank))
+        if idx == len(self.counts) - 1:
+            return max(self.samples)
+        return round((idx + 1) * BIN_WIDTH, 6)
+
+    def summary(self):
+        """Summarize the samples.
+
+        :returns: A dictionary with the number of samples ('count'),
+            their mean and maximum and the 50th, 95th and 99th
+            percentiles ('p50', 'p95', 'p99'). All times are in
+            seconds.
+        :rtype: dict
+
+        """
+        count = len(self.samples)
+        return {
+            'count': count,
+            'mean': float(self.total / count) if count else None,
+            'max': float(max(self.samples)) if count else None,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+        }
+
+class FrameStats:
+    """Rolling statistics of the frame times and draw() times.
+
+    :param window: number of recent frames to keep.
+    :type window: int
+
+    """
+    def __init__(self, window=WINDOW):
+        self.frame_times = RollingHistogram(window)
+        self.draw_times = RollingHistogram(window)
+
+    def summary(self, dropped_frames=0, **counters):
+        """Summarize the frame and draw() times.
+
+        :param dropped_frames: total number of dropped frames.
+        :type dropped_frames: int
+
+        :param counters: other totals to include in the summary (say,
+            the number of coalesced events).
+
+        :rtype: dict
+
+        """
+        summary = {
+            'frame_time': self.frame_times.summary(),
+            'draw_time': self.draw_times.summary(),
+            'dropped_frames': dropped_frames,
+        }
+        summary.update(counters)
+        return summary
+
+    def write(self, filename, dropped_frames=0, **counters):
+        """Append the summary to a CSV or JSONL file.
+
+        The format is picked from the extension of the file ('.csv' or
+        '.jsonl'). CSV files get a header when they are created.
+
+        :param filename: name of the file to write to.
+        :type filename: str
+
+        :param dropped_frames: total number of dropped frames.
+        :type dropped_frames: int
+
+        :param counters: other totals to write (one column each).
+
+        :raises ValueError: When the file format is not supported.
+
+        """
+        check_stats_file(filename)
+
+        row = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        summary = self.summary(dropped_frames)
+        for name in ['frame_time', 'draw_time']:
+            for key, value in summary[name].items():
+                row[name + '_' + key] = value
+        row['dropped_frames'] = dropped_frames
+        row.update(counters)
+
+        if filename.endswith('.jsonl'):
+            with open(filename, 'a') as f:
+                f.write(json.dumps(row) + '\n')
+        else:
+            write_header = not os.path.exists(filename)
+            with open(filename, 'a', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(row))
+                if write_header:
+                    writer.writeheader()
+                writer.writerow(row)
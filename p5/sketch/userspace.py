@@ -17,24 +17,38 @@
 #
 """Userspace functions"""
 
-import __main__
 import builtins
 import os
+import sys
 
 from functools import wraps
 
-import vispy
-from vispy import app
-
-from .base import Sketch
+from .._lazy import lazy_import
 from .events import handler_names
+from .recording import EventRecorder
+from .recording import EventReplayer
 from .renderer import initialize_renderer
+from .renderer import set_detail_level
+from .renderer import set_render_scale
+from .scheduler import FrameTimeGovernor
+from .stats import check_stats_file
+
+app = lazy_import('vispy.app')
 
 __all__ = ['no_loop', 'loop', 'redraw', 'size', 'title', 'no_cursor',
-           'cursor', 'exit', 'draw', 'setup', 'run', 'save_frame', 'save']
+           'cursor', 'exit', 'draw', 'setup', 'run', 'save_frame', 'save',
+           'frame_stats']
 
 default_sketch = None
 
+# Options set by the command line interface (see p5/__main__.py) that
+# override the ones given by the sketch: 'backend', 'size',
+# 'frame_rate', 'stats_file', 'share_frames', 'render_scale' and
+# 'detail_level' and, to draw frames without showing
+# the window, 'frames', 'out_dir', 'first_frame', 'seek' and 'threads'
+# (see Sketch.render_frames()).
+_cli_options = dict()
+
 builtins.width = 360
 builtins.height = 360
 builtins.pixel_x_density = 1
@@ -43,6 +57,7 @@ builtins.pixel_y_density = 1
 builtins.title = "p5"
 builtins.frame_count = -1
 builtins.frame_rate = None
+builtins.update_alpha = 0.0
 builtins.focused = True
 
 builtins.mouse_button = None
@@ -92,7 +107,11 @@ def setup():
     """
     pass
 
-def run(sketch_setup=None, sketch_draw=None, frame_rate=60):
+def run(sketch_setup=None, sketch_draw=None, frame_rate=60,
+        update_rate=None, record_input=None, replay_input=None,
+        stats_file=None, share_frames=None, render_scale=1.0,
+        detail_level=1.0, detail_range=(0.25, 1.0),
+        target_frame_time=None):
     """Run a sketch.
 
     if no `sketch_setup` and `sketch_draw` are specified, p5 automatically
@@ -106,44 +125,160 @@ def run(sketch_setup=None, sketch_draw=None, frame_rate=60):
         default.)
     :type sketch_draw: function
 
-    :param frame_rate: The target frame rate for the sketch.
-    :type frame_rate: int :math:`\geq 1`
+    :param frame_rate: The target frame rate for the sketch. Set this
+        to None to draw frames as fast as possible.
+    :type frame_rate: int :math:`\geq 1` | None
+
+    :param update_rate: When set, a user-defined `update()` function is
+        called this many times per second, independent of the frame
+        rate. Frames are drawn after running all updates that are
+        due. `draw()` can use `update_alpha` (the fraction of the next
+        update step that has already passed) to interpolate between
+        the last two updates. Defaults to None.
+    :type update_rate: int
+
+    :param record_input: File to record all input events (along with
+        the frame in which they occured) to. Defaults to None, i.e.,
+        no recording.
+    :type record_input: str
+
+    :param replay_input: File with recorded input events to replay
+        (at the same frames) while the sketch runs. Defaults to None.
+    :type replay_input: str
+
+    :param stats_file: When set, a summary of the frame statistics
+        (see :meth:`p5.frame_stats`) is appended to this file when the
+        sketch exits. Should be a '.csv' or '.jsonl' file. Defaults to
+        None.
+    :type stats_file: str
+
+    :param share_frames: When set, every frame is published to a
+        shared memory block with this name so that other processes
+        can read the frames using
+        :class:`p5.sketch.sharing.FrameReader`. Defaults to None.
+    :type share_frames: str
+
+    :param render_scale: Fraction of the window's (physical)
+        resolution to draw the frames at. Frames are scaled up to the
+        window, so lower values trade sharpness for fill rate. Saved
+        and shared frames are scaled up to the full resolution too (so
+        their size doesn't change with the scale), and
+        :meth:`p5.load_pixels` always gives the logical size of the
+        sketch. Set this to
+        'auto' to adapt the scale (between 0.5 and 1) to
+        `target_frame_time`. Defaults to 1.
+    :type render_scale: float | str
+
+    :param detail_level: Fraction of the usual number of segments
+        used to tessellate ellipses, arcs, bezier curves and
+        Catmull-Rom curves. Set this to 'auto' to adapt the level
+        (within `detail_range`) to `target_frame_time`, so that heavy
+        scenes lose detail instead of dropping frames. Defaults to 1.
+    :type detail_level: float | str
+
+    :param detail_range: lowest and highest level used by the 'auto'
+        detail level. Defaults to (0.25, 1).
+    :type detail_range: (float, float)
+
+    :param target_frame_time: Frame time (in seconds) that the 'auto'
+        render scale and detail level aim for. Defaults to the frame
+        interval of `frame_rate` (or 60 fps when the frames are
+        rendered without a window and `frame_rate` is None). When
+        both adapt, the detail level is lowered first.
+    :type target_frame_time: float
+
+    :raises ValueError: When the render scale or detail level is out
+        of range, 'auto' is used without a frame rate or target
+        frame time, or the stats file format isn't supported.
 
     """
     global default_sketch
 
+    # Catch a bad stats file now rather than when the sketch exits.
+    stats_file = _cli_options.get('stats_file', stats_file)
+    if stats_file is not None:
+        check_stats_file(stats_file)
+
+    # The window backend (and all of vispy) is only loaded once the
+    # sketch runs.
+    import vispy
+    vispy.use(_cli_options.get('backend', 'glfw'))
+    from .base import Sketch
+
+    headless = 'frames' in _cli_options
+    if headless and target_frame_time is None:
+        # Headless frames are drawn as fast as possible, so 'auto'
+        # aims for the frame rate the sketch asked for instead.
+        target_frame_time = 1 / (frame_rate or 60)
+    frame_rate = _cli_options.get('frame_rate', frame_rate)
+    record_input = _cli_options.get('record_input', record_input)
+    replay_input = _cli_options.get('replay_input', replay_input)
+    share_frames = _cli_options.get('share_frames', share_frames)
+    render_scale = _cli_options.get('render_scale', render_scale)
+    detail_level = _cli_options.get('detail_level', detail_level)
+    if 'size' in _cli_options:
+        builtins.width, builtins.height = _cli_options['size']
+
+    # The sketch module might have been loaded after p5 (say, by the
+    # command line interface) so we look it up now.
+    main = sys.modules['__main__']
+
     # get the user-defined setup(), draw(), and handler functions.
     if sketch_setup is not None:
         setup_method = sketch_setup
-    elif hasattr(__main__, 'setup'):
-        setup_method = __main__.setup
+    elif hasattr(main, 'setup'):
+        setup_method = main.setup
     else:
         setup_method = setup
 
     if sketch_draw is not None:
         draw_method = sketch_draw
-    elif hasattr(__main__, 'draw'):
-        draw_method = __main__.draw
+    elif hasattr(main, 'draw'):
+        draw_method = main.draw
     else:
         draw_method = draw
 
+    update_method = getattr(main, 'update', None)
+
     handlers = dict()
     for handler in handler_names:
-        if hasattr(__main__, handler):
-            hfunc = getattr(__main__, handler)
+        if hasattr(main, handler):
+            hfunc = getattr(main, handler)
             handlers[handler] = _fix_interface(hfunc)
 
-    default_sketch = Sketch(setup_method, draw_method, handlers, frame_rate)
-
-    physical_width, physical_height = default_sketch.physical_size
-    width, height = default_sketch.size
-
-    builtins.pixel_x_density = physical_width // width
-    builtins.pixel_y_density = physical_height // height
-
-    default_sketch.timer.start()
+    default_sketch = Sketch(setup_method, draw_method, handlers, frame_rate,
+                            update_method, update_rate)
+    if record_input is not None:
+        default_sketch.recorder = EventRecorder(record_input)
+    if replay_input is not None:
+        default_sketch.replayer = EventReplayer(replay_input)
+    default_sketch.stats_file = stats_file
+    default_sketch.share_frames = share_frames
+
+    target = target_frame_time or default_sketch.scheduler.interval
+    if 'auto' in (render_scale, detail_level) and not target:
+        raise ValueError("Adapting to the frame time needs a frame rate "
+                         "or a target frame time")
+
+    if render_scale == 'auto':
+        default_sketch.resolution = FrameTimeGovernor(target)
+    else:
+        set_render_scale(render_scale)
 
-    app.run()
+    if detail_level == 'auto':
+        default_sketch.detail = FrameTimeGovernor(target, *detail_range)
+    else:
+        set_detail_level(detail_level)
+
+    if headless:
+        default_sketch.render_frames(_cli_options['frames'],
+                                     _cli_options.get('out_dir'),
+                                     _cli_options.get('first_frame', 0),
+                                     _cli_options.get('seek', 'fast-forward'),
+                                     _cli_options.get('threads'))
+    else:
+        default_sketch.timer.start()
+        app.run()
     exit()
 
 def title(new_title):
@@ -166,6 +301,8 @@ def size(width, height):
     :type height: int
 
     """
+    if 'size' in _cli_options:
+        width, height = _cli_options['size']
     builtins.width = int(width)
     builtins.height = int(height)
     default_sketch.size = (builtins.width, builtins.height)
@@ -179,6 +316,10 @@ def no_loop():
     `draw()` and the user can manipulate the screen contents through
     event handlers like `mouse_pressed()`, etc.
 
+    While `draw()` isn't being called and there are no events to
+    handle, the sketch stops redrawing the window altogether until
+    `loop()`, `redraw()`, an input event or a resize wakes it up.
+
     """
     default_sketch.looping = False
 
@@ -190,6 +331,7 @@ def loop():
 
     """
     default_sketch.looping = True
+    default_sketch.wake()
 
 def redraw():
     """Call `draw()` once.
@@ -200,6 +342,7 @@ def redraw():
     """
     if not default_sketch.looping:
         default_sketch.redraw = True
+        default_sketch.wake()
 
 def exit(*args, **kwargs):
     """Exit the sketch.
@@ -215,10 +358,38 @@ def exit(*args, **kwargs):
         `exit()` function.
     """
     if not (default_sketch is None):
+        default_sketch.finish()
         default_sketch.show(visible=False)
         app.quit()
     builtins.exit(*args, **kwargs)
 
+def frame_stats():
+    """Get statistics about the recent frames.
+
+    The sketch keeps the duration of (about) the last 3600 frames and
+    `draw()` calls.
+
+    :returns: A dictionary with summaries of the frame times
+        ('frame_time', the time between the start of consecutive
+        frames) and the time spent in `draw()` ('draw_time'), along
+        with the total number of frames dropped because the sketch
+        couldn't keep up with the frame rate ('dropped_frames'), of
+        fixed-timestep updates skipped because the sketch fell behind
+        ('skipped_updates') and of input events merged into earlier,
+        unhandled events ('coalesced_events'). Each summary contains
+        the number of samples ('count'), the 'mean' and 'max' and the
+        50th, 95th and 99th percentiles ('p50', 'p95', 'p99') in
+        seconds. The current 'detail_level' and
+        'render_scale' are included too. When they adapt to the frame
+        time, 'detail_governor' and 'resolution_governor' hold the
+        current 'level', the time it took to react to the last frame
+        time overrun ('reaction_time', in seconds) and the number of
+        'drops' and 'raises' of the level (otherwise, they are None).
+    :rtype: dict
+
+    """
+    return default_sketch.statistics()
+
 def no_cursor():
     """Hide the mouse cursor.
     """
@@ -0,0 +1,107 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import types
+
+import numpy as np
+import pytest
+
+from p5.sketch import atlas as atlas_module
+from p5.sketch.atlas import AtlasPage
+from p5.sketch.atlas import TextureAtlas
+
+
+class FakeTexture:
+    def __init__(self, shape, interpolation=None):
+        self.shape = shape
+        self.uploads = []
+        self.deleted = False
+
+    def set_data(self, data, offset=None):
+        self.uploads.append((data.shape, offset))
+
+    def delete(self):
+        self.deleted = True
+
+
+class FakeImage:
+    def __init__(self, width, height, channels=3):
+        self.size = (width, height)
+        self._data = np.zeros((height, width, channels), dtype=np.uint8)
+        self._img_on_gpu = False
+        self._atlas_entry = None
+        self._atlas_dirty = True
+
+
+@pytest.fixture(autouse=True)
+def fake_gloo(monkeypatch):
+    monkeypatch.setattr(atlas_module, 'gloo',
+                        types.SimpleNamespace(Texture2D=FakeTexture))
+
+
+def test_rgba_conversion():
+    gray = np.array([[[10, 20]]], dtype=np.uint8)
+    assert atlas_module._rgba(gray).tolist() == [[[10, 10, 10, 20]]]
+    rgb = np.array([[[1, 2, 3]]], dtype=np.uint8)
+    assert atlas_module._rgba(rgb).tolist() == [[[1, 2, 3, 255]]]
+
+
+def test_page_packs_shelves():
+    page = AtlasPage(16)
+    assert page.allocate(8, 4) == (0, 0)
+    assert page.allocate(8, 3) == (8, 0)
+    assert page.allocate(4, 4) == (0, 4)
+    assert page.allocate(4, 10) is None
+
+
+def test_lookup_uploads_once_with_padding():
+    atlas = TextureAtlas(size=64)
+    img = FakeImage(6, 4)
+    texture, texcoords = atlas.lookup(img)
+    assert texture.uploads == [((6, 8, 4), (0, 0))]
+    pad = atlas_module.PADDING / 64
+    np.testing.assert_allclose(texcoords[2], [pad, pad])
+    np.testing.assert_allclose(texcoords[1], [pad + 6 / 64, pad + 4 / 64])
+
+    atlas.lookup(img)
+    assert len(texture.uploads) == 1
+
+    img._atlas_dirty = True
+    atlas.lookup(img)
+    assert texture.uploads[-1] == ((6, 8, 4), (0, 0))
+
+
+def test_full_atlas_is_cleared():
+    flushed = []
+    atlas = TextureAtlas(size=16, max_pages=1,
+                         before_update=lambda: flushed.append(True))
+    first = FakeImage(12, 12)
+    second = FakeImage(12, 12)
+    atlas.lookup(first)
+    old_page = atlas.pages[0]
+    atlas.lookup(second)
+
+    assert flushed and old_page.texture.deleted
+    assert atlas.is_stale(first)
+    assert not atlas.is_stale(second)
+
+
+def test_entries_of_other_atlases_are_stale():
+    img = FakeImage(4, 4)
+    TextureAtlas(size=16).lookup(img)
+    assert TextureAtlas(size=16).is_stale(img)
@@ -0,0 +1,105 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import numpy as np
+import pytest
+
+from p5.core import blending
+from p5.core import filters
+
+# Reference formulas on normalized colors (Processing's blend modes).
+REFERENCE = {
+    'blend': lambda d, s: s,
+    'darkest': np.minimum,
+    'difference': lambda d, s: np.abs(d - s),
+    'exclusion': lambda d, s: d + s - 2 * d * s,
+    'multiply': lambda d, s: d * s,
+    'screen': lambda d, s: 1 - (1 - d) * (1 - s),
+    'overlay': lambda d, s: np.where(d < 0.5, 2 * d * s,
+                                     1 - 2 * (1 - d) * (1 - s)),
+    'hard_light': lambda d, s: np.where(s < 0.5, 2 * d * s,
+                                        1 - 2 * (1 - d) * (1 - s)),
+    'soft_light': lambda d, s: (1 - 2 * s) * d * d + 2 * s * d,
+    'dodge': lambda d, s: np.where(
+        s == 1, 1, np.minimum(d / np.maximum(1 - s, 1e-9), 1)),
+    'burn': lambda d, s: np.where(
+        s == 0, 0, np.maximum(1 - (1 - d) / np.maximum(s, 1e-9), 0)),
+}
+
+# Modes that add the alpha weighted source instead of mixing.
+WEIGHTED = {
+    'add': lambda d, s: np.minimum(d + s, 1),
+    'subtract': lambda d, s: np.maximum(d - s, 0),
+    'lightest': np.maximum,
+}
+
+
+def reference(mode, dst, src, alpha):
+    d = dst / 255
+    s = src / 255
+    a = alpha[..., np.newaxis] / 255
+    if mode in WEIGHTED:
+        return 255 * WEIGHTED[mode](d, s * a)
+    return 255 * (d + (REFERENCE[mode](d, s) - d) * a)
+
+
+@pytest.fixture
+def buffers():
+    rng = np.random.default_rng(5)
+    dst = rng.integers(0, 256, (20, 30, 4), dtype=np.uint8)
+    src = rng.integers(0, 256, (20, 30, 4), dtype=np.uint8)
+    # Include the extremes of every channel.
+    src[0, :4, :3] = [[0, 0, 0], [255, 255, 255], [128, 127, 1],
+                      [254, 0, 255]]
+    return dst, src
+
+
+def test_all_modes_have_references():
+    assert set(blending.MODES) == set(REFERENCE) | set(WEIGHTED)
+
+
+@pytest.mark.parametrize('mode', sorted(blending.MODES))
+@pytest.mark.parametrize('opaque', [True, False])
+def test_modes_match_reference(buffers, mode, opaque):
+    dst, src = buffers
+    if opaque:
+        src[:, :, 3] = 255
+    expected = reference(mode, dst[:, :, :3], src[:, :, :3], src[:, :, 3])
+    expected_alpha = np.minimum(dst[:, :, 3].astype(int) + src[:, :, 3], 255)
+
+    blending.blend(dst, src, mode)
+    assert np.abs(dst[:, :, :3] - expected).max() <= 2
+    np.testing.assert_array_equal(dst[:, :, 3], expected_alpha)
+
+
+def test_region_and_tiles(buffers, monkeypatch):
+    dst, src = buffers
+    expected = dst.copy()
+    blending.blend(expected, src, 'multiply', region=(5, 2, 10, 12))
+    changed = np.any(expected != dst, axis=2)
+    assert not changed[:2].any() and not changed[:, :5].any()
+    assert not changed[14:].any() and not changed[:, 15:].any()
+
+    monkeypatch.setattr(filters, 'PARALLEL_THRESHOLD', 0)
+    monkeypatch.setattr(filters, 'TILE_ROWS', 3)
+    blending.blend(dst, src, 'multiply', region=(5, 2, 10, 12))
+    np.testing.assert_array_equal(dst, expected)
+
+
+def test_unknown_mode(buffers):
+    with pytest.raises(KeyError):
+        blending.blend(*buffers, 'smudge')
@@ -0,0 +1,201 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import argparse
+import os
+
+import pytest
+
+from p5 import __main__ as cli
+from p5.benchmarks import SCENES
+from p5.benchmarks import scene_path
+
+
+def parse(*argv):
+    return cli.make_parser().parse_args(list(argv))
+
+
+def test_record_and_replay_input_options():
+    args = parse('run', 'sketch.py', '--record-input', 'in.jsonl')
+    options = cli._sketch_options(args)
+    assert options['record_input'] == 'in.jsonl'
+    assert 'replay_input' not in options
+
+    args = parse('render', 'sketch.py', '--frames', '10',
+                 '--replay-input', 'in.jsonl.gz')
+    options = cli._sketch_options(args)
+    assert options['replay_input'] == 'in.jsonl.gz'
+    assert 'record_input' not in options
+
+
+def test_parallel_render_refuses_to_record(monkeypatch):
+    args = parse('render', 'sketch.py', '--frames', '10', '--workers', '2',
+                 '--record-input', 'in.jsonl')
+    with pytest.raises(SystemExit):
+        cli._render_parallel(args, 2)
+
+
+class FakeProcess:
+    commands = []
+
+    def __init__(self, command):
+        self.args = command
+        FakeProcess.commands.append(command)
+
+    def wait(self):
+        return 0
+
+
+@pytest.fixture
+def workers(monkeypatch):
+    FakeProcess.commands = []
+    monkeypatch.setattr(cli.subprocess, 'Popen', FakeProcess)
+    return FakeProcess.commands
+
+
+def test_parallel_render_forwards_replay_input(workers, capsys):
+    args = parse('render', 'sketch.py', '--frames', '10', '--seek', 'jump',
+                 '--replay-input', 'in.jsonl')
+    args.args = []
+    cli._render_parallel(args, 2)
+    assert len(workers) == 2
+    for command in workers:
+        idx = command.index('--replay-input')
+        assert command[idx + 1] == 'in.jsonl'
+
+
+def test_frame_ranges():
+    assert cli._frame_ranges(0, 10, 3) == [(0, 4), (4, 3), (7, 3)]
+    assert cli._frame_ranges(5, 2, 4) == [(5, 1), (6, 1)]
+
+
+def test_parallel_render_needs_seek_mode(workers):
+    args = parse('render', 'sketch.py', '--frames', '10')
+    args.args = []
+    with pytest.raises(SystemExit) as error:
+        cli._render_parallel(args, 2)
+    assert '--seek' in str(error.value)
+    assert workers == []
+
+
+def test_parallel_render_forwards_stats_file(workers, capsys):
+    args = parse('render', 'sketch.py', '--frames', '10', '--seek',
+                 'fast-forward', '--stats-file', 'out/stats.csv')
+    args.args = ['--speed', '2']
+    cli._render_parallel(args, 2)
+    for idx, command in enumerate(workers):
+        assert command[command.index('--seek') + 1] == 'fast-forward'
+        stats_file = command[command.index('--stats-file') + 1]
+        assert stats_file == 'out/stats-{}.csv'.format(idx)
+        assert command[-3:] == ['--', '--speed', '2']
+
+
+def test_single_worker_defaults_to_fast_forward(monkeypatch):
+    calls = []
+    monkeypatch.setattr(cli, '_exec_sketch',
+                        lambda *call: calls.append(call))
+    cli.main(['render', 'sketch.py', '--frames', '3', '--', 'x'])
+    sketch, argv, options = calls[0]
+    assert argv == ['x']
+    assert options['seek'] == 'fast-forward'
+    assert options['frames'] == 3
+
+
+def test_parse_size_and_level():
+    assert cli._parse_size('640x360') == (640, 360)
+    assert cli._parse_size('1280X720') == (1280, 720)
+    with pytest.raises(argparse.ArgumentTypeError):
+        cli._parse_size('640')
+    assert cli._parse_level('auto') == 'auto'
+    assert cli._parse_level('0.5') == 0.5
+    with pytest.raises(argparse.ArgumentTypeError):
+        cli._parse_level('half')
+
+
+def test_headless_render_options(monkeypatch):
+    calls = []
+    monkeypatch.setattr(cli, '_exec_sketch',
+                        lambda *call: calls.append(call))
+    cli.main(['render', 'sketch.py', '--frames', '5', '--out', '',
+              '--size', '320x200', '--render-scale', 'auto',
+              '--detail-level', '0.5', '--backend', 'egl'])
+    _, argv, options = calls[0]
+    assert argv == []
+    assert options['out_dir'] is None
+    assert options['frame_rate'] is None
+    assert options['size'] == (320, 200)
+    assert options['render_scale'] == 'auto'
+    assert options['detail_level'] == 0.5
+    assert options['backend'] == 'egl'
+
+
+@pytest.mark.parametrize('frame_rate', [30, None])
+def test_headless_auto_levels_get_a_target(monkeypatch, frame_rate):
+    import vispy
+    from p5.sketch import base
+    from p5.sketch import userspace
+    from p5.sketch.scheduler import FrameScheduler
+
+    class FakeSketch:
+        def __init__(self, setup, draw, handlers, frame_rate, *args):
+            self.scheduler = FrameScheduler(frame_rate)
+            self.rendered = False
+
+        def render_frames(self, *args):
+            self.rendered = True
+
+    monkeypatch.setattr(vispy, 'use', lambda backend: None)
+    monkeypatch.setattr(base, 'Sketch', FakeSketch)
+    monkeypatch.setattr(userspace, 'exit', lambda: None)
+    monkeypatch.setattr(userspace, 'default_sketch', None)
+    args = parse('render', 'sketch.py', '--frames', '10',
+                 '--render-scale', 'auto', '--detail-level', 'auto')
+    options = cli._headless_options(args, 10)
+    monkeypatch.setattr(userspace, '_cli_options', options)
+
+    userspace.run(lambda: None, lambda: None, frame_rate=frame_rate)
+    sketch = userspace.default_sketch
+    assert sketch.rendered
+    assert sketch.scheduler.interval == 0
+    target = 1 / (frame_rate or 60)
+    assert sketch.resolution.target == pytest.approx(target)
+    assert sketch.detail.target == pytest.approx(target)
+
+
+def test_stats_file_is_checked_by_the_parser(capsys):
+    args = parse('run', 'sketch.py', '--stats-file', 'stats.jsonl')
+    assert args.stats_file == 'stats.jsonl'
+    with pytest.raises(SystemExit):
+        parse('render', 'sketch.py', '--frames', '10',
+              '--stats-file', 'stats.txt')
+    assert "'.csv' or '.jsonl'" in capsys.readouterr().err
+
+
+def test_commands_need_their_arguments(capsys):
+    with pytest.raises(SystemExit):
+        parse('render', 'sketch.py')
+    with pytest.raises(SystemExit):
+        parse()
+    args = parse('bench')
+    assert args.sketches == [] and args.frames == 300
+    args = parse('profile', 'sketch.py', '--sort', 'tottime')
+    assert args.frames is None and args.sort == 'tottime'
+
+
+def test_benchmark_scenes_exist():
+    assert all(os.path.exists(scene_path(name)) for name in SCENES)
@@ -0,0 +1,205 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import builtins
+
+import numpy as np
+import pytest
+
+from p5.core import primitives
+from p5.pmath import curves
+from p5.sketch import renderer
+
+CONTROL = np.array([[0, 0], [40, 120], [160, -80], [200, 40]], dtype=float)
+
+
+def distance_to_polyline(points, polyline):
+    """Largest distance of the points to the polyline."""
+    a = polyline[:-1][np.newaxis]
+    b = polyline[1:][np.newaxis]
+    p = points[:, np.newaxis]
+    ab = b - a
+    t = np.clip(((p - a) * ab).sum(axis=-1) / (ab * ab).sum(axis=-1), 0, 1)
+    closest = a + t[..., np.newaxis] * ab
+    return np.sqrt(((p - closest) ** 2).sum(axis=-1)).min(axis=1).max()
+
+
+@pytest.fixture
+def flatness(monkeypatch):
+    monkeypatch.setattr(builtins, 'width', 200, raising=False)
+    monkeypatch.setattr(builtins, 'height', 200, raising=False)
+    monkeypatch.setattr(builtins, 'pixel_x_density', 1, raising=False)
+    monkeypatch.setattr(builtins, 'pixel_y_density', 1, raising=False)
+    monkeypatch.setattr(renderer, 'render_scale', 1.0)
+    monkeypatch.setattr(renderer, 'transform_matrix', np.identity(4))
+    monkeypatch.setattr(renderer, 'detail_level', 1.0)
+    monkeypatch.setattr(curves, 'flatness_tolerance', None)
+
+
+@pytest.mark.parametrize('tolerance', [0.1, 0.5, 2.0])
+def test_flattened_curves_stay_within_tolerance(tolerance):
+    segments = curves._flattening_segments(CONTROL, tolerance)
+    parameters = np.linspace(0, 1, segments + 1)
+    polyline = curves._evaluate(curves.BEZIER_BASIS, CONTROL, parameters)
+    exact = curves._evaluate(curves.BEZIER_BASIS, CONTROL,
+                             np.linspace(0, 1, 2001))
+    assert distance_to_polyline(exact, polyline) <= tolerance
+    # Not many more segments than needed.
+    if segments > 1:
+        coarser = curves._evaluate(curves.BEZIER_BASIS, CONTROL,
+                                   np.linspace(0, 1, segments // 2 + 1))
+        assert distance_to_polyline(exact, coarser) > tolerance
+
+
+def test_segment_limits():
+    line = np.array([[0, 0], [1, 1], [2, 2], [3, 3]], dtype=float)
+    assert curves._flattening_segments(line, 0.1) == 1
+    assert curves._flattening_segments(CONTROL * 1000, 0.01) == \
+        curves.MAX_FLATTENING_SEGMENTS
+    with pytest.raises(ValueError):
+        curves.curve_flatness(0)
+
+
+def test_curve_to_bezier_conversion():
+    try:
+        for tightness in (0, 0.5, -1):
+            curves.curve_tightness(tightness)
+            t = np.linspace(0, 1, 11)
+            curve = curves._evaluate(curves.curve_basis_matrix, CONTROL, t)
+            bezier = curves._evaluate(
+                curves.BEZIER_BASIS,
+                curves.curve_to_bezier_matrix.dot(CONTROL), t)
+            np.testing.assert_allclose(curve, bezier, atol=1e-9)
+    finally:
+        curves.curve_tightness(0)
+
+
+def test_flattening_follows_the_transform(flatness, monkeypatch):
+    points = [tuple(p) for p in CONTROL]
+    fixed = primitives._flatten(curves.BEZIER_BASIS, None, points, 20)
+    assert len(fixed) == 21
+
+    monkeypatch.setattr(curves, 'flatness_tolerance', 0.5)
+    small = primitives._flatten(curves.BEZIER_BASIS, None, points, 20)
+    renderer.transform_matrix[:2, :2] *= 4
+    large = primitives._flatten(curves.BEZIER_BASIS, None, points, 20)
+    # Four times the size needs about twice the segments.
+    assert len(large) - 1 == pytest.approx(2 * (len(small) - 1), abs=1)
+    # The vertices are still in the curve's own coordinates.
+    np.testing.assert_allclose(large[[0, -1]], CONTROL[[0, -1]])
+
+    monkeypatch.setattr(renderer, 'detail_level', 0.5)
+    reduced = primitives._flatten(curves.BEZIER_BASIS, None, points, 20)
+    assert len(reduced) - 1 == round((len(large) - 1) / 2)
+
+
+def test_flattening_under_scale(flatness, monkeypatch):
+    from p5.core import transforms
+
+    points = [tuple(p) for p in CONTROL]
+    monkeypatch.setattr(curves, 'flatness_tolerance', 0.5)
+    small = primitives._flatten(curves.BEZIER_BASIS, None, points, 20)
+    transforms.scale(4)
+    scaled = primitives._flatten(curves.BEZIER_BASIS, None, points, 20)
+    # Scaled curves stay within the tolerance on the screen.
+    exact = curves._evaluate(curves.BEZIER_BASIS, CONTROL,
+                             np.linspace(0, 1, 2001))
+    assert distance_to_polyline(4 * exact, 4 * scaled) <= 0.5
+    assert len(scaled) - 1 == pytest.approx(2 * (len(small) - 1), abs=1)
+
+
+@pytest.mark.parametrize('density, render_scale', [(2, 1.0), (4, 0.5)])
+def test_flattening_counts_framebuffer_pixels(flatness, monkeypatch,
+                                              density, render_scale):
+    points = [tuple(p) for p in CONTROL]
+    monkeypatch.setattr(curves, 'flatness_tolerance', 0.5)
+    renderer.transform_matrix[:2, :2] *= 2
+    scaled = primitives._flatten(curves.BEZIER_BASIS, None, points, 20)
+
+    renderer.transform_matrix[:2, :2] /= 2
+    monkeypatch.setattr(builtins, 'pixel_x_density', density)
+    monkeypatch.setattr(builtins, 'pixel_y_density', density)
+    monkeypatch.setattr(renderer, 'render_scale', render_scale)
+    dense = primitives._flatten(curves.BEZIER_BASIS, None, points, 20)
+    # Two framebuffer pixels per unit need as many segments as a
+    # curve drawn twice as large.
+    assert len(dense) == len(scaled)
+
+
+def bernstein(points, t):
+    p0, p1, p2, p3 = [np.asarray(p, dtype=float) for p in points]
+    s = 1 - t
+    return s ** 3 * p0 + 3 * s * s * t * p1 + 3 * s * t * t * p2 + t ** 3 * p3
+
+
+def test_scalar_calls_return_points():
+    points = [tuple(p) for p in CONTROL]
+    point = curves.bezier_point(*points, 0.3)
+    assert (point.x, point.y) == pytest.approx(tuple(bernstein(points, 0.3)))
+    start = curves.curve_point(*points, 0)
+    assert (start.x, start.y) == pytest.approx(points[1])
+    stop = curves.curve_point(*points, 1)
+    assert (stop.x, stop.y) == pytest.approx(points[2])
+
+
+def test_array_parameters():
+    points = [tuple(p) for p in CONTROL]
+    t = np.linspace(0, 1, 7)
+    values = curves.bezier_point(*points, t)
+    assert values.shape == (7, 2)
+    expected = [bernstein(points, v) for v in t]
+    np.testing.assert_allclose(values, expected)
+
+    for function in (curves.curve_point, curves.curve_tangent,
+                     curves.bezier_tangent):
+        values = function(*points, t)
+        expected = [tuple(function(*points, v)) for v in t]
+        np.testing.assert_allclose(values, np.array(expected)[:, :2])
+
+
+def test_many_curves_and_tangents():
+    rng = np.random.default_rng(7)
+    points = [rng.random((5, 2)) * 100 for _ in range(4)]
+    t = np.linspace(0, 1, 3)[:, np.newaxis]
+    values = curves.bezier_point(*points, t)
+    assert values.shape == (3, 5, 2)
+    np.testing.assert_allclose(values[1, 2],
+                               bernstein([p[2] for p in points], 0.5))
+
+    # Tangents are the derivatives of the points.
+    h = 1e-6
+    for point, tangent in [(curves.bezier_point, curves.bezier_tangent),
+                           (curves.curve_point, curves.curve_tangent)]:
+        numeric = (point(*points, 0.4 + h) - point(*points, 0.4 - h)) / (2 * h)
+        np.testing.assert_allclose(tangent(*points, 0.4), numeric,
+                                   rtol=1e-5, atol=1e-4)
+
+
+def test_points_with_mixed_dimensions():
+    values = curves.bezier_point((0, 0), (1, 1, 3), (2, 2), (3, 3),
+                                 np.array([0.5]))
+    assert values.shape == (1, 3)
+    np.testing.assert_allclose(values[0], [1.5, 1.5, 3 * 0.375])
+
+
+@pytest.mark.parametrize('level', [1e-3, 0.01, 0.04])
+def test_arcs_at_the_lowest_detail_levels(flatness, level):
+    renderer.set_detail_level(level)
+    arc = primitives.Arc((0, 0), (50, 50), 0, 2 * np.pi)
+    # The center and at least a few points on the outline.
+    assert len(arc._vertices) >= primitives.MIN_DETAIL_ACCURACY + 1
+    np.testing.assert_allclose(np.hypot(*arc._vertices[1:].T), 50)
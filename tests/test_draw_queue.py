@@ -0,0 +1,150 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import types
+
+import numpy as np
+import pytest
+
+from p5.sketch import renderer
+
+
+class FakeBuffer:
+    def set_data(self, data):
+        self.data = data
+
+
+class FakeProgram(dict):
+    def __init__(self):
+        self.draws = []
+
+    def bind(self, buffer):
+        self.buffer = buffer
+
+    def draw(self, draw_type, indices=None):
+        self.draws.append((draw_type, self.buffer.data.copy(),
+                           indices.data.copy()))
+
+
+@pytest.fixture
+def program(monkeypatch):
+    program = FakeProgram()
+    monkeypatch.setattr(renderer, 'default_prog', program)
+    monkeypatch.setattr(renderer, 'vertex_buffer', FakeBuffer())
+    monkeypatch.setattr(renderer, 'index_buffer', FakeBuffer())
+    monkeypatch.setattr(renderer, 'flush_sprites', lambda: None)
+    monkeypatch.setattr(renderer, 'matrix_stack', [np.identity(4)])
+    renderer.reset_matrix_stack()
+    return program
+
+
+def make_shape(vertices, matrix, fill=(1, 0, 0, 1)):
+    vertices = np.asarray(vertices, dtype=np.float64)
+    count = len(vertices)
+    return types.SimpleNamespace(
+        _matrix=matrix, _draw_vertices=vertices,
+        _draw_edges=np.array([(i, (i + 1) % count) for i in range(count)]),
+        _draw_faces=np.array([(0, i, i + 1) for i in range(1, count - 1)]),
+        fill=types.SimpleNamespace(normalized=fill), stroke=None,
+        attribs=set(), kind='poly')
+
+
+def naive_transform(vertices, mat):
+    points = np.hstack([vertices, np.zeros((len(vertices), 1)),
+                        np.ones((len(vertices), 1))])
+    return points.dot(mat.T)[:, :3]
+
+
+def translation(x, y):
+    mat = np.identity(4)
+    mat[:2, 3] = x, y
+    return mat
+
+
+def test_shapes_are_transformed_at_flush(program):
+    rng = np.random.default_rng(1)
+    shapes = []
+    for idx in range(6):
+        renderer.transform_matrix[:] = translation(idx, -idx)
+        renderer.transform_matrix[:2, :2] = rng.random((2, 2))
+        shape = make_shape(rng.random((idx + 3, 2)) * 100,
+                           translation(10, 20))
+        renderer.render(shape)
+        shapes.append((shape, renderer.transform_matrix.dot(shape._matrix)))
+    assert all(m.dtype == np.float32 for m in renderer.queued_matrices)
+
+    renderer.flush_geometry()
+    (draw_type, data, indices), = program.draws
+    assert draw_type == 'triangles'
+    assert data['position'].dtype == np.float32
+
+    expected = np.concatenate([naive_transform(shape._draw_vertices, mat)
+                               for shape, mat in shapes])
+    np.testing.assert_allclose(data['position'], expected, rtol=1e-5,
+                               atol=1e-3)
+    assert (data['color'] == (1, 0, 0, 1)).all()
+    # Indices point into each shape's own vertices.
+    assert indices.max() == len(expected) - 1
+    assert renderer.queued_matrices == []
+
+
+@pytest.mark.parametrize('sizes, matrix_indices', [
+    ([3, 4, 5], [0, 1, 2]),
+    ([100, 200], [0, 1]),
+    ([3, 100, 4, 4, 70, 2], [0, 1, 2, 2, 2, 3]),
+])
+def test_blocks_match_naive_transform(sizes, matrix_indices):
+    rng = np.random.default_rng(2)
+    vertices = [rng.random((size, 2)) * 100 for size in sizes]
+    # One shape with 3D vertices (all in the z = 0 plane).
+    vertices[-1] = np.hstack([vertices[-1], np.zeros((sizes[-1], 1))])
+    matrices = rng.random((max(matrix_indices) + 1, 4, 4))
+    out = np.zeros((sum(sizes), 3), dtype=np.float32)
+
+    renderer._transform_vertices(vertices, matrices.astype(np.float32),
+                                 matrix_indices, out)
+    expected = np.concatenate([naive_transform(v[:, :2], matrices[idx])
+                               for v, idx in zip(vertices, matrix_indices)])
+    np.testing.assert_allclose(out, expected, rtol=1e-5, atol=1e-3)
+
+
+def test_shapes_with_the_same_matrix_share_it(program):
+    square = [(0, 0), (1, 0), (1, 1), (0, 1)]
+    renderer.render(make_shape(square, np.identity(4)))
+    renderer.render(make_shape(square, np.identity(4)))
+    renderer.transform_matrix[:] = translation(5, 5)
+    renderer.render(make_shape(square, np.identity(4)))
+    assert len(renderer.queued_matrices) == 2
+    assert [entry[3] for entry in renderer.poly_draw_queue] == [0, 0, 1]
+
+
+def test_update_vertex_keeps_queued_vertices():
+    from p5.core.shape import PShape
+    shape = PShape(vertices=[(0, 0), (10, 0), (10, 10)])
+    original = shape._vertices
+    shape.update_vertex(0, (1, 1))
+    # Shapes that aren't queued are edited in place.
+    assert shape._vertices is original
+
+    shape._vertices_queued = True
+    shape.update_vertex(1, (2, 2))
+    assert shape._vertices is not original
+    assert tuple(original[1]) == (10, 0)
+    edited = shape._vertices
+    shape.update_vertex(2, (3, 3))
+    assert shape._vertices is edited
+    assert shape._vertices.tolist() == [[1, 1], [2, 2], [3, 3]]
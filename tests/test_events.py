@@ -0,0 +1,130 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import builtins
+from collections import deque
+
+import pytest
+
+from p5.sketch.base import COALESCED_EVENTS
+from p5.sketch.base import Sketch
+from p5.sketch.events import MouseEvent
+from p5.sketch.recording import EventRecorder
+from p5.sketch.recording import EventReplayer
+from p5.sketch.recording import _RawMouseEvent
+
+
+@pytest.fixture(autouse=True)
+def mouse(monkeypatch):
+    for name, value in [('width', 100), ('height', 100), ('mouse_x', 0),
+                        ('mouse_y', 0), ('pmouse_x', 0), ('pmouse_y', 0),
+                        ('frame_count', 0), ('mouse_is_pressed', False),
+                        ('mouse_is_dragging', False),
+                        ('mouse_button', None)]:
+        monkeypatch.setattr(builtins, name, value, raising=False)
+
+
+def make_sketch():
+    """A sketch with just the state used by the event queue."""
+    sketch = Sketch.__new__(Sketch)
+    sketch.handler_queue = deque()
+    sketch.coalesce_events = set(COALESCED_EVENTS)
+    sketch.recorder = None
+    sketch._num_coalesced = 0
+    sketch.coalesced_events = 0
+    sketch.wake = lambda: None
+    return sketch
+
+
+def mouse_event(x, y, scroll=0, pressed=False):
+    raw = _RawMouseEvent([], (x, y), (0, scroll), [], None, None)
+    return MouseEvent(raw, active=pressed)
+
+
+def queued(sketch):
+    return [(name, (event.x, event.y), event.scroll.y, event.movement)
+            for name, event, _ in sketch.handler_queue]
+
+
+def test_consecutive_moves_are_merged():
+    sketch = make_sketch()
+    sketch._enqueue_event('mouse_moved', mouse_event(10, 0))
+    sketch._enqueue_event('mouse_moved', mouse_event(15, 5))
+
+    assert queued(sketch) == [('mouse_moved', (15, 5), 0, (15, 5))]
+    assert sketch.coalesced_events == 1
+
+
+def test_scroll_is_added_up():
+    sketch = make_sketch()
+    for _ in range(3):
+        sketch._enqueue_event('mouse_wheel', mouse_event(0, 0, scroll=2))
+    assert queued(sketch)[0][2] == 6
+
+
+def test_drags_are_merged_without_double_counting():
+    sketch = make_sketch()
+    first = mouse_event(4, 0, scroll=1, pressed=True)
+    sketch._enqueue_events(['mouse_moved', 'mouse_dragged'], first)
+    second = mouse_event(10, 3, scroll=1, pressed=True)
+    sketch._enqueue_events(['mouse_moved', 'mouse_dragged'], second)
+
+    assert queued(sketch) == [
+        ('mouse_moved', (10, 3), 2, (10, 3)),
+        ('mouse_dragged', (10, 3), 2, (10, 3)),
+    ]
+    # The queued events are new objects; the original ones are kept.
+    assert first.scroll.y == 1 and second.scroll.y == 1
+    assert sketch.coalesced_events == 2
+
+
+def test_events_are_not_merged_across_other_events():
+    sketch = make_sketch()
+    sketch._enqueue_event('mouse_moved', mouse_event(1, 0))
+    sketch._enqueue_event('mouse_pressed', mouse_event(1, 0, pressed=True))
+    sketch._enqueue_event('mouse_moved', mouse_event(2, 0))
+    sketch._enqueue_event('mouse_wheel', mouse_event(2, 0, scroll=1))
+    sketch._enqueue_event('mouse_moved', mouse_event(3, 0))
+
+    names = [name for name, _, _, _ in queued(sketch)]
+    assert names == ['mouse_moved', 'mouse_pressed', 'mouse_moved',
+                     'mouse_wheel', 'mouse_moved']
+    assert sketch.coalesced_events == 0
+
+
+def test_only_coalescible_events_are_merged():
+    sketch = make_sketch()
+    sketch._enqueue_event('mouse_clicked', mouse_event(1, 0))
+    sketch._enqueue_event('mouse_clicked', mouse_event(1, 0))
+    assert len(sketch.handler_queue) == 2
+
+
+def test_replayed_drags_are_merged_like_live_ones(tmp_path):
+    filename = str(tmp_path / 'events.jsonl')
+    live = make_sketch()
+    live.recorder = EventRecorder(filename)
+    for x in range(1, 4):
+        live._enqueue_events(['mouse_moved', 'mouse_dragged'],
+                             mouse_event(x, 0, pressed=True))
+    live.recorder.close()
+
+    builtins.mouse_x = 0
+    builtins.mouse_y = 0
+    replayed = make_sketch()
+    EventReplayer(filename).replay(replayed, 0)
+    assert queued(replayed) == queued(live)
@@ -0,0 +1,130 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import numpy as np
+import pytest
+
+from p5.core import filters
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(4)
+    return rng.integers(0, 256, (23, 31, 4), dtype=np.uint8)
+
+
+def naive_window(data, radius, reduce):
+    """Apply `reduce` over the (2r + 1)^2 neighborhood of every pixel."""
+    padded = np.pad(data, ((radius, radius), (radius, radius), (0, 0)),
+                    mode='edge')
+    height, width = data.shape[:2]
+    windows = [padded[dy:dy + height, dx:dx + width]
+               for dy in range(2 * radius + 1)
+               for dx in range(2 * radius + 1)]
+    return reduce(np.stack(windows), axis=0)
+
+
+def naive_convolve(data, kernel):
+    radius = len(kernel) // 2
+    padded = np.pad(data.astype(np.float64),
+                    ((radius, radius), (radius, radius), (0, 0)),
+                    mode='edge')
+    height, width = data.shape[:2]
+    result = np.zeros(data.shape)
+    for dy, ky in enumerate(kernel):
+        for dx, kx in enumerate(kernel):
+            result += ky * kx * padded[dy:dy + height, dx:dx + width]
+    return result
+
+
+@pytest.mark.parametrize('name, reduce', [('erode', np.min),
+                                          ('dilate', np.max)])
+def test_rank_filters(data, name, reduce):
+    expected = naive_window(data, 2, reduce)
+    alpha = data[:, :, 3].copy()
+    filters.FILTERS[name](data, 2)
+    np.testing.assert_array_equal(data[:, :, :3], expected[:, :, :3])
+    np.testing.assert_array_equal(data[:, :, 3], alpha)
+
+
+@pytest.mark.parametrize('name, kernel', [
+    ('blur', filters._gaussian_kernel(1.5)),
+    ('box_blur', filters._box_kernel(1.5)),
+])
+def test_blurs(data, name, kernel):
+    expected = naive_convolve(data, kernel)
+    filters.FILTERS[name](data, 1.5)
+    # The result is rounded to whole values.
+    assert np.abs(data - expected).max() <= 1
+
+
+def test_box_kernel_weights():
+    np.testing.assert_allclose(filters._box_kernel(1), [1 / 3] * 3)
+    kernel = filters._box_kernel(1.5)
+    np.testing.assert_allclose(kernel, np.array([0.5, 1, 1, 1, 0.5]) / 4)
+
+
+def test_tiled_filters_match(data, monkeypatch):
+    expected = data.copy()
+    filters.gaussian_blur(expected, 2)
+    filters.erode(expected, 1)
+    filters.invert(expected)
+
+    monkeypatch.setattr(filters, 'PARALLEL_THRESHOLD', 0)
+    monkeypatch.setattr(filters, 'TILE_ROWS', 5)
+    filters.gaussian_blur(data, 2)
+    filters.erode(data, 1)
+    filters.invert(data)
+    np.testing.assert_array_equal(data, expected)
+
+
+def test_color_filters(data):
+    original = data.copy()
+    color = original[:, :, :3].astype(np.float64)
+    lum = color.dot([0.299, 0.587, 0.114])
+
+    gray = original.copy()
+    filters.FILTERS['gray'](gray)
+    assert np.abs(gray[:, :, 0] - lum).max() <= 0.5 + 1e-3
+    assert (gray[:, :, 0] == gray[:, :, 2]).all()
+
+    black_white = original.copy()
+    filters.FILTERS['threshold'](black_white, 0.5)
+    np.testing.assert_array_equal(black_white[:, :, 1],
+                                  np.where(lum >= 127.5, 255, 0))
+
+    inverted = original.copy()
+    filters.FILTERS['invert'](inverted)
+    np.testing.assert_array_equal(inverted[:, :, :3], 255 - original[:, :, :3])
+
+    posterized = original.copy()
+    filters.FILTERS['posterize'](posterized, 4)
+    assert set(np.unique(posterized[:, :, :3])) <= {0, 85, 170, 255}
+
+    for result in (gray, black_white, inverted, posterized):
+        np.testing.assert_array_equal(result[:, :, 3], original[:, :, 3])
+
+
+def test_alpha_filters(data):
+    filters.FILTERS['opacity'](data, 0.5)
+    assert (data[:, :, 3] == 128).all()
+    filters.FILTERS['opaque'](data)
+    assert (data[:, :, 3] == 255).all()
+
+    rgb = data[:, :, :3].copy()
+    filters.opaque(rgb)
+    np.testing.assert_array_equal(rgb, data[:, :, :3])
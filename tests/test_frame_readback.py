@@ -0,0 +1,85 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import builtins
+
+import numpy as np
+import pytest
+
+from p5.sketch import renderer
+
+
+class FakeTexture:
+    def __init__(self, shape):
+        self.shape = shape
+
+
+class FakeFrameBuffer:
+    """Reads give the buffer attached while it was bound (or None)."""
+    def __init__(self, color_buffer):
+        self.bound = False
+        self.color_buffer = color_buffer
+
+    def __enter__(self):
+        self.bound = True
+
+    def __exit__(self, *args):
+        self.bound = False
+
+    def read(self, mode='color', alpha=True):
+        assert self.bound, "read from the default framebuffer"
+        height, width = self.color_buffer.shape[:2]
+        return np.full((height, width, 3), self.color_buffer.value,
+                       dtype=np.uint8)
+
+
+@pytest.fixture
+def frames(monkeypatch):
+    """A 40x30 sketch on a 2x display drawn at half the resolution."""
+    front = FakeTexture((30, 40, 3))
+    back = FakeTexture((30, 40, 3))
+    front.value, back.value = 1, 2
+    fbuffer = FakeFrameBuffer(back)
+    monkeypatch.setattr(renderer, 'fbuffer', fbuffer)
+    monkeypatch.setattr(renderer, 'fbuffer_tex_front', front)
+    monkeypatch.setattr(renderer, 'fbuffer_tex_back', back)
+    for name, value in [('width', 40), ('height', 30),
+                        ('pixel_x_density', 2), ('pixel_y_density', 2)]:
+        monkeypatch.setattr(builtins, name, value, raising=False)
+    return fbuffer
+
+
+def test_frames_are_read_at_the_window_resolution(frames):
+    assert renderer.frame_size() == (80, 60)
+    data = renderer.read_frame()
+    assert data.shape == (60, 80, 3)
+    # Outside of the draw loop, the last completed frame is read.
+    assert (data == 1).all()
+    assert frames.color_buffer is renderer.fbuffer_tex_front
+
+
+def test_pixels_are_read_at_the_sketch_size(frames):
+    data = renderer.read_pixels()
+    assert data.shape == (30, 40, 3)
+
+
+def test_reads_while_drawing_get_the_current_frame(frames, monkeypatch):
+    monkeypatch.setattr(renderer, 'drawing', True)
+    with frames:
+        assert (renderer.read_frame() == 2).all()
+        assert (renderer.read_pixels() == 2).all()
+    assert frames.color_buffer is renderer.fbuffer_tex_back
@@ -0,0 +1,113 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import builtins
+from collections import deque
+import contextlib
+
+import pytest
+
+from p5.sketch import base
+from p5.sketch.base import Sketch
+from p5.sketch.scheduler import FrameScheduler
+from p5.sketch.stats import FrameStats
+
+
+class FakeTimer:
+    def __init__(self):
+        self.running = True
+        self.starts = 0
+
+    def start(self):
+        self.running = True
+        self.starts += 1
+
+    def stop(self):
+        self.running = False
+
+
+@pytest.fixture
+def sketch(monkeypatch):
+    """A sketch past setup() that doesn't loop, without a window."""
+    monkeypatch.setattr(base, 'draw_loop', contextlib.nullcontext)
+    monkeypatch.setattr(builtins, 'frame_count', 1, raising=False)
+    sketch = Sketch.__new__(Sketch)
+    sketch.timer = FakeTimer()
+    sketch.scheduler = FrameScheduler(frame_rate=None)
+    sketch.frame_stats = FrameStats()
+    sketch.detail = sketch.resolution = None
+    sketch.replayer = sketch.recorder = None
+    sketch.share_frames = None
+    sketch.publisher = None
+    sketch.setup_done = True
+    sketch.looping = False
+    sketch.redraw = False
+    sketch.handler_queue = deque()
+    sketch.handlers = {}
+    sketch._num_coalesced = 0
+    sketch._save_flag = False
+    sketch.draws = 0
+    sketch.draw_method = lambda: setattr(sketch, 'draws', sketch.draws + 1)
+    sketch.update_method = lambda: None
+    sketch.update = lambda: None
+    return sketch
+
+
+def test_timer_stops_when_idle(sketch):
+    sketch.redraw = True
+    sketch.on_timer(None)
+    assert sketch.draws == 1
+    assert not sketch.timer.running
+
+
+def test_looping_sketches_are_never_idle(sketch):
+    sketch.looping = True
+    sketch.on_timer(None)
+    assert sketch.timer.running
+    assert not sketch._is_idle()
+
+
+def test_pending_work_keeps_the_timer_running(sketch):
+    assert sketch._is_idle()
+    sketch.handler_queue.append(('mouse_moved', None, 0))
+    assert not sketch._is_idle()
+    sketch.handler_queue.clear()
+
+    class Replayer:
+        done = False
+    sketch.replayer = Replayer()
+    assert not sketch._is_idle()
+    sketch.replayer.done = True
+    assert sketch._is_idle()
+
+    sketch.setup_done = False
+    assert not sketch._is_idle()
+
+
+def test_wake_restarts_the_timer(sketch):
+    sketch.on_timer(None)
+    assert not sketch.timer.running
+    sketch.wake()
+    assert sketch.timer.running
+    sketch.wake()
+    assert sketch.timer.starts == 1
+
+    # The timer isn't started before setup().
+    sketch.timer.stop()
+    sketch.setup_done = False
+    sketch.wake()
+    assert not sketch.timer.running
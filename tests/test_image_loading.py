@@ -0,0 +1,94 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import os
+import sys
+import time
+from collections import OrderedDict
+
+import pytest
+from PIL import Image
+
+from p5.core.image import load_image
+from p5.core.image import load_image_async
+from p5.core.image import preload
+
+image_module = sys.modules['p5.core.image']
+
+
+@pytest.fixture
+def images(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_module, '_image_cache', OrderedDict())
+    paths = []
+    for idx in range(4):
+        path = str(tmp_path / 'img{}.png'.format(idx))
+        Image.new('RGB', (3 + idx, 2), (idx, 0, 0)).save(path)
+        paths.append(path)
+    return paths
+
+
+def test_load_image(images):
+    img = load_image(images[1])
+    assert img.size == (4, 2)
+    assert img._data[0, 0].tolist() == [1, 0, 0]
+
+
+def test_load_image_async_and_preload(images):
+    img = load_image_async(images[2])
+    assert img.size == (5, 2)
+    assert [i.size for i in preload(images[:2])] == [(3, 2), (4, 2)]
+
+
+def test_unchanged_files_are_decoded_once(images):
+    first = image_module._load_cached(images[0])
+    assert image_module._load_cached(images[0]) is first
+
+
+def test_modified_files_are_decoded_again(images):
+    first = image_module._load_cached(images[0])
+    mtime = os.path.getmtime(images[0])
+    os.utime(images[0], (mtime + 10, mtime + 10))
+    assert image_module._load_cached(images[0]) is not first
+
+
+def test_cache_keeps_recently_used_images(images, monkeypatch):
+    monkeypatch.setattr(image_module, 'MAX_CACHED_IMAGES', 2)
+    first = image_module._load_cached(images[0])
+    image_module._load_cached(images[1])
+    image_module._load_cached(images[0])
+    image_module._load_cached(images[2])
+
+    cached = [os.path.basename(path) for path in image_module._image_cache]
+    assert cached == ['img0.png', 'img2.png']
+    assert image_module._load_cached(images[0]) is first
+
+
+def test_failed_loads_are_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_module, '_image_cache', OrderedDict())
+    path = str(tmp_path / 'broken.png')
+    with open(path, 'w') as f:
+        f.write('not an image')
+    with pytest.raises(Exception):
+        load_image(path)
+
+    # The entry is removed by a callback that might still be running.
+    for _ in range(100):
+        if path not in image_module._image_cache:
+            break
+        time.sleep(0.01)
+    assert path not in image_module._image_cache
@@ -0,0 +1,210 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import types
+import weakref
+
+import numpy as np
+import pytest
+
+from p5.sketch import renderer
+
+
+class FakeTexture:
+    def __init__(self, shape, interpolation=None):
+        self.shape = shape
+        self.deleted = False
+
+    def delete(self):
+        self.deleted = True
+
+
+class FakeFrameBuffer:
+    """Records whether it was bound while being drawn to or read."""
+    def __init__(self):
+        self.bound = False
+        self.color_buffer = None
+        self.reads = []
+
+    def __enter__(self):
+        self.bound = True
+
+    def __exit__(self, *args):
+        self.bound = False
+
+    def read(self, mode='color', alpha=True, crop=None):
+        self.reads.append((self.bound, self.color_buffer, crop))
+        _, _, width, height = crop
+        data = np.zeros((height, width, 4), dtype=np.uint8)
+        data[0] = 255
+        return data
+
+
+class FakeProgram(dict):
+    def draw(self, mode):
+        pass
+
+
+@pytest.fixture
+def gl(monkeypatch):
+    fbuffer = FakeFrameBuffer()
+    fake_gloo = types.SimpleNamespace(Texture2D=FakeTexture,
+                                      set_viewport=lambda *args: None,
+                                      set_state=lambda **kwargs: None)
+    monkeypatch.setattr(renderer, 'gloo', fake_gloo)
+    monkeypatch.setattr(renderer, 'image_fbuffer', fbuffer)
+    monkeypatch.setattr(renderer, '_comm_toggles', lambda: None)
+    monkeypatch.setattr(renderer, 'texture_viewport', (0, 0, 8, 8))
+    monkeypatch.setattr(renderer, '_pass_textures', weakref.WeakSet())
+    monkeypatch.setattr(renderer, '_free_pass_textures', {})
+    return fbuffer
+
+
+def test_pass_textures_are_reused(gl):
+    texture = renderer._pass_texture(4, 5)
+    renderer.release_texture(texture)
+    assert not texture.deleted
+    assert renderer._pass_texture(4, 5) is texture
+    assert renderer._pass_texture(4, 5) is not texture
+
+
+def test_other_textures_are_deleted(gl):
+    texture = FakeTexture((4, 5, 4))
+    renderer.release_texture(texture)
+    assert texture.deleted
+    assert renderer._free_pass_textures == {}
+
+
+def test_free_pass_textures_are_bounded(gl):
+    textures = [renderer._pass_texture(2, 2)
+                for _ in range(renderer.MAX_FREE_PASS_TEXTURES + 1)]
+    for texture in textures:
+        renderer.release_texture(texture)
+    assert len(renderer._free_pass_textures[(2, 2)]) == \
+        renderer.MAX_FREE_PASS_TEXTURES
+    assert textures[-1].deleted
+
+
+def test_separable_pass_releases_intermediate_texture(gl):
+    source = FakeTexture((3, 4, 4))
+    result = renderer._separable_pass(FakeProgram(), source)
+    assert result.shape == (3, 4, 4)
+    assert renderer._free_pass_textures[(3, 4)] != []
+    assert renderer._free_pass_textures[(3, 4)][0] is not result
+    assert not source.deleted
+
+
+def test_read_texture_reads_from_bound_image_fbuffer(gl):
+    texture = FakeTexture((3, 4, 4))
+    data = renderer.read_texture(texture)
+    assert gl.reads == [(True, texture, (0, 0, 4, 3))]
+    assert data.shape == (3, 4, 4)
+    # read() returns the top row first; textures start at the bottom.
+    assert (data[-1] == 255).all() and not data[0].any()
+
+
+def test_replaced_image_texture_is_released(gl):
+    from p5.core.image import PImage
+
+    img = PImage(4, 3)
+    old = FakeTexture((3, 4, 4))
+    img._img_texture = old
+    new = renderer._pass_texture(3, 4)
+    img._set_gpu_texture(new)
+    assert old.deleted
+    assert img._img_texture is new
+
+    img._set_gpu_texture(new)
+    assert not new.deleted
+
+
+class FakeBuffer:
+    def set_data(self, data):
+        pass
+
+
+def test_queued_sprites_are_drawn_before_a_gpu_filter(gl, monkeypatch):
+    from p5.core.image import PImage
+
+    events = []
+
+    class PassProgram(FakeProgram):
+        def draw(self, mode):
+            events.append(('pass', gl.color_buffer))
+
+    class SpriteProgram(FakeProgram):
+        def bind(self, buffer):
+            pass
+
+        def draw(self, mode, indices=None):
+            texture = self['texture']
+            free = renderer._free_pass_textures.get(texture.shape[:2], [])
+            events.append(('sprite', texture, texture.deleted,
+                           texture in free))
+
+    monkeypatch.setattr(renderer, 'blur_prog', PassProgram())
+    monkeypatch.setattr(renderer, 'texture_prog', SpriteProgram())
+    monkeypatch.setattr(renderer, 'sprite_vertex_buffer', FakeBuffer())
+    monkeypatch.setattr(renderer, 'sprite_index_buffer', FakeBuffer())
+
+    img = PImage(4, 3)
+    queued = renderer._pass_texture(3, 4)
+    img._set_gpu_texture(queued)
+    monkeypatch.setattr(renderer, 'sprite_draw_queue',
+                        [(queued, np.zeros((4, 3)), renderer.IMAGE_TEXCOORDS,
+                          (1, 1, 1, 1))])
+
+    img.filter('blur', 1, gpu=True)
+
+    assert events[0] == ('sprite', queued, False, False)
+    assert all(event[1] is not queued for event in events[1:])
+    assert renderer.sprite_draw_queue == []
+    assert img._img_texture is not queued
+
+
+def test_release_texture_draws_queued_sprites_first(gl, monkeypatch):
+    flushes = []
+    monkeypatch.setattr(renderer, 'flush_sprites',
+                        lambda: flushes.append(texture.deleted))
+    texture = FakeTexture((4, 5, 4))
+    renderer.release_texture(texture)
+    assert flushes == [False]
+    assert texture.deleted
+
+
+def test_filter_fits_shader():
+    steps = renderer.MAX_FILTER_STEPS
+    assert renderer.filter_fits_shader('blur', steps / 3)
+    assert not renderer.filter_fits_shader('blur', steps / 3 + 1)
+    assert renderer.filter_fits_shader('box_blur', steps)
+    assert not renderer.filter_fits_shader('box_blur', steps + 0.5)
+    assert renderer.filter_fits_shader('dilate', steps)
+    assert not renderer.filter_fits_shader('erode', steps + 1)
+    assert renderer.filter_fits_shader('threshold', 0.5)
+
+
+def test_large_gpu_blur_falls_back_to_the_cpu(monkeypatch):
+    from p5.core.image import PImage
+
+    def filter_texture(*args):
+        raise AssertionError("the shader can't blur this far")
+
+    monkeypatch.setattr(renderer, 'filter_texture', filter_texture)
+    img = PImage(4, 3)
+    img.filter('blur', renderer.MAX_FILTER_STEPS, gpu=True)
+    assert not img._img_on_gpu
@@ -0,0 +1,37 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import subprocess
+import sys
+
+from p5._lazy import LazyModule
+from p5._lazy import lazy_import
+
+
+def test_lazy_module_imports_on_first_use():
+    module = lazy_import('json')
+    assert isinstance(module, LazyModule)
+    assert module._module is None
+    assert module.dumps([1]) == '[1]'
+    assert module._module is sys.modules['json']
+
+
+def test_import_p5_defers_heavy_modules():
+    code = ("import sys, p5; "
+            "print(sorted(m for m in ('vispy', 'PIL') if m in sys.modules))")
+    output = subprocess.check_output([sys.executable, '-c', code])
+    assert output.decode().split()[-1] == '[]'
@@ -0,0 +1,88 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import builtins
+
+import numpy as np
+import pytest
+
+from p5 import sketch
+from p5.core.image import _modified_regions
+from p5.core.image import load_pixels
+
+
+@pytest.fixture
+def window(monkeypatch):
+    """A 6x4 'display' whose pixels are read and written by load_pixels()."""
+    frame = np.arange(4 * 6 * 3, dtype=np.uint8).reshape(4, 6, 3)
+    writes = []
+    monkeypatch.setattr(builtins, 'width', 6, raising=False)
+    monkeypatch.setattr(builtins, 'height', 4, raising=False)
+    monkeypatch.setattr(builtins, 'pixels', None, raising=False)
+    monkeypatch.setattr(sketch.renderer, 'flush_geometry', lambda: None)
+    monkeypatch.setattr(sketch.renderer, 'read_pixels', frame.copy)
+    monkeypatch.setattr(sketch.renderer, 'write_pixels',
+                        lambda data, loc: writes.append((data.copy(), loc)))
+    return frame, writes
+
+
+def test_modified_regions_groups_rows_and_trims_columns():
+    old = np.zeros((6, 5, 3), dtype=np.uint8)
+    new = old.copy()
+    new[1, 2] = 1
+    new[2, 3] = 1
+    new[4, 0] = 1
+
+    regions = _modified_regions(old, new)
+    assert regions == [(slice(1, 3), slice(2, 4)), (slice(4, 5), slice(0, 1))]
+
+
+def test_modified_regions_unchanged():
+    data = np.ones((3, 3, 3), dtype=np.uint8)
+    assert _modified_regions(data, data.copy()) == []
+
+
+def test_load_pixels_writes_back_changed_region(window):
+    frame, writes = window
+    with load_pixels() as px:
+        assert px.shape == (4, 6, 3)
+        np.testing.assert_array_equal(px, frame)
+        px[2, 1:3] = 0
+
+    assert len(writes) == 1
+    data, location = writes[0]
+    assert location == (1, 2)
+    assert data.shape == (1, 2, 3) and not data.any()
+    assert builtins.pixels is None
+
+
+def test_load_pixels_without_changes_writes_nothing(window):
+    _, writes = window
+    with load_pixels():
+        pass
+    assert writes == []
+
+
+def test_load_pixels_cleans_up_on_error(window):
+    _, writes = window
+    with pytest.raises(RuntimeError):
+        with load_pixels() as px:
+            px[:] = 0
+            raise RuntimeError
+    assert writes == []
+    assert builtins.pixels is None
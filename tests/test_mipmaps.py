@@ -0,0 +1,75 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import builtins
+
+import numpy as np
+import pytest
+
+from p5.sketch import renderer
+
+
+@pytest.fixture
+def window(monkeypatch):
+    monkeypatch.setattr(builtins, 'width', 100, raising=False)
+    monkeypatch.setattr(builtins, 'height', 100, raising=False)
+    monkeypatch.setattr(builtins, 'pixel_x_density', 1, raising=False)
+    monkeypatch.setattr(builtins, 'pixel_y_density', 1, raising=False)
+    monkeypatch.setattr(renderer, 'render_scale', 1.0)
+    monkeypatch.setattr(renderer, 'transform_matrix', np.identity(4))
+
+
+def test_level_from_logical_size(window):
+    assert renderer.mipmap_level((400, 400), (400, 400)) == 0
+    assert renderer.mipmap_level((400, 400), (200, 200)) == 1
+    assert renderer.mipmap_level((400, 400), (100, 100)) == 2
+    assert renderer.mipmap_level((400, 400), (0, 100)) == 0
+
+
+def test_level_uses_transform(window, monkeypatch):
+    monkeypatch.setattr(renderer, 'transform_matrix',
+                        np.diag([0.25, 0.25, 1.0, 1.0]))
+    assert renderer.mipmap_level((400, 400), (400, 400)) == 2
+
+
+def test_level_accounts_for_pixel_density(window, monkeypatch):
+    monkeypatch.setattr(builtins, 'pixel_x_density', 2)
+    monkeypatch.setattr(builtins, 'pixel_y_density', 2)
+    assert renderer.mipmap_level((400, 400), (100, 100)) == 1
+
+
+def test_level_accounts_for_render_scale(window, monkeypatch):
+    monkeypatch.setattr(renderer, 'render_scale', 0.5)
+    assert renderer.mipmap_level((400, 400), (200, 200)) == 2
+
+
+def test_image_mipmaps_are_cached_and_cleared():
+    from PIL import Image
+    from p5.core.image import PImage
+
+    img = PImage(8, 8)
+    img._img = Image.new('RGB', (8, 8), (200, 100, 50))
+    level = img._mipmap(2)
+    assert level.size == (2, 2)
+    assert img._mipmap(2) is level
+    assert img._mipmap(1).size == (4, 4)
+    assert img._mipmap(10).size == (1, 1)
+
+    with img.pixels_array() as px:
+        px[:] = 0
+    assert img._mipmap(2) is not level
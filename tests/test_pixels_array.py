@@ -0,0 +1,78 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import colorsys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from p5.core.color import gray_array
+from p5.core.color import hsb_to_rgb_array
+from p5.core.color import rgb_to_hsb_array
+from p5.core.image import PImage
+
+
+@pytest.fixture
+def colors():
+    rng = np.random.default_rng(3)
+    rgb = rng.random((50, 3))
+    # Grays, primaries and colors with the same maximum in two channels.
+    extra = [(0, 0, 0), (1, 1, 1), (0.5, 0.5, 0.5), (1, 0, 0), (0, 1, 0),
+             (0, 0, 1), (1, 1, 0), (0, 1, 1), (1, 0, 1), (0.2, 0.6, 0.6)]
+    return np.vstack([rgb, extra])
+
+
+def test_rgb_to_hsb_matches_colorsys(colors):
+    expected = [colorsys.rgb_to_hsv(*rgb) for rgb in colors]
+    np.testing.assert_allclose(rgb_to_hsb_array(colors), expected,
+                               atol=1e-12)
+
+
+def test_hsb_to_rgb_matches_colorsys(colors):
+    hsb = np.array([colorsys.rgb_to_hsv(*rgb) for rgb in colors])
+    np.testing.assert_allclose(hsb_to_rgb_array(hsb), colors, atol=1e-12)
+
+
+def test_alpha_and_shape_are_kept(colors):
+    rgba = np.concatenate([colors, np.full((len(colors), 1), 0.25)],
+                          axis=1).reshape(6, 10, 4)
+    hsba = rgb_to_hsb_array(rgba)
+    assert hsba.shape == (6, 10, 4)
+    assert (hsba[..., 3] == 0.25).all()
+    np.testing.assert_allclose(hsb_to_rgb_array(hsba), rgba, atol=1e-12)
+
+    with pytest.raises(ValueError):
+        rgb_to_hsb_array(np.zeros((4, 2)))
+
+
+def test_gray_array():
+    gray = gray_array([[1, 0, 0, 0.5], [0, 1, 0, 1], [1, 1, 1, 1]])
+    np.testing.assert_allclose(gray, [0.299, 0.587, 1.0])
+
+
+def test_pixels_array_edits_the_image():
+    img = PImage(4, 3)
+    img._img = Image.new('RGB', (4, 3), (10, 20, 30))
+    with img.pixels_array() as px:
+        assert px.shape == (3, 4, 3)
+        px[:, :2, 0] = 255
+    assert img._img.getpixel((0, 0)) == (255, 20, 30)
+    assert img._img.getpixel((3, 2)) == (10, 20, 30)
+    assert img._img_texture_dirty
+    with img.pixels_array() as px:
+        assert px[1, 1, 0] == 255
@@ -0,0 +1,173 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import pytest
+
+from p5.sketch.base import Sketch
+from p5.sketch import renderer
+from p5.sketch.scheduler import FrameScheduler
+from p5.sketch.scheduler import FrameTimeGovernor
+
+
+def test_frames_follow_fixed_deadlines():
+    scheduler = FrameScheduler(frame_rate=10)
+    assert scheduler.begin_frame(0.0)
+    assert scheduler.last_frame_time is None
+    # Too early (the next deadline is at 0.1s).
+    assert not scheduler.begin_frame(0.05)
+    # Ticks slightly before the deadline are accepted.
+    assert scheduler.begin_frame(0.09)
+    assert scheduler.last_frame_time == pytest.approx(0.09)
+    # The deadline doesn't drift with the early tick.
+    assert not scheduler.begin_frame(0.17)
+    assert scheduler.begin_frame(0.2)
+    assert scheduler.dropped_frames == 0
+
+
+def test_missed_frames_are_dropped():
+    scheduler = FrameScheduler(frame_rate=10)
+    scheduler.begin_frame(0.0)
+    assert scheduler.begin_frame(0.35)
+    assert scheduler.dropped_frames == 2
+    # The next frame is due at the next multiple of the interval.
+    assert not scheduler.begin_frame(0.36)
+    assert scheduler.begin_frame(0.4)
+
+
+def test_unlimited_frame_rate():
+    scheduler = FrameScheduler(frame_rate=None)
+    assert scheduler.timer_interval == 0
+    assert all(scheduler.begin_frame(t * 0.001) for t in range(5))
+    assert scheduler.frame_rate == pytest.approx(1000)
+
+
+def test_fixed_timestep_updates():
+    scheduler = FrameScheduler(frame_rate=60, update_rate=100)
+    assert scheduler.num_updates(0.0) == 0
+    assert scheduler.num_updates(0.025) == 2
+    assert scheduler.update_alpha == pytest.approx(0.5)
+    assert scheduler.num_updates(0.034) == 1
+    assert scheduler.update_alpha == pytest.approx(0.4)
+    assert scheduler.skipped_updates == 0
+
+    assert FrameScheduler(update_rate=None).num_updates(1.0) == 0
+
+
+def test_updates_are_capped_and_counted():
+    scheduler = FrameScheduler(update_rate=100, max_updates=5)
+    scheduler.num_updates(0.0)
+    assert scheduler.num_updates(0.1) == 5
+    assert scheduler.skipped_updates == 5
+    # Long stalls only count up to MAX_ELAPSED seconds.
+    assert scheduler.num_updates(10.0) == 5
+    assert scheduler.skipped_updates == 5 + 20
+
+
+def test_reset_restarts_timing():
+    scheduler = FrameScheduler(frame_rate=10, update_rate=100)
+    scheduler.begin_frame(0.0)
+    scheduler.num_updates(0.0)
+    scheduler.reset()
+    assert scheduler.begin_frame(5.0)
+    assert scheduler.last_frame_time is None
+    assert scheduler.dropped_frames == 0
+    assert scheduler.num_updates(5.0) == 0
+    assert scheduler.skipped_updates == 0
+
+
+def test_skipped_updates_are_reported():
+    sketch = Sketch.__new__(Sketch)
+    sketch.scheduler = FrameScheduler(update_rate=100, max_updates=1)
+    sketch.coalesced_events = 0
+    sketch.scheduler.num_updates(0.0)
+    sketch.scheduler.num_updates(0.05)
+    assert sketch._counters()['skipped_updates'] == 4
+
+
+def run_frames(governor, frame_time, count):
+    for _ in range(count):
+        governor.update(frame_time)
+    return governor.level
+
+
+def test_governor_lowers_the_level_over_budget():
+    governor = FrameTimeGovernor(0.01, min_level=0.5, step=0.1, cooldown=5)
+    # Measurements start after the cooldown.
+    assert run_frames(governor, 0.02, 5) == 1.0
+    assert run_frames(governor, 0.02, 1) == 0.9
+    assert governor.reaction_time == pytest.approx(0.12)
+    # Each change waits for another cooldown.
+    assert run_frames(governor, 0.02, 5) == 0.9
+    assert run_frames(governor, 0.02, 100) == 0.5
+    assert governor.drops == 5
+    # Frame times within the tolerance count as meeting the target.
+    assert run_frames(governor, 0.0105, 2) == 0.5
+
+
+def test_governor_raises_the_level_again():
+    governor = FrameTimeGovernor(0.01, min_level=0.5, step=0.25, cooldown=4)
+    run_frames(governor, 0.02, 10)
+    assert governor.level == 0.5
+    # A raise needs the target to be met for a cooldown.
+    assert run_frames(governor, 0.005, 4 + 3) == 0.5
+    assert run_frames(governor, 0.005, 1) == 0.75
+    assert run_frames(governor, 0.005, 8) == 1.0
+    assert governor.raises == 2
+    stats = governor.stats()
+    assert (stats['level'], stats['drops'], stats['raises']) == (1.0, 2, 2)
+    assert stats['reaction_time'] > 0
+
+
+def test_governor_backs_off_from_failed_raises():
+    governor = FrameTimeGovernor(0.01, min_level=0.5, step=0.5, cooldown=2)
+    run_frames(governor, 0.02, 3)
+    assert governor.level == 0.5
+
+    waits = []
+    for _ in range(3):
+        # Count the frames until the level is raised again.
+        frames = 0
+        while governor.level == 0.5:
+            governor.update(0.005)
+            frames += 1
+        waits.append(frames)
+        # Too slow at the raised level: the raise is undone.
+        while governor.level == 1.0:
+            governor.update(0.02)
+    assert waits[1] > waits[0] and waits[2] > waits[1]
+
+
+def test_detail_level_is_checked():
+    with pytest.raises(ValueError):
+        renderer.set_detail_level(0)
+    with pytest.raises(ValueError):
+        renderer.set_detail_level(1.5)
+
+
+def test_only_one_governor_changes_per_frame(monkeypatch):
+    monkeypatch.setattr(renderer, 'detail_level', 1.0)
+    monkeypatch.setattr(renderer, 'set_render_scale', lambda scale: None)
+    sketch = Sketch.__new__(Sketch)
+    sketch.detail = FrameTimeGovernor(0.01, cooldown=1)
+    sketch.resolution = FrameTimeGovernor(0.01, cooldown=1)
+    for _ in range(2):
+        sketch._govern(0.05)
+    assert sketch.detail.level == 0.9
+    assert renderer.detail_level == 0.9
+    # The resolution governor restarted its measurements.
+    assert sketch.resolution.level == 1.0
+    assert sketch.resolution.frame_time is None
@@ -0,0 +1,191 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import builtins
+from collections import deque
+import contextlib
+import uuid
+
+import numpy as np
+import pytest
+
+from p5.sketch import base
+from p5.sketch import sharing
+from p5.sketch.scheduler import FrameScheduler
+from p5.sketch.sharing import FramePublisher
+from p5.sketch.sharing import FrameReader
+from p5.sketch.stats import FrameStats
+
+
+@pytest.fixture
+def ring():
+    name = 'p5test_' + uuid.uuid4().hex[:12]
+    publisher = FramePublisher(name, (4, 3), slots=3)
+    reader = FrameReader(name)
+    yield publisher, reader
+    reader.close()
+    publisher.close()
+
+
+def frame(value, width=4, height=3):
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+
+def test_read_published_frames(ring):
+    publisher, reader = ring
+    assert reader.sequence == 0
+    assert reader.read() is None
+
+    assert publisher.publish(10, frame(1)) == 1
+    assert publisher.publish(11, frame(2, width=2)) == 2
+    sequence, frame_number, timestamp, pixels = reader.read()
+    assert (sequence, frame_number) == (2, 11)
+    assert timestamp > 0
+    np.testing.assert_array_equal(pixels, frame(2, width=2))
+
+    # Older frames stay readable until their slot is reused.
+    assert reader.read(1)[1] == 10
+    publisher.publish(12, frame(3))
+    publisher.publish(13, frame(4))
+    assert reader.read(1) is None
+    assert reader.read(4)[1] == 13
+
+
+def test_views_are_checked_after_use(ring):
+    publisher, reader = ring
+    publisher.publish(0, frame(1))
+    sequence, _, _, view = reader.read(copy=False)
+    copied = reader.read(sequence)[3]
+    for value in range(2, 5):
+        publisher.publish(value, frame(value))
+    assert not reader.is_valid(sequence)
+    # The view now shows the newer frame, the copy doesn't.
+    assert (view == 4).all()
+    assert (copied == 1).all()
+
+
+def test_torn_reads_are_detected(ring):
+    publisher, reader = ring
+    publisher.publish(0, frame(1))
+    # The writer has started to overwrite the slot.
+    reader.slot_headers[1][sharing._S_BEGIN] = 4
+    assert reader.read(1) is None
+    assert not reader.is_valid(1)
+
+
+def test_frames_must_fit(ring):
+    publisher, _ = ring
+    with pytest.raises(ValueError):
+        publisher.publish(0, frame(1, width=40))
+    with pytest.raises(ValueError):
+        publisher.publish(0, np.zeros((3, 4, 4), dtype=np.uint8))
+
+
+def test_reader_checks_the_block():
+    name = 'p5test_' + uuid.uuid4().hex[:12]
+    shm = sharing._shared_memory(name, create=True, size=128)
+    try:
+        with pytest.raises(ValueError):
+            FrameReader(name)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_stale_blocks_are_replaced():
+    name = 'p5test_' + uuid.uuid4().hex[:12]
+    crashed = FramePublisher(name, (4, 3))
+    crashed.publish(0, frame(1))
+    # The sketch went away without removing the block.
+    crashed.close(unlink=False)
+
+    publisher = FramePublisher(name, (8, 6))
+    reader = FrameReader(name)
+    try:
+        assert reader.sequence == 0
+        publisher.publish(5, frame(2, width=8, height=6))
+        assert reader.read()[1] == 5
+    finally:
+        reader.close()
+        publisher.close()
+
+
+def test_other_blocks_are_not_replaced():
+    name = 'p5test_' + uuid.uuid4().hex[:12]
+    shm = sharing._shared_memory(name, create=True, size=128)
+    try:
+        with pytest.raises(FileExistsError):
+            FramePublisher(name, (4, 3))
+        # The block is still there.
+        sharing._shared_memory(name).close()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+@pytest.fixture
+def sketch(monkeypatch):
+    """A sketch before setup() that shares its frames."""
+    monkeypatch.setattr(base, 'draw_loop', contextlib.nullcontext)
+    monkeypatch.setattr(base.renderer, 'frame_size', lambda: (4, 3))
+    monkeypatch.setattr(base.renderer, 'read_frame', lambda: frame(7))
+    monkeypatch.setattr(builtins, 'frame_count', 0, raising=False)
+    sketch = base.Sketch.__new__(base.Sketch)
+    sketch.scheduler = FrameScheduler(frame_rate=None)
+    sketch.replayer = sketch.recorder = None
+    sketch.share_frames = 'p5test_' + uuid.uuid4().hex[:12]
+    sketch.publisher = None
+    sketch.headless = True
+    sketch.setup_done = False
+    sketch.looping = True
+    sketch.redraw = False
+    sketch.handler_queue = deque()
+    sketch._save_flag = False
+    sketch.setup_method = lambda: None
+    sketch.draw_method = lambda: None
+    sketch.update_method = lambda: None
+    sketch.handlers = {}
+    sketch._num_coalesced = 0
+    sketch.update = lambda: None
+    sketch.frame_stats = FrameStats()
+    sketch.detail = sketch.resolution = None
+    yield sketch
+    if sketch.publisher is not None:
+        sketch.publisher.close()
+
+
+def test_publisher_is_created_after_setup(sketch):
+    sketch.on_timer(None)
+    assert sketch.publisher is not None
+    reader = FrameReader(sketch.share_frames)
+    try:
+        sketch.on_timer(None)
+        assert reader.read()[1] == 2
+    finally:
+        reader.close()
+
+
+def test_publisher_errors_are_raised_once(sketch):
+    shm = sharing._shared_memory(sketch.share_frames, create=True, size=128)
+    try:
+        with pytest.raises(FileExistsError):
+            sketch.on_timer(None)
+        assert sketch.setup_done and sketch.publisher is None
+        sketch.on_timer(None)
+    finally:
+        shm.close()
+        shm.unlink()
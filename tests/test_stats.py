@@ -0,0 +1,110 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import csv
+import json
+
+import numpy as np
+import pytest
+
+from p5.sketch.stats import BIN_WIDTH
+from p5.sketch.stats import FrameStats
+from p5.sketch.stats import RollingHistogram
+from p5.sketch.stats import check_stats_file
+
+
+def test_percentiles_match_numpy():
+    rng = np.random.default_rng(6)
+    samples = rng.gamma(2, 0.008, 1000)
+    hist = RollingHistogram()
+    for sample in samples:
+        hist.add(sample)
+    for q in (50, 95, 99):
+        expected = np.percentile(samples, q, method='inverted_cdf')
+        assert expected <= hist.percentile(q) <= expected + BIN_WIDTH
+
+    summary = hist.summary()
+    assert summary['count'] == 1000
+    assert summary['mean'] == pytest.approx(samples.mean())
+    assert summary['max'] == samples.max()
+
+
+def test_window_drops_old_samples():
+    hist = RollingHistogram(window=3)
+    for sample in (0.5, 0.5, 0.001, 0.002, 0.003):
+        hist.add(sample)
+    assert hist.summary()['count'] == 3
+    assert hist.summary()['max'] == 0.003
+    assert hist.total == pytest.approx(0.006)
+    assert hist.counts.sum() == 3
+
+
+def test_long_samples_and_empty_histograms():
+    hist = RollingHistogram()
+    assert hist.percentile(50) is None
+    assert hist.summary()['mean'] is None
+    hist.add(0.01)
+    hist.add(2.5)
+    # Samples beyond the last bin report the actual maximum.
+    assert hist.percentile(99) == 2.5
+    assert hist.percentile(50) == pytest.approx(0.01 + BIN_WIDTH)
+
+
+def test_counters_are_reported_and_written(tmp_path):
+    stats = FrameStats()
+    stats.frame_times.add(0.02)
+    summary = stats.summary(dropped_frames=3, coalesced_events=7)
+    assert summary['dropped_frames'] == 3
+    assert summary['coalesced_events'] == 7
+
+    jsonl = str(tmp_path / 'stats.jsonl')
+    stats.write(jsonl, 3, coalesced_events=7)
+    with open(jsonl) as f:
+        row = json.loads(f.readline())
+    assert row['coalesced_events'] == 7
+    assert row['frame_time_count'] == 1
+
+    csv_file = str(tmp_path / 'stats.csv')
+    stats.write(csv_file, 3, coalesced_events=7)
+    with open(csv_file) as f:
+        row = next(csv.DictReader(f))
+    assert row['coalesced_events'] == '7'
+
+
+def test_unknown_stats_format(tmp_path):
+    with pytest.raises(ValueError):
+        FrameStats().write(str(tmp_path / 'stats.txt'))
+
+
+def test_check_stats_file():
+    check_stats_file('stats.csv')
+    check_stats_file('out/stats.jsonl')
+    with pytest.raises(ValueError):
+        check_stats_file('stats.json')
+
+
+def test_run_rejects_unknown_stats_format(monkeypatch):
+    from p5.sketch import userspace
+
+    monkeypatch.setattr(userspace, '_cli_options', {})
+    with pytest.raises(ValueError):
+        userspace.run(stats_file='stats.txt')
+
+    monkeypatch.setattr(userspace, '_cli_options', {'stats_file': 'a.txt'})
+    with pytest.raises(ValueError):
+        userspace.run(stats_file='stats.csv')
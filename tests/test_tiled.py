@@ -0,0 +1,97 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import builtins
+
+import numpy as np
+import pytest
+
+from p5.core.tiled import TiledImage
+from p5.core.tiled import load_tiled_image
+from p5.sketch import renderer
+
+
+@pytest.fixture
+def window(monkeypatch):
+    monkeypatch.setattr(builtins, 'width', 100, raising=False)
+    monkeypatch.setattr(builtins, 'height', 100, raising=False)
+    monkeypatch.setattr(renderer, 'transform_matrix', np.identity(4))
+
+
+def make_image(width=40, height=30, channels=3, **kwargs):
+    data = np.arange(width * height * channels, dtype=np.uint32)
+    data = (data % 251).astype(np.uint8).reshape(height, width, channels)
+    return TiledImage(data, **kwargs)
+
+
+def test_tiles_are_cached_and_evicted():
+    img = make_image(tile_size=16, max_tiles=2)
+    first = img._tile(0, 0, 0)
+    assert img._tile(0, 0, 0) is first
+    img._tile(0, 0, 1)
+    # The first tile is the most recently used one now.
+    img._tile(0, 0, 0)
+    img._tile(0, 1, 0)
+    assert list(img._tiles) == [(0, 0, 0), (0, 1, 0)]
+
+
+def test_tile_contents():
+    img = make_image(tile_size=16)
+    tile = img._tile(0, 1, 2)
+    # The last tile is cut off by the edges of the image.
+    assert tile.size == (8, 14)
+    np.testing.assert_array_equal(np.asarray(tile._img),
+                                  img._data[16:30, 32:40])
+    # Higher levels read every second (fourth, ...) pixel.
+    tile = img._tile(1, 0, 0)
+    assert tile.size == (16, 15)
+    np.testing.assert_array_equal(np.asarray(tile._img),
+                                  img._data[0:32:2, 0:32:2])
+
+
+def test_visible_tiles(window, monkeypatch):
+    img = make_image(width=400, height=400, tile_size=100)
+    # Drawn at (0, 0) with the image size only the top-left quarter
+    # of the image is on the screen.
+    visible = img._visible_tiles((0, 0), (400, 400), 0)
+    assert sorted(visible) == [(0, 0), (0, 1), (1, 0), (1, 1)]
+
+    # Scaled down, everything is visible.
+    assert len(img._visible_tiles((0, 0), (100, 100), 0)) == 16
+
+    # Moved off the screen, nothing is.
+    renderer.transform_matrix[0, 3] = 500
+    assert img._visible_tiles((0, 0), (100, 100), 0) == []
+
+
+def test_load_raw_and_npy(tmp_path):
+    data = make_image(8, 6, 4)._data
+    raw = tmp_path / 'image.raw'
+    raw.write_bytes(b'header' + data.tobytes())
+    img = load_tiled_image(str(raw), size=(8, 6), fmt='RGBA', offset=6)
+    assert img.size == (8, 6)
+    np.testing.assert_array_equal(img._data, data)
+
+    npy = tmp_path / 'image.npy'
+    np.save(str(npy), data[:, :, 0])
+    img = load_tiled_image(str(npy))
+    assert img._data.shape == (6, 8, 1)
+
+    with pytest.raises(ValueError):
+        load_tiled_image(str(raw))
+    with pytest.raises(ValueError):
+        TiledImage(np.zeros((4, 4, 2), dtype=np.uint8))
@@ -0,0 +1,91 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import math
+
+import numpy as np
+import pytest
+
+from p5.core import transforms
+from p5.sketch import renderer
+
+
+@pytest.fixture(autouse=True)
+def stack(monkeypatch):
+    monkeypatch.setattr(renderer, 'matrix_stack',
+                        [np.identity(4) for _ in range(2)])
+    renderer.reset_matrix_stack()
+
+
+OPERATIONS = [
+    (transforms.translate, (3, -2)),
+    (transforms.rotate, (0.7,)),
+    (transforms.rotate_z, (-1.2,)),
+    (transforms.scale, (2,)),
+    (transforms.scale, (2, 0.5)),
+    (transforms.shear_x, (0.3,)),
+    (transforms.shear_y, (-0.4,)),
+    (transforms.translate, (1, 2, 3)),
+    (transforms.rotate, (0.5, np.array([0, 0, -1]))),
+    (transforms.rotate_x, (0.9,)),
+    (transforms.rotate_y, (-0.2,)),
+    (transforms.scale, (1, 2, 3)),
+]
+
+
+def test_transforms_match_matrix_products():
+    expected = np.identity(4)
+    for function, args in OPERATIONS:
+        tmat = function(*args)
+        expected = expected.dot(tmat)
+        np.testing.assert_allclose(renderer.transform_matrix, expected,
+                                   atol=1e-12)
+    # The last operations used the general 4x4 update.
+    assert not renderer.transform_is_2d
+
+
+def test_2d_fast_path_flag():
+    transforms.translate(1, 2)
+    transforms.rotate(0.3)
+    transforms.shear_x(0.1)
+    assert renderer.transform_is_2d
+    transforms.apply_matrix(np.identity(4))
+    assert renderer.transform_is_2d
+    transforms.rotate_x(0.1)
+    assert not renderer.transform_is_2d
+    transforms.reset_matrix()
+    assert renderer.transform_is_2d
+    np.testing.assert_array_equal(renderer.transform_matrix, np.identity(4))
+
+
+def test_push_matrix_restores_the_transform():
+    transforms.translate(5, 5)
+    before = renderer.transform_matrix.copy()
+    # Deeper than the preallocated stack.
+    with transforms.push_matrix() as saved:
+        with transforms.push_matrix():
+            with transforms.push_matrix():
+                transforms.rotate_x(math.pi / 3)
+                assert not renderer.transform_is_2d
+        transforms.scale(3)
+        transforms.translate(1, 1)
+        np.testing.assert_array_equal(saved, before)
+        # The yielded matrix is a copy.
+        saved[:] = 0
+    np.testing.assert_array_equal(renderer.transform_matrix, before)
+    assert renderer.transform_is_2d
+    assert renderer.matrix_depth == 0
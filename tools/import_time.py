@@ -0,0 +1,83 @@
+#
+# Part of p5: A Python package based on Processing
+# Copyright (C) 2017-2018 Abhik Pal
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Measure the time needed to import p5.
+
+Each statement is timed in a fresh interpreter (so that nothing is
+cached in sys.modules) and the median of several runs is reported
+along with the heavy dependencies that got imported.
+
+Usage:
+
+    $ python tools/import_time.py [--runs N] [statement ...]
+
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+STATEMENTS = [
+    'import p5',
+    'import p5.pmath',
+    'from p5 import *',
+]
+
+HEAVY_MODULES = ['numpy', 'PIL', 'vispy', 'OpenGL', 'glfw']
+
+_SCRIPT = """
+import sys, time, warnings
+warnings.simplefilter('ignore')
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+loaded = [m for m in {heavy!r} if m in sys.modules]
+print(elapsed, ','.join(loaded))
+"""
+
+def time_statement(statement, runs):
+    """Time a statement in fresh interpreters.
+
+    :returns: the median time (in seconds) and the heavy modules that
+        were imported.
+    :rtype: (float, list)
+
+    """
+    script = _SCRIPT.format(statement=statement, heavy=HEAVY_MODULES)
+    times = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', script],
+                                         universal_newlines=True)
+        fields = output.split()
+        times.append(float(fields[0]))
+    loaded = fields[1].split(',') if len(fields) > 1 else []
+    return statistics.median(times), loaded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('statements', nargs='*', default=STATEMENTS)
+    parser.add_argument('--runs', type=int, default=7)
+    args = parser.parse_args()
+
+    for statement in args.statements:
+        median, loaded = time_statement(statement, args.runs)
+        print("{:<24} {:8.1f} ms   {}".format(
+            statement, median * 1000, ', '.join(loaded) or '-'))
+
+if __name__ == '__main__':
+    main()